@@ -5,96 +5,20 @@ from django.core.files.storage import FileSystemStorage
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.core import serializers
+import csv
 import json
 
 from .models import CustomUser, Staffs, Courses, Subjects, Students, SessionYearModel, Attendance, AttendanceReport, LeaveReportStudent, LeaveReportStaff, FeedBackStudent, FeedBackStaffs, Announcement, Notification
+from .backends import users_by_email
+from .profiles import create_user_with_profile
+from .provisioning import STAFF_COLUMNS, STUDENT_COLUMNS, import_users, read_csv
+from .archive import attendance_models, attendance_reports, find_attendance
+from .dashboard_cache import get_cached_admin_dashboard_stats
+from .notifications import enqueue_announcement_fanout, invalidate_unread_counts, touch_notifications
 
 
 def admin_home(request):
-    all_student_count = Students.objects.all().count()
-    subject_count = Subjects.objects.all().count()
-    course_count = Courses.objects.all().count()
-    staff_count = Staffs.objects.all().count()
-
-    # Total Subjects and students in Each Course
-    course_all = Courses.objects.all()
-    course_name_list = []
-    subject_count_list = []
-    student_count_list_in_course = []
-
-    for course in course_all:
-        subjects = Subjects.objects.filter(course_id=course.id).count()
-        students = Students.objects.filter(course_id=course.id).count()
-        course_name_list.append(course.course_name)
-        subject_count_list.append(subjects)
-        student_count_list_in_course.append(students)
-    
-    subject_all = Subjects.objects.all()
-    subject_list = []
-    student_count_list_in_subject = []
-    for subject in subject_all:
-        course = Courses.objects.get(id=subject.course_id.id)
-        student_count = Students.objects.filter(course_id=course.id).count()
-        subject_list.append(subject.subject_name)
-        student_count_list_in_subject.append(student_count)
-    
-    # For Saffs
-    staff_attendance_present_list=[]
-    staff_attendance_leave_list=[]
-    staff_name_list=[]
-
-    staffs = Staffs.objects.all()
-    for staff in staffs:
-        subject_ids = Subjects.objects.filter(staff_id=staff.admin.id)
-        attendance = Attendance.objects.filter(subject_id__in=subject_ids).count()
-        leaves = LeaveReportStaff.objects.filter(staff_id=staff.id, leave_status=1).count()
-        staff_attendance_present_list.append(attendance)
-        staff_attendance_leave_list.append(leaves)
-        staff_name_list.append(staff.admin.username)
-
-    # For Students
-    student_attendance_present_list=[]
-    student_attendance_leave_list=[]
-    student_name_list=[]
-
-    students = Students.objects.all()
-    for student in students:
-        attendance = AttendanceReport.objects.filter(student_id=student.id, status=True).count()
-        absent = AttendanceReport.objects.filter(student_id=student.id, status=False).count()
-        leaves = LeaveReportStudent.objects.filter(student_id=student.id, leave_status=1).count()
-        student_attendance_present_list.append(attendance)
-        student_attendance_leave_list.append(leaves+absent)
-        student_name_list.append(student.admin.username)
-
-    context = {
-        "all_student_count": all_student_count,
-        "subject_count": subject_count,
-        "course_count": course_count,
-        "staff_count": staff_count,
-        "course_name_list": course_name_list,
-        "subject_count_list": subject_count_list,
-        "student_count_list_in_course": student_count_list_in_course,
-        "subject_list": subject_list,
-        "student_count_list_in_subject": student_count_list_in_subject,
-        "staff_attendance_present_list": staff_attendance_present_list,
-        "staff_attendance_leave_list": staff_attendance_leave_list,
-        "staff_name_list": staff_name_list,
-        "student_attendance_present_list": student_attendance_present_list,
-        "student_attendance_leave_list": student_attendance_leave_list,
-        "student_name_list": student_name_list,
-        "student_leave_count": LeaveReportStudent.objects.count(),
-        "student_leave_approved": LeaveReportStudent.objects.filter(leave_status=1).count(),
-        "student_leave_pending": LeaveReportStudent.objects.filter(leave_status=0).count(),
-        "student_leave_rejected": LeaveReportStudent.objects.filter(leave_status=2).count(),
-        "staff_leave_count": LeaveReportStaff.objects.count(),
-        "staff_leave_approved": LeaveReportStaff.objects.filter(leave_status=1).count(),
-        "staff_leave_pending": LeaveReportStaff.objects.filter(leave_status=0).count(),
-        "staff_leave_rejected": LeaveReportStaff.objects.filter(leave_status=2).count(),
-        "student_feedback_count": FeedBackStudent.objects.count(),
-        "student_feedback_replied": FeedBackStudent.objects.exclude(feedback_reply="").count(),
-        "staff_feedback_count": FeedBackStaffs.objects.count(),
-        "staff_feedback_replied": FeedBackStaffs.objects.exclude(feedback_reply="").count(),
-    }
+    context = get_cached_admin_dashboard_stats()
     return render(request, "hod_template/home_content.html", context)
 
 
@@ -115,9 +39,8 @@ def add_staff_save(request):
         address = request.POST.get('address')
 
         try:
-            user = CustomUser.objects.create_user(username=username, password=password, email=email, first_name=first_name, last_name=last_name, user_type=2)
-            user.staffs.address = address
-            user.save()
+            create_user_with_profile(CustomUser.STAFF, username=username, password=password, email=email, first_name=first_name, last_name=last_name,
+                                     profile={"address": address})
             messages.success(request, "Staff Added Successfully!")
             return redirect('add_staff')
         except Exception as e:
@@ -357,18 +280,11 @@ def add_student_save(request):
         profile_pic_url = fs.url(filename)
 
         try:
-            user = CustomUser.objects.create_user(username=username, password=password, email=email, first_name=first_name, last_name=last_name, user_type=3)
-            user.students.address = address
-            
             course_obj = Courses.objects.get(id=course_id)
-            user.students.course_id = course_obj
-            
             session_year_obj = SessionYearModel.objects.get(id=session_year_id)
-            user.students.session_year_id = session_year_obj
-            
-            user.students.gender = gender
-            user.students.profile_pic = profile_pic_url
-            user.save()
+            create_user_with_profile(CustomUser.STUDENT, username=username, password=password, email=email, first_name=first_name, last_name=last_name,
+                                     profile={"address": address, "course_id": course_obj, "session_year_id": session_year_obj,
+                                              "gender": gender, "profile_pic": profile_pic_url})
             messages.success(request, "Student Added Successfully!")
             return redirect('add_student')
         except Exception as e:
@@ -376,6 +292,42 @@ def add_student_save(request):
             return redirect('add_student')
 
 
+def import_users_page(request):
+    context = {
+        "student_columns": ", ".join(STUDENT_COLUMNS),
+        "staff_columns": ", ".join(STAFF_COLUMNS),
+    }
+    return render(request, 'hod_template/import_users_template.html', context)
+
+
+def import_users_save(request):
+    if request.method != "POST":
+        messages.error(request, "Invalid Method")
+        return redirect('import_users')
+
+    csv_file = request.FILES.get('csv_file')
+    user_type = request.POST.get('user_type')
+    if not csv_file or user_type not in (CustomUser.STAFF, CustomUser.STUDENT):
+        messages.error(request, "Please choose a CSV file and the type of accounts to create.")
+        return redirect('import_users')
+
+    try:
+        rows = read_csv(csv_file)
+    except (UnicodeDecodeError, csv.Error):
+        messages.error(request, "The file is not a valid UTF-8 CSV file.")
+        return redirect('import_users')
+
+    # Passwords are hashed here, in the process pool, so every account is created able to log in
+    result = import_users(rows, user_type)
+    if result["created"]:
+        messages.success(request, f"Imported {result['created']} accounts.")
+    for error in result["errors"][:20]:
+        messages.error(request, f"Line {error['line']}: {error['error']}")
+    if len(result["errors"]) > 20:
+        messages.error(request, f"... and {len(result['errors']) - 20} more rows skipped.")
+    return redirect('import_users')
+
+
 def manage_student(request):
     students = Students.objects.all()
     context = {
@@ -562,7 +514,7 @@ def delete_subject(request, subject_id):
 @csrf_exempt
 def check_email_exist(request):
     email = request.POST.get("email")
-    user_obj = CustomUser.objects.filter(email=email).exists()
+    user_obj = users_by_email(email or '').exists()
     if user_obj:
         return HttpResponse(True)
     else:
@@ -692,7 +644,9 @@ def admin_get_attendance_dates(request):
     session_model = SessionYearModel.objects.get(id=session_year)
     
     # students = Students.objects.filter(course_id=subject_model.course_id, session_year_id=session_model)
-    attendance = Attendance.objects.filter(subject_id=subject_model, session_year_id=session_model)
+    # Archived session years are read from the archive tables
+    attendance_model, _ = attendance_models(session_model.id)
+    attendance = attendance_model.objects.filter(subject_id=subject_model, session_year_id=session_model)
 
     # Only Passing Student Id and Student Name Only
     list_data = []
@@ -708,9 +662,9 @@ def admin_get_attendance_dates(request):
 def admin_get_attendance_student(request):
     # Getting Values from Ajax POST 'Fetch Student'
     attendance_date = request.POST.get('attendance_date')
-    attendance = Attendance.objects.get(id=attendance_date)
+    attendance = find_attendance(attendance_date)
 
-    attendance_data = AttendanceReport.objects.filter(attendance_id=attendance)
+    attendance_data = attendance_reports(attendance)
     # Only Passing Student Id and Student Name Only
     list_data = []
 
@@ -725,7 +679,7 @@ def admin_get_attendance_student(request):
 
 
 def admin_profile(request):
-    user = CustomUser.objects.get(id=request.user.id)
+    user = request.user
     context = {
         "user": user
     }
@@ -742,7 +696,7 @@ def admin_profile_update(request):
         password = request.POST.get('password')
 
         try:
-            customuser = CustomUser.objects.get(id=request.user.id)
+            customuser = request.user
             customuser.first_name = first_name
             customuser.last_name = last_name
             if password != None and password != "":
@@ -793,6 +747,7 @@ def add_announcement_save(request):
                 created_by=request.user
             )
             announcement.save()
+            enqueue_announcement_fanout(announcement)
             messages.success(request, "Announcement Added Successfully!")
             return redirect('add_announcement')
         except Exception as e:
@@ -833,7 +788,16 @@ def edit_announcement_save(request):
             announcement.scheduled_date = scheduled_date if scheduled_date else None
             announcement.expiry_date = expiry_date if expiry_date else None
             announcement.is_active = is_active
-            announcement.save()
+            if is_active:
+                # Reactivating brings an archived announcement back; the
+                # scheduler archives it again if it is still past its expiry
+                announcement.archived_at = None
+            # Leave the fan-out progress to the worker that may be sending it
+            announcement.save(update_fields=['title', 'message', 'target_audience', 'urgency', 'category',
+                                             'scheduled_date', 'expiry_date', 'is_active', 'archived_at',
+                                             'updated_at'])
+            if announcement.is_active and announcement.fanout_status != Announcement.FANOUT_SENT:
+                enqueue_announcement_fanout(announcement)
 
             messages.success(request, "Announcement Updated Successfully.")
             return redirect('/edit_announcement/'+announcement_id)
@@ -936,6 +900,10 @@ def edit_notification_save(request):
         try:
             notification = Notification.objects.get(id=notification_id)
             user = CustomUser.objects.get(id=user_id)
+            if notification.user_id != user.id:
+                # The new owner is refreshed by the post_save signal
+                invalidate_unread_counts([notification.user_id])
+                touch_notifications([notification.user_id])
             notification.user = user
             notification.title = title
             notification.message = message
@@ -9,71 +9,14 @@ import json
 
 
 from .models import CustomUser, Staffs, Courses, Subjects, Students, SessionYearModel, Attendance, AttendanceReport, LeaveReportStaff, FeedBackStaffs, StudentResult, Announcement, Notification
+from .archive import attendance_models, attendance_reports, find_attendance
+from .attendance import save_attendance, update_attendance
+from .dashboard_cache import get_cached_staff_dashboard_stats
+from .notifications import mark_notifications_read
 
 
 def staff_home(request):
-    # Fetching All Students under Staff
-    subjects = Subjects.objects.filter(staff_id=request.user.id)
-    course_id_list = []
-    for subject in subjects:
-        course = Courses.objects.get(id=subject.course_id.id)
-        course_id_list.append(course.id)
-
-    final_course = []
-    # Removing Duplicate Course Id
-    for course_id in course_id_list:
-        if course_id not in final_course:
-            final_course.append(course_id)
-            
-    students_count = Students.objects.filter(course_id__in=final_course).count()
-    subject_count = subjects.count()
-    
-    # Fetch All Attendance Count
-    attendance_count = Attendance.objects.filter(subject_id__in=subjects).count()
-    
-    # Fetch All Approve Leave
-    staff = Staffs.objects.get(admin=request.user.id)
-    leave_count = LeaveReportStaff.objects.filter(staff_id=staff.id,
-                                                  leave_status=1).count()
-    leave_pending = LeaveReportStaff.objects.filter(staff_id=staff.id,
-                                                   leave_status=0).count()
-    leave_rejected = LeaveReportStaff.objects.filter(staff_id=staff.id,
-                                                    leave_status=2).count()
-
-    # Fetch Attendance Data by Subjects
-    subject_list = []
-    attendance_list = []
-    for subject in subjects:
-        attendance_count1 = Attendance.objects.filter(subject_id=subject.id).count()
-        subject_list.append(subject.subject_name)
-        attendance_list.append(attendance_count1)
-
-    students_attendance = Students.objects.filter(course_id__in=final_course)
-    student_list = []
-    student_list_attendance_present = []
-    student_list_attendance_absent = []
-    for student in students_attendance:
-        attendance_present_count = AttendanceReport.objects.filter(status=True,
-                                                                   student_id=student.id).count()
-        attendance_absent_count = AttendanceReport.objects.filter(status=False,
-                                                                  student_id=student.id).count()
-        student_list.append(student.admin.first_name+" "+ student.admin.last_name)
-        student_list_attendance_present.append(attendance_present_count)
-        student_list_attendance_absent.append(attendance_absent_count)
-
-    context={
-        "students_count": students_count,
-        "attendance_count": attendance_count,
-        "leave_count": leave_count,
-        "leave_pending": leave_pending,
-        "leave_rejected": leave_rejected,
-        "subject_count": subject_count,
-        "subject_list": subject_list,
-        "attendance_list": attendance_list,
-        "student_list": student_list,
-        "attendance_present_list": student_list_attendance_present,
-        "attendance_absent_list": student_list_attendance_absent
-    }
+    context = get_cached_staff_dashboard_stats(request.user)
     return render(request, "staff_template/staff_home_template.html", context)
 
 
@@ -89,8 +32,7 @@ def staff_take_attendance(request):
 
 
 def staff_apply_leave(request):
-    print(request.user.id)
-    staff_obj = Staffs.objects.get(admin=request.user.id)
+    staff_obj = request.profile
     leave_data = LeaveReportStaff.objects.filter(staff_id=staff_obj)
     context = {
         "leave_data": leave_data
@@ -106,7 +48,7 @@ def staff_apply_leave_save(request):
         leave_date = request.POST.get('leave_date')
         leave_message = request.POST.get('leave_message')
 
-        staff_obj = Staffs.objects.get(admin=request.user.id)
+        staff_obj = request.profile
         try:
             leave_report = LeaveReportStaff(staff_id=staff_obj,
                                             leave_date=leave_date,
@@ -130,7 +72,7 @@ def staff_feedback_save(request):
         return redirect('staff_feedback')
     else:
         feedback = request.POST.get('feedback_message')
-        staff_obj = Staffs.objects.get(admin=request.user.id)
+        staff_obj = request.profile
 
         try:
             add_feedback = FeedBackStaffs(staff_id=staff_obj,
@@ -185,28 +127,16 @@ def save_attendance_data(request):
     attendance_date = request.POST.get("attendance_date")
     session_year_id = request.POST.get("session_year_id")
 
-    subject_model = Subjects.objects.get(id=subject_id)
-    session_year_model = SessionYearModel.objects.get(id=session_year_id)
-
-    json_student = json.loads(student_ids)
-    
     try:
-        # First Attendance Data is Saved on Attendance Model
-        attendance = Attendance(subject_id=subject_model,
-                                attendance_date=attendance_date,
-                                session_year_id=session_year_model)
-        attendance.save()
-
-        for stud in json_student:
-            # Attendance of Individual Student saved on AttendanceReport Model
-            student = Students.objects.get(admin=stud['id'])
-            attendance_report = AttendanceReport(student_id=student,
-                                                 attendance_id=attendance,
-                                                 status=stud['status'])
-            attendance_report.save()
-        return HttpResponse("OK")
+        subject_model = Subjects.objects.get(id=subject_id)
+        session_year_model = SessionYearModel.objects.get(id=session_year_id)
+        json_student = json.loads(student_ids)
+
+        # Attendance and every Student's AttendanceReport are saved together
+        result = save_attendance(subject_model, session_year_model, attendance_date, json_student)
+        return JsonResponse(result, status=200 if result["status"] == "OK" else 400)
     except Exception as e:
-        return HttpResponse("Error")
+        return JsonResponse({"status": "Error", "message": "Failed to save attendance"}, status=400)
 
 
 
@@ -233,8 +163,10 @@ def get_attendance_dates(request):
     subject_model = Subjects.objects.get(id=subject_id)
 
     session_model = SessionYearModel.objects.get(id=session_year)
-    attendance = Attendance.objects.filter(subject_id=subject_model,
-                                           session_year_id=session_model)
+    # Archived session years are read from the archive tables
+    attendance_model, _ = attendance_models(session_model.id)
+    attendance = attendance_model.objects.filter(subject_id=subject_model,
+                                                 session_year_id=session_model)
 
     # Only Passing Student Id and Student Name Only
     list_data = []
@@ -253,9 +185,9 @@ def get_attendance_student(request):
   
     # Getting Values from Ajax POST 'Fetch Student'
     attendance_date = request.POST.get('attendance_date')
-    attendance = Attendance.objects.get(id=attendance_date)
+    attendance = find_attendance(attendance_date)
 
-    attendance_data = AttendanceReport.objects.filter(attendance_id=attendance)
+    attendance_data = attendance_reports(attendance)
     # Only Passing Student Id and Student Name Only
     list_data = []
 
@@ -272,32 +204,22 @@ def get_attendance_student(request):
 @csrf_exempt
 def update_attendance_data(request):
     student_ids = request.POST.get("student_ids")
-
     attendance_date = request.POST.get("attendance_date")
-    attendance = Attendance.objects.get(id=attendance_date)
-
-    json_student = json.loads(student_ids)
 
     try:
-        
-        for stud in json_student:
-          
-            # Attendance of Individual Student saved on AttendanceReport Model
-            student = Students.objects.get(admin=stud['id'])
-
-            attendance_report = AttendanceReport.objects.get(student_id=student,
-                                                             attendance_id=attendance)
-            attendance_report.status=stud['status']
-
-            attendance_report.save()
-        return HttpResponse("OK")
+        attendance = Attendance.objects.get(id=attendance_date)
+        json_student = json.loads(student_ids)
+
+        # Only the AttendanceReport rows whose status changed are written
+        result = update_attendance(attendance, json_student)
+        return JsonResponse(result)
     except Exception as e:
-        return HttpResponse("Error")
+        return JsonResponse({"status": "Error", "message": "Failed to update attendance"}, status=400)
 
 
 def staff_profile(request):
-    user = CustomUser.objects.get(id=request.user.id)
-    staff = Staffs.objects.get(admin=user)
+    user = request.user
+    staff = request.profile
 
     context={
         "user": user,
@@ -317,14 +239,14 @@ def staff_profile_update(request):
         address = request.POST.get('address')
 
         try:
-            customuser = CustomUser.objects.get(id=request.user.id)
+            customuser = request.user
             customuser.first_name = first_name
             customuser.last_name = last_name
             if password != None and password != "":
                 customuser.set_password(password)
             customuser.save()
 
-            staff = Staffs.objects.get(admin=customuser.id)
+            staff = request.profile
             staff.address = address
             staff.save()
 
@@ -365,23 +287,14 @@ def staff_add_result_save(request):
         subject_obj = Subjects.objects.get(id=subject_id)
 
         try:
-            # Check if Students Result Already Exists or not
-            check_exist = StudentResult.objects.filter(subject_id=subject_obj,
-                                                       student_id=student_obj).exists()
-            if check_exist:
-                result = StudentResult.objects.get(subject_id=subject_obj,
-                                                   student_id=student_obj)
-                result.subject_assignment_marks = assignment_marks
-                result.subject_exam_marks = exam_marks
-                result.save()
-                messages.success(request, "Result Updated Successfully!")
-            else:
-                result = StudentResult(student_id=student_obj,
-                                       subject_id=subject_obj,
-                                       subject_exam_marks=exam_marks,
-                                       subject_assignment_marks=assignment_marks)
-                result.save()
+            # One result per student and subject (unique_student_result)
+            result, created = StudentResult.objects.update_or_create(
+                student_id=student_obj, subject_id=subject_obj,
+                defaults={"subject_exam_marks": exam_marks, "subject_assignment_marks": assignment_marks})
+            if created:
                 messages.success(request, "Result Added Successfully!")
+            else:
+                messages.success(request, "Result Updated Successfully!")
             return redirect('staff_add_result')
         except Exception as e:
             messages.error(request, "Failed to Add Result!")
@@ -417,7 +330,7 @@ def staff_view_students(request):
 
 def staff_view_announcements(request):
     # Get announcements targeted to staff or all users
-    announcements = Announcement.objects.filter(
+    announcements = Announcement.objects.live().filter(
         is_active=True,
         target_audience__in=['all', 'staff']
     ).order_by('-created_at')
@@ -430,13 +343,12 @@ def staff_view_announcements(request):
 
 def staff_view_notifications(request):
     # Get notifications for the current staff user
-    notifications = Notification.objects.filter(
+    notifications = Notification.objects.live().filter(
         user=request.user
     ).order_by('-created_at')
 
     # Mark notifications as read when viewed
-    unread_notifications = notifications.filter(is_read=False)
-    unread_notifications.update(is_read=True)
+    mark_notifications_read(notifications, request.user.id)
 
     context = {
         "notifications": notifications
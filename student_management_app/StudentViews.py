@@ -4,56 +4,19 @@ from django.contrib import messages
 from django.core.files.storage import FileSystemStorage
 from django.urls import reverse
 import datetime
-from .models import CustomUser, Staffs, Courses, Subjects, Students, Attendance, AttendanceReport, LeaveReportStudent, FeedBackStudent, StudentResult, Announcement, Notification
+from .models import CustomUser, Staffs, Courses, Subjects, Students, SessionYearModel, Attendance, AttendanceReport, ArchivedAttendanceReport, LeaveReportStudent, FeedBackStudent, StudentResult, Announcement, Notification
+from .dashboard_cache import get_cached_student_dashboard_stats
+from .notifications import mark_notifications_read
 
 def student_home(request):
-    student_obj = Students.objects.get(admin=request.user.id)
-    total_attendance = AttendanceReport.objects.filter(student_id=student_obj).count()
-    attendance_present = AttendanceReport.objects.filter(student_id=student_obj,
-                                                       status=True).count()
-    attendance_absent = AttendanceReport.objects.filter(student_id=student_obj,
-                                                      status=False).count()
-    course_obj = Courses.objects.get(id=student_obj.course_id.id)
-    total_subjects = Subjects.objects.filter(course_id=course_obj).count()
-    subject_name = []
-    data_present = []
-    data_absent = []
-    subject_data = Subjects.objects.filter(course_id=student_obj.course_id)
-    for subject in subject_data:
-        attendance = Attendance.objects.filter(subject_id=subject.id)
-        attendance_present_count = AttendanceReport.objects.filter(attendance_id__in=attendance,
-                                                               status=True,
-                                                               student_id=student_obj.id).count()
-        attendance_absent_count = AttendanceReport.objects.filter(attendance_id__in=attendance,
-                                                              status=False,
-                                                              student_id=student_obj.id).count()
-        subject_name.append(subject.subject_name)
-        data_present.append(attendance_present_count)
-        data_absent.append(attendance_absent_count)
-    
-    # Calculate attendance percentage
-    if total_attendance > 0:
-        attendance_percentage = (attendance_present / total_attendance) * 100
-    else:
-        attendance_percentage = 0
-    
-    context = {
-        "total_attendance": total_attendance,
-        "attendance_present": attendance_present,
-        "attendance_absent": attendance_absent,
-        "total_subjects": total_subjects,
-        "subject_name": subject_name,
-        "data_present": data_present,
-        "data_absent": data_absent,
-        "attendance_percentage": round(attendance_percentage, 1)
-    }
+    context = get_cached_student_dashboard_stats(request.profile)
     return render(request, "student_template/student_home_template.html", context)
 
 
 def student_view_attendance(request):
   
     # Getting Logged in Student Data
-    student = Students.objects.get(admin=request.user.id) 
+    student = request.profile
     
     # Getting Course Enrolled of LoggedIn Student
     course = student.course_id 
@@ -92,11 +55,8 @@ def student_view_attendance_post(request):
         # Getting all the Subject Data based on Selected Subject
         subject_obj = Subjects.objects.get(id=subject_id)
         
-        # Getting Logged In User Data
-        user_obj = CustomUser.objects.get(id=request.user.id)
-        
         # Getting Student Data Based on Logged in Data
-        stud_obj = Students.objects.get(admin=user_obj)
+        stud_obj = request.profile
 
         # Now Accessing Attendance Data based on the Range of Date
         # Selected and Subject Selected
@@ -105,8 +65,20 @@ def student_view_attendance_post(request):
                                                subject_id=subject_obj)
         # Getting Attendance Report based on the attendance
         # details obtained above
-        attendance_reports = AttendanceReport.objects.filter(attendance_id__in=attendance,
-                                                             student_id=stud_obj)
+        attendance_reports = list(AttendanceReport.objects.filter(attendance_id__in=attendance,
+                                                                  student_id=stud_obj)
+                                  .select_related('attendance_id'))
+
+        # Only a range reaching into an archived session year reads the archive
+        archived_sessions = SessionYearModel.objects.filter(archived_at__isnull=False,
+                                                            session_start_year__lte=end_date_parse,
+                                                            session_end_year__gte=start_date_parse)
+        if archived_sessions.exists():
+            attendance_reports = list(ArchivedAttendanceReport.objects.filter(
+                attendance_id__attendance_date__range=(start_date_parse, end_date_parse),
+                attendance_id__subject_id=subject_obj,
+                attendance_id__session_year_id__in=archived_sessions,
+                student_id=stud_obj).select_related('attendance_id')) + attendance_reports
 
         
         context = {
@@ -118,7 +90,7 @@ def student_view_attendance_post(request):
        
 
 def student_apply_leave(request):
-    student_obj = Students.objects.get(admin=request.user.id)
+    student_obj = request.profile
     leave_data = LeaveReportStudent.objects.filter(student_id=student_obj)
     context = {
         "leave_data": leave_data
@@ -134,7 +106,7 @@ def student_apply_leave_save(request):
         leave_date = request.POST.get('leave_date')
         leave_message = request.POST.get('leave_message')
 
-        student_obj = Students.objects.get(admin=request.user.id)
+        student_obj = request.profile
         try:
             leave_report = LeaveReportStudent(student_id=student_obj,
                                               leave_date=leave_date,
@@ -149,7 +121,7 @@ def student_apply_leave_save(request):
 
 
 def student_feedback(request):
-    student_obj = Students.objects.get(admin=request.user.id)
+    student_obj = request.profile
     feedback_data = FeedBackStudent.objects.filter(student_id=student_obj)
     context = {
         "feedback_data": feedback_data
@@ -163,7 +135,7 @@ def student_feedback_save(request):
         return redirect('student_feedback')
     else:
         feedback = request.POST.get('feedback_message')
-        student_obj = Students.objects.get(admin=request.user.id)
+        student_obj = request.profile
 
         try:
             add_feedback = FeedBackStudent(student_id=student_obj,
@@ -178,8 +150,8 @@ def student_feedback_save(request):
 
 
 def student_profile(request):
-    user = CustomUser.objects.get(id=request.user.id)
-    student = Students.objects.get(admin=user)
+    user = request.user
+    student = request.profile
 
     context={
         "user": user,
@@ -199,14 +171,14 @@ def student_profile_update(request):
         address = request.POST.get('address')
 
         try:
-            customuser = CustomUser.objects.get(id=request.user.id)
+            customuser = request.user
             customuser.first_name = first_name
             customuser.last_name = last_name
             if password != None and password != "":
                 customuser.set_password(password)
             customuser.save()
 
-            student = Students.objects.get(admin=customuser.id)
+            student = request.profile
             student.address = address
             student.save()
             
@@ -218,7 +190,7 @@ def student_profile_update(request):
 
 
 def student_view_result(request):
-    student = Students.objects.get(admin=request.user.id)
+    student = request.profile
     student_result = StudentResult.objects.filter(student_id=student.id)
     context = {
         "student_result": student_result,
@@ -227,7 +199,7 @@ def student_view_result(request):
 
 
 def student_view_subjects(request):
-    student = Students.objects.get(admin=request.user.id)
+    student = request.profile
     course = student.course_id
     subjects = Subjects.objects.filter(course_id=course)
 
@@ -239,7 +211,7 @@ def student_view_subjects(request):
 
 def student_view_announcements(request):
     # Get announcements targeted to students or all users
-    announcements = Announcement.objects.filter(
+    announcements = Announcement.objects.live().filter(
         is_active=True,
         target_audience__in=['all', 'students']
     ).order_by('-created_at')
@@ -252,13 +224,12 @@ def student_view_announcements(request):
 
 def student_view_notifications(request):
     # Get notifications for the current student user
-    notifications = Notification.objects.filter(
+    notifications = Notification.objects.live().filter(
         user=request.user
     ).order_by('-created_at')
 
     # Mark notifications as read when viewed
-    unread_notifications = notifications.filter(is_read=False)
-    unread_notifications.update(is_read=True)
+    mark_notifications_read(notifications, request.user.id)
 
     context = {
         "notifications": notifications
@@ -10,7 +10,8 @@ from .api_views import (
     AttendanceReportViewSet, LeaveReportStudentViewSet,
     LeaveReportStaffViewSet, StudentResultViewSet,
     TimetableViewSet, AnnouncementViewSet, NotificationViewSet,
-    SessionYearViewSet
+    SessionYearViewSet, ReportJobViewSet, DashboardCacheViewSet,
+    QueryStatsViewSet
 )
 
 # Create router and register viewsets
@@ -29,6 +30,9 @@ router.register(r'results', StudentResultViewSet, basename='result')
 router.register(r'timetable', TimetableViewSet, basename='timetable')
 router.register(r'announcements', AnnouncementViewSet, basename='announcement')
 router.register(r'notifications', NotificationViewSet, basename='notification')
+router.register(r'report-jobs', ReportJobViewSet, basename='report-job')
+router.register(r'dashboard-cache', DashboardCacheViewSet, basename='dashboard-cache')
+router.register(r'query-stats', QueryStatsViewSet, basename='query-stats')
 
 app_name = 'api'
 
@@ -1,15 +1,26 @@
 """
 API ViewSets for REST API
 """
-from rest_framework import viewsets, status, filters
+import math
+import os
+from hashlib import md5
+
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+from rest_framework import viewsets, mixins, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, BasePermission, IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from .models import (
     CustomUser, Staffs, Students, Courses, Subjects,
     Attendance, AttendanceReport, LeaveReportStudent, LeaveReportStaff,
-    StudentResult, Timetable, Announcement, Notification, SessionYearModel
+    StudentResult, Timetable, Announcement, Notification, SessionYearModel, ReportJob,
+    ArchivedAttendance, ArchivedAttendanceReport
 )
 from .serializers import (
     UserSerializer, StaffSerializer, StudentSerializer,
@@ -17,11 +28,118 @@ from .serializers import (
     AttendanceReportSerializer, LeaveReportStudentSerializer,
     LeaveReportStaffSerializer, StudentResultSerializer,
     TimetableSerializer, AnnouncementSerializer, NotificationSerializer,
-    SessionYearSerializer
+    SessionYearSerializer, AttendanceBulkCreateSerializer, AttendanceBulkUpdateSerializer,
+    ReportJobSerializer, ArchivedAttendanceSerializer, ArchivedAttendanceReportSerializer
+)
+from .archive import is_archived
+from .attendance import save_attendance, update_attendance
+from .pagination import KeysetPagination, SelectablePaginationMixin
+from .reports import REPORT_CONTENT_TYPES, enqueue_report_job, report_job_path
+from .dashboard_cache import get_dashboard_cache_stats, reset_dashboard_cache_stats
+from .instrumentation import query_stats
+from .notifications import (
+    enqueue_announcement_fanout, get_notifications_modified, get_unread_count, mark_notifications_read
+)
+from .exports import (
+    StreamingExportMixin, STUDENT_EXPORT_COLUMNS, ATTENDANCE_REPORT_EXPORT_COLUMNS, RESULT_EXPORT_COLUMNS
 )
 
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+def count_subquery(model, field, **filters):
+    """
+    Correlated COUNT(*) of `model` rows pointing at the outer row through `field`
+
+    Unlike Count() over a join, several of these can be annotated on the same
+    queryset without multiplying rows.
+    """
+    subquery = (model.objects.filter(**{field: OuterRef('pk')}, **filters)
+                .order_by().values(field).annotate(total=Count('id')).values('total'))
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), 0)
+
+
+class IsHOD(BasePermission):
+    """
+    Allows access only to HOD users
+    """
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated
+                    and str(request.user.user_type) == CustomUser.HOD)
+
+
+class QueryProfileMixin:
+    """
+    Applies the ViewSet's query profile so serializing a page costs a fixed
+    number of queries whatever the page size.
+
+    select_related_fields: forward relations read by the serializer
+    prefetch_related_fields: reverse / many relations read by the serializer
+    annotations: computed values the serializer reads instead of querying per row
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+    annotations = {}
+
+    @classmethod
+    def apply_query_profile(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        if cls.annotations:
+            queryset = queryset.annotate(**cls.annotations)
+        return queryset
+
+    def get_queryset(self):
+        return self.apply_query_profile(super().get_queryset())
+
+
+class SessionArchiveMixin:
+    """
+    Reads from the archive tables when ?session_year_id= names an archived
+    session year; every other request, and every write, uses the live tables.
+
+    archive_queryset: archived rows served instead of the ViewSet queryset
+    archive_serializer_class: read only serializer for the archived rows
+    archive_annotations: the ViewSet's annotations over the archive tables
+    session_year_field: lookup from the queryset's model to its session year,
+        or None when filterset_fields already filters on session_year_id
+    """
+    archive_queryset = None
+    archive_serializer_class = None
+    archive_annotations = {}
+    session_year_field = 'session_year_id'
+
+    def requested_session_year(self):
+        session_year_id = self.request.query_params.get('session_year_id', '')
+        return session_year_id if session_year_id.isdigit() else None
+
+    def reads_archive(self):
+        if not hasattr(self, '_reads_archive'):
+            self._reads_archive = (self.request.method in SAFE_METHODS
+                                   and is_archived(self.requested_session_year()))
+        return self._reads_archive
+
+    def get_queryset(self):
+        session_year_id = self.requested_session_year()
+        if not self.reads_archive():
+            queryset = super().get_queryset()
+        else:
+            queryset = self.archive_queryset.all()
+            if self.select_related_fields:
+                queryset = queryset.select_related(*self.select_related_fields)
+            if self.archive_annotations:
+                queryset = queryset.annotate(**self.archive_annotations)
+        if session_year_id and self.session_year_field:
+            queryset = queryset.filter(**{self.session_year_field: session_year_id})
+        return queryset
+
+    def get_serializer_class(self):
+        if self.reads_archive():
+            return self.archive_serializer_class
+        return super().get_serializer_class()
+
+
+class UserViewSet(QueryProfileMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing users
     """
@@ -34,7 +152,7 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
     ordering = ['-date_joined']
 
 
-class SessionYearViewSet(viewsets.ModelViewSet):
+class SessionYearViewSet(QueryProfileMixin, viewsets.ModelViewSet):
     """
     API endpoint for session years
     """
@@ -44,7 +162,7 @@ class SessionYearViewSet(viewsets.ModelViewSet):
     ordering = ['-session_start_year']
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(QueryProfileMixin, viewsets.ModelViewSet):
     """
     API endpoint for courses
     """
@@ -55,12 +173,16 @@ class CourseViewSet(viewsets.ModelViewSet):
     search_fields = ['course_name']
     ordering_fields = ['course_name', 'created_at']
     ordering = ['course_name']
+    annotations = {
+        'student_count': count_subquery(Students, 'course_id'),
+        'subject_count': count_subquery(Subjects, 'course_id'),
+    }
     
     @action(detail=True, methods=['get'])
     def students(self, request, pk=None):
         """Get all students in this course"""
         course = self.get_object()
-        students = Students.objects.filter(course_id=course)
+        students = StudentViewSet.apply_query_profile(Students.objects.filter(course_id=course))
         serializer = StudentSerializer(students, many=True)
         return Response(serializer.data)
     
@@ -68,12 +190,12 @@ class CourseViewSet(viewsets.ModelViewSet):
     def subjects(self, request, pk=None):
         """Get all subjects in this course"""
         course = self.get_object()
-        subjects = Subjects.objects.filter(course_id=course)
+        subjects = SubjectViewSet.apply_query_profile(Subjects.objects.filter(course_id=course))
         serializer = SubjectSerializer(subjects, many=True)
         return Response(serializer.data)
 
 
-class SubjectViewSet(viewsets.ModelViewSet):
+class SubjectViewSet(QueryProfileMixin, viewsets.ModelViewSet):
     """
     API endpoint for subjects
     """
@@ -85,9 +207,10 @@ class SubjectViewSet(viewsets.ModelViewSet):
     search_fields = ['subject_name']
     ordering_fields = ['subject_name', 'created_at']
     ordering = ['subject_name']
+    select_related_fields = ('course_id', 'staff_id')
 
 
-class StaffViewSet(viewsets.ModelViewSet):
+class StaffViewSet(QueryProfileMixin, viewsets.ModelViewSet):
     """
     API endpoint for staff
     """
@@ -98,17 +221,18 @@ class StaffViewSet(viewsets.ModelViewSet):
     search_fields = ['admin__username', 'admin__email', 'admin__first_name', 'admin__last_name']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    select_related_fields = ('admin',)
     
     @action(detail=True, methods=['get'])
     def subjects(self, request, pk=None):
         """Get all subjects taught by this staff"""
         staff = self.get_object()
-        subjects = Subjects.objects.filter(staff_id=staff.admin)
+        subjects = SubjectViewSet.apply_query_profile(Subjects.objects.filter(staff_id=staff.admin))
         serializer = SubjectSerializer(subjects, many=True)
         return Response(serializer.data)
 
 
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(StreamingExportMixin, QueryProfileMixin, viewsets.ModelViewSet):
     """
     API endpoint for students
     """
@@ -120,20 +244,33 @@ class StudentViewSet(viewsets.ModelViewSet):
     search_fields = ['admin__username', 'admin__email', 'admin__first_name', 'admin__last_name']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    select_related_fields = ('admin', 'course_id', 'session_year_id')
+    export_filename = 'students'
+    export_columns = STUDENT_EXPORT_COLUMNS
     
     @action(detail=True, methods=['get'])
     def attendance(self, request, pk=None):
         """Get attendance records for this student"""
         student = self.get_object()
-        attendance = AttendanceReport.objects.filter(student_id=student)
-        serializer = AttendanceReportSerializer(attendance, many=True)
+        session_year_id = request.query_params.get('session_year_id', '')
+        if is_archived(session_year_id):
+            attendance = ArchivedAttendanceReport.objects.filter(student_id=student,
+                                                                 attendance_id__session_year_id=session_year_id)
+            serializer_class = ArchivedAttendanceReportSerializer
+        else:
+            attendance = AttendanceReport.objects.filter(student_id=student)
+            if session_year_id.isdigit():
+                attendance = attendance.filter(attendance_id__session_year_id=session_year_id)
+            serializer_class = AttendanceReportSerializer
+        attendance = AttendanceReportViewSet.apply_query_profile(attendance)
+        serializer = serializer_class(attendance, many=True)
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
     def results(self, request, pk=None):
         """Get exam results for this student"""
         student = self.get_object()
-        results = StudentResult.objects.filter(student_id=student)
+        results = StudentResultViewSet.apply_query_profile(StudentResult.objects.filter(student_id=student))
         serializer = StudentResultSerializer(results, many=True)
         return Response(serializer.data)
     
@@ -141,46 +278,94 @@ class StudentViewSet(viewsets.ModelViewSet):
     def leaves(self, request, pk=None):
         """Get leave applications for this student"""
         student = self.get_object()
-        leaves = LeaveReportStudent.objects.filter(student_id=student)
+        leaves = LeaveReportStudentViewSet.apply_query_profile(LeaveReportStudent.objects.filter(student_id=student))
         serializer = LeaveReportStudentSerializer(leaves, many=True)
         return Response(serializer.data)
 
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(SelectablePaginationMixin, SessionArchiveMixin, QueryProfileMixin, viewsets.ModelViewSet):
     """
-    API endpoint for attendance
+    API endpoint for attendance; ?session_year_id= of an archived session
+    year reads the archive
     """
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
+    archive_queryset = ArchivedAttendance.objects.all()
+    archive_serializer_class = ArchivedAttendanceSerializer
+    session_year_field = None
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['subject_id', 'session_year_id', 'attendance_date']
     ordering_fields = ['attendance_date', 'created_at']
     ordering = ['-attendance_date']
+    select_related_fields = ('subject_id', 'session_year_id')
+    annotations = {
+        'present_count': count_subquery(AttendanceReport, 'attendance_id', status=True),
+        'absent_count': count_subquery(AttendanceReport, 'attendance_id', status=False),
+    }
+    archive_annotations = {
+        'present_count': count_subquery(ArchivedAttendanceReport, 'attendance_id', status=True),
+        'absent_count': count_subquery(ArchivedAttendanceReport, 'attendance_id', status=False),
+    }
     
     @action(detail=True, methods=['get'])
     def reports(self, request, pk=None):
         """Get individual attendance reports for this attendance"""
         attendance = self.get_object()
-        reports = AttendanceReport.objects.filter(attendance_id=attendance)
-        serializer = AttendanceReportSerializer(reports, many=True)
+        if self.reads_archive():
+            reports = ArchivedAttendanceReport.objects.filter(attendance_id=attendance)
+            serializer_class = ArchivedAttendanceReportSerializer
+        else:
+            reports = AttendanceReport.objects.filter(attendance_id=attendance)
+            serializer_class = AttendanceReportSerializer
+        reports = AttendanceReportViewSet.apply_query_profile(reports)
+        serializer = serializer_class(reports, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'], url_path='bulk-create')
+    def bulk_create(self, request):
+        """Take attendance for a whole class in one request"""
+        serializer = AttendanceBulkCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        result = save_attendance(data['subject_id'], data['session_year_id'],
+                                 data['attendance_date'], data['students'], lookup='id')
+        if result['status'] != 'OK':
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], url_path='bulk-update')
+    def bulk_update(self, request, pk=None):
+        """Change student statuses of this attendance, writing only the changed rows"""
+        attendance = self.get_object()
+        serializer = AttendanceBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = update_attendance(attendance, serializer.validated_data['students'], lookup='id')
+        return Response(result)
+
 
-class AttendanceReportViewSet(viewsets.ModelViewSet):
+class AttendanceReportViewSet(StreamingExportMixin, SelectablePaginationMixin, SessionArchiveMixin, QueryProfileMixin,
+                              viewsets.ModelViewSet):
     """
-    API endpoint for attendance reports
+    API endpoint for attendance reports; ?session_year_id= of an archived
+    session year reads the archive
     """
     queryset = AttendanceReport.objects.all()
     serializer_class = AttendanceReportSerializer
+    archive_queryset = ArchivedAttendanceReport.objects.all()
+    archive_serializer_class = ArchivedAttendanceReportSerializer
+    session_year_field = 'attendance_id__session_year_id'
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['student_id', 'attendance_id', 'status']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    select_related_fields = ('student_id__admin', 'attendance_id__subject_id')
+    export_filename = 'attendance_reports'
+    export_columns = ATTENDANCE_REPORT_EXPORT_COLUMNS
 
 
-class LeaveReportStudentViewSet(viewsets.ModelViewSet):
+class LeaveReportStudentViewSet(QueryProfileMixin, viewsets.ModelViewSet):
     """
     API endpoint for student leave reports
     """
@@ -191,6 +376,7 @@ class LeaveReportStudentViewSet(viewsets.ModelViewSet):
     filterset_fields = ['student_id', 'leave_status']
     ordering_fields = ['created_at', 'leave_date']
     ordering = ['-created_at']
+    select_related_fields = ('student_id__admin',)
     
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
@@ -211,7 +397,7 @@ class LeaveReportStudentViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class LeaveReportStaffViewSet(viewsets.ModelViewSet):
+class LeaveReportStaffViewSet(QueryProfileMixin, viewsets.ModelViewSet):
     """
     API endpoint for staff leave reports
     """
@@ -222,6 +408,7 @@ class LeaveReportStaffViewSet(viewsets.ModelViewSet):
     filterset_fields = ['staff_id', 'leave_status']
     ordering_fields = ['created_at', 'leave_date']
     ordering = ['-created_at']
+    select_related_fields = ('staff_id__admin',)
     
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
@@ -242,7 +429,7 @@ class LeaveReportStaffViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class StudentResultViewSet(viewsets.ModelViewSet):
+class StudentResultViewSet(StreamingExportMixin, SelectablePaginationMixin, QueryProfileMixin, viewsets.ModelViewSet):
     """
     API endpoint for student results
     """
@@ -253,9 +440,12 @@ class StudentResultViewSet(viewsets.ModelViewSet):
     filterset_fields = ['student_id', 'subject_id']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    select_related_fields = ('student_id__admin', 'subject_id')
+    export_filename = 'results'
+    export_columns = RESULT_EXPORT_COLUMNS
 
 
-class TimetableViewSet(viewsets.ModelViewSet):
+class TimetableViewSet(QueryProfileMixin, viewsets.ModelViewSet):
     """
     API endpoint for timetable
     """
@@ -266,9 +456,10 @@ class TimetableViewSet(viewsets.ModelViewSet):
     filterset_fields = ['course', 'session_year', 'day_of_week', 'subject']
     ordering_fields = ['day_of_week', 'start_time']
     ordering = ['day_of_week', 'start_time']
+    select_related_fields = ('subject__staff_id', 'course', 'session_year')
 
 
-class AnnouncementViewSet(viewsets.ModelViewSet):
+class AnnouncementViewSet(QueryProfileMixin, viewsets.ModelViewSet):
     """
     API endpoint for announcements
     """
@@ -280,9 +471,20 @@ class AnnouncementViewSet(viewsets.ModelViewSet):
     search_fields = ['title', 'message']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    select_related_fields = ('created_by',)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # HODs also see announcements scheduled for later
+        if str(self.request.user.user_type) != CustomUser.HOD:
+            queryset = queryset.live()
+        return queryset
+
+    def perform_create(self, serializer):
+        enqueue_announcement_fanout(serializer.save())
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(SelectablePaginationMixin, QueryProfileMixin, viewsets.ModelViewSet):
     """
     API endpoint for notifications
     """
@@ -293,31 +495,161 @@ class NotificationViewSet(viewsets.ModelViewSet):
     filterset_fields = ['user', 'notification_type', 'is_read']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    select_related_fields = ('user',)
     
     @action(detail=False, methods=['get'])
     def my_notifications(self, request):
-        """Get notifications for current user"""
-        notifications = Notification.objects.filter(user=request.user)
-        serializer = self.get_serializer(notifications, many=True)
-        return Response(serializer.data)
+        """
+        Live notifications of the current user, newest first, in keyset pages
+
+        Query params:
+            since: notification id or ISO timestamp; only notifications published
+                   (created, or reaching their scheduled date) after it are returned
+            cursor / page_size: see KeysetPagination
+
+        Scheduled and expired notifications are left out. The response carries
+        an ETag and Last-Modified, and a request repeating them gets 304.
+        """
+        notifications = Notification.objects.live().filter(user=request.user)
+        since = request.query_params.get('since')
+        if since:
+            # Compared by publish time, so scheduled notifications that went
+            # live after the cursor are included despite their older ids
+            if since.isdigit():
+                published_at = Notification.objects.filter(user=request.user).cursor_published_at(int(since)).first()
+                notifications = (notifications.published_after(published_at, int(since)) if published_at
+                                 else notifications.filter(id__gt=int(since)))
+            else:
+                since_time = parse_datetime(since)
+                if since_time is None:
+                    return Response({"error": "since must be a notification id or an ISO timestamp"},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                notifications = notifications.published_after(since_time)
+
+        # Writes touch the modified time; the live set also moves on its own
+        # as notifications reach their scheduled / expiry dates
+        live = notifications.aggregate(count=Count('id'), last_id=Max('id'),
+                                       published=Max(Coalesce('scheduled_date', 'created_at')))
+        modified = get_notifications_modified(request.user.id)
+        if live['published']:
+            modified = max(modified, live['published'].timestamp())
+        etag = md5(f"{request.get_full_path()}|{modified}|{live['count']}|{live['last_id']}".encode(),
+                   usedforsecurity=False).hexdigest()
+        last_modified = math.ceil(modified)
+
+        response = get_conditional_response(request, etag=quote_etag(etag), last_modified=last_modified)
+        if response is None:
+            paginator = KeysetPagination()
+            page = paginator.paginate_queryset(self.apply_query_profile(notifications), request, view=self)
+            response = paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+        response['ETag'] = quote_etag(etag)
+        response['Last-Modified'] = http_date(last_modified)
+        return response
     
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         """Get unread notification count for current user"""
-        count = Notification.objects.filter(user=request.user, is_read=False).count()
-        return Response({'unread_count': count})
+        return Response({'unread_count': get_unread_count(request.user.id)})
     
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         """Mark notification as read"""
         notification = self.get_object()
+        mark_notifications_read(Notification.objects.filter(id=notification.id), notification.user_id)
         notification.is_read = True
-        notification.save()
         serializer = self.get_serializer(notification)
         return Response(serializer.data)
     
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """Mark all notifications as read for current user"""
-        Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        mark_notifications_read(Notification.objects.live().filter(user=request.user), request.user.id)
         return Response({'message': 'All notifications marked as read'})
+
+
+class ReportJobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin,
+                       viewsets.GenericViewSet):
+    """
+    API endpoint for background report generation
+
+    POST enqueues a job and returns 202 straight away; poll the job until its
+    status is 'completed', then GET download/ for the file.
+    """
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['report_type', 'file_format', 'status']
+    ordering_fields = ['created_at']
+    ordering = ['-created_at']
+
+    def get_queryset(self):
+        return ReportJob.objects.filter(requested_by=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = serializer.save(requested_by=request.user)
+        enqueue_report_job(job)
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Download the generated file"""
+        job = self.get_object()
+        if job.status == ReportJob.EXPIRED:
+            return Response({'error': 'Report has expired'}, status=status.HTTP_410_GONE)
+        if job.status != ReportJob.COMPLETED:
+            return Response({'error': 'Report is not ready', 'status': job.status, 'progress': job.progress},
+                            status=status.HTTP_409_CONFLICT)
+        path = report_job_path(job)
+        if not os.path.exists(path):
+            return Response({'error': 'Report file is missing'}, status=status.HTTP_410_GONE)
+        return FileResponse(open(path, 'rb'), as_attachment=True,
+                            filename=f"{job.report_type}_report_{job.id}.{job.file_format}",
+                            content_type=REPORT_CONTENT_TYPES[job.file_format])
+
+
+class DashboardCacheViewSet(viewsets.ViewSet):
+    """
+    API endpoint for dashboard cache hit / miss metrics (HOD only)
+    """
+    permission_classes = [IsHOD]
+
+    def list(self, request):
+        return Response(get_dashboard_cache_stats())
+
+    @action(detail=False, methods=['post'])
+    def reset(self, request):
+        """Reset the hit / miss counters"""
+        reset_dashboard_cache_stats()
+        return Response(get_dashboard_cache_stats())
+
+
+class QueryStatsViewSet(viewsets.ViewSet):
+    """
+    API endpoint for the views running the most queries in this process (HOD only)
+
+    Query params:
+        order_by: avg_queries (default), max_queries, avg_db_ms, p50_ms or p95_ms
+        limit: number of views to return (default 10)
+    """
+    permission_classes = [IsHOD]
+    ordering_fields = ('avg_queries', 'max_queries', 'avg_db_ms', 'p50_ms', 'p95_ms')
+
+    def list(self, request):
+        order_by = request.query_params.get('order_by', 'avg_queries')
+        if order_by not in self.ordering_fields:
+            return Response({"error": f"order_by must be one of {', '.join(self.ordering_fields)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = max(1, int(request.query_params.get('limit', 10)))
+        except ValueError:
+            return Response({"error": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(query_stats.top(order_by, limit))
+
+    @action(detail=False, methods=['post'])
+    def reset(self, request):
+        """Forget the requests recorded so far"""
+        query_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,155 @@
+"""
+Session year archival
+
+Once a session year has ended, archive_session_year() moves its Attendance
+and AttendanceReport rows into ArchivedAttendance / ArchivedAttendanceReport,
+ARCHIVE_BATCH_SIZE attendances per transaction, so the hot tables read by
+taking attendance, the dashboards and the API only hold open sessions.
+AttendanceSummary rows are left in place as the session's rolled-up
+present / absent counts, and ArchivedAttendanceTotal keeps the number of
+lectures per subject that the dashboards add to the live counts.
+
+Read paths call attendance_models() / find_attendance() / attendance_reports(),
+which only touch the archive tables when asked for an archived session year.
+"""
+import logging
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .dashboard_cache import bump_dashboard_versions
+from .models import (
+    SessionYearModel, Attendance, AttendanceReport, ArchivedAttendance, ArchivedAttendanceReport,
+    ArchivedAttendanceTotal
+)
+
+logger = logging.getLogger(__name__)
+
+ATTENDANCE_FIELDS = ('id', 'subject_id_id', 'attendance_date', 'session_year_id_id', 'created_at', 'updated_at')
+REPORT_FIELDS = ('id', 'student_id_id', 'attendance_id_id', 'status', 'created_at', 'updated_at')
+
+
+def is_archived(session_year_id):
+    """
+    Whether the given session year id refers to an archived session year
+    """
+    if not str(session_year_id or '').isdigit():
+        return False
+    return SessionYearModel.objects.filter(id=session_year_id, archived_at__isnull=False).exists()
+
+
+def attendance_models(session_year_id=None):
+    """
+    Returns:
+        Tuple of the (attendance, report) models holding the session year's rows
+    """
+    if is_archived(session_year_id):
+        return ArchivedAttendance, ArchivedAttendanceReport
+    return Attendance, AttendanceReport
+
+
+def find_attendance(attendance_id):
+    """
+    An Attendance by id, falling back to the archive
+
+    Raises:
+        ArchivedAttendance.DoesNotExist: when the id is in neither table
+    """
+    attendance = Attendance.objects.filter(id=attendance_id).first()
+    return attendance or ArchivedAttendance.objects.get(id=attendance_id)
+
+
+def attendance_reports(attendance):
+    """
+    The reports of an Attendance or ArchivedAttendance
+    """
+    if isinstance(attendance, ArchivedAttendance):
+        return ArchivedAttendanceReport.objects.filter(attendance_id=attendance)
+    return AttendanceReport.objects.filter(attendance_id=attendance)
+
+
+def closed_session_years(today=None):
+    """
+    Session years that have ended and are not archived yet
+    """
+    today = today or timezone.localdate()
+    return SessionYearModel.objects.filter(archived_at__isnull=True, session_end_year__lt=today)
+
+
+def _delete_rows(model, field_name, values):
+    """
+    DELETE the rows of model whose field is in values, without signals or
+    cascades
+    """
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    column = model._meta.get_field(field_name).column
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {quote(model._meta.db_table)} WHERE {quote(column)} IN "
+                       f"({', '.join(['%s'] * len(values))})", values)
+
+
+def _move_batch(session_year, batch_size):
+    """
+    Move up to batch_size attendances of the session year with their reports
+
+    Returns:
+        Tuple of (attendances moved, reports moved)
+    """
+    with transaction.atomic():
+        attendances = list(Attendance.objects.select_for_update()
+                           .filter(session_year_id=session_year).order_by('id')
+                           .values(*ATTENDANCE_FIELDS)[:batch_size])
+        if not attendances:
+            return 0, 0
+        attendance_ids = [row['id'] for row in attendances]
+        reports = list(AttendanceReport.objects.filter(attendance_id__in=attendance_ids).values(*REPORT_FIELDS))
+
+        ArchivedAttendance.objects.bulk_create([ArchivedAttendance(**row) for row in attendances])
+        ArchivedAttendanceReport.objects.bulk_create([ArchivedAttendanceReport(**row) for row in reports],
+                                                     batch_size=batch_size)
+
+        lectures = Counter(row['subject_id_id'] for row in attendances)
+        ArchivedAttendanceTotal.objects.bulk_create(
+            [ArchivedAttendanceTotal(subject_id_id=subject_id, session_year_id=session_year)
+             for subject_id in lectures],
+            ignore_conflicts=True,
+        )
+        for subject_id, count in lectures.items():
+            ArchivedAttendanceTotal.objects.filter(subject_id=subject_id, session_year_id=session_year).update(
+                attendance_count=F('attendance_count') + count)
+
+        # A plain DELETE: QuerySet.delete() would send the per-row delete
+        # signals, which invalidate the dashboards for every report, while
+        # AttendanceSummary stays as it is
+        _delete_rows(AttendanceReport, 'attendance_id', attendance_ids)
+        _delete_rows(Attendance, 'id', attendance_ids)
+    return len(attendances), len(reports)
+
+
+def archive_session_year(session_year, batch_size=None):
+    """
+    Move a session year's attendance into the archive tables and mark it
+    archived. A run that stops part way is finished by running it again.
+
+    Returns:
+        Dictionary with the number of attendances and reports moved
+    """
+    batch_size = batch_size or getattr(settings, 'ARCHIVE_BATCH_SIZE', 500)
+    moved = {"session_year_id": session_year.id, "attendances": 0, "reports": 0}
+    while True:
+        attendances, reports = _move_batch(session_year, batch_size)
+        if not attendances:
+            break
+        moved["attendances"] += attendances
+        moved["reports"] += reports
+
+    session_year.archived_at = timezone.now()
+    session_year.save(update_fields=['archived_at'])
+    # The totals don't change, but every cached dashboard was built from the hot tables
+    bump_dashboard_versions(['all'])
+    logger.info(f"Archived session year {session_year.id}: {moved}")
+    return moved
@@ -0,0 +1,261 @@
+"""
+Attendance bookkeeping
+
+Batched write paths for taking attendance, plus the code that keeps the
+AttendanceSummary table in step with AttendanceReport writes so the
+dashboards can read precomputed present/absent counts instead of counting
+every report on every request.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Students, Attendance, AttendanceReport, AttendanceSummary
+from .dashboard_cache import invalidate_attendance_dashboards
+
+# Students can be identified by their CustomUser id (the AJAX pages) or by
+# their Students id (the REST API)
+STUDENT_LOOKUPS = {
+    'admin': 'admin_id',
+    'id': 'id',
+}
+
+
+def _parse_entries(entries):
+    """
+    Normalise [{"id": ..., "status": ...}, ...] into {id: bool}
+
+    Returns:
+        Tuple of (statuses, invalid_ids). A repeated id keeps its last status.
+    """
+    statuses = {}
+    invalid_ids = []
+    for entry in entries:
+        try:
+            statuses[str(entry['id'])] = bool(int(entry['status']))
+        except (KeyError, TypeError, ValueError):
+            invalid_ids.append(entry.get('id') if isinstance(entry, dict) else entry)
+    return statuses, invalid_ids
+
+
+def _resolve_students(keys, lookup):
+    """
+    Map each key to a Students id with a single query
+    """
+    field = STUDENT_LOOKUPS[lookup]
+    keys = [key for key in keys if key.isdigit()]
+    rows = Students.objects.filter(**{f"{field}__in": keys}).values_list(field, 'id')
+    return {str(key): student_id for key, student_id in rows}
+
+
+def save_attendance(subject, session_year, attendance_date, entries, lookup='admin', batch_size=500):
+    """
+    Take attendance for a whole class in one transaction
+
+    Args:
+        subject: Subjects instance
+        session_year: SessionYearModel instance
+        attendance_date: Date of the lecture
+        entries: List of {"id": student key, "status": 0/1} dictionaries
+        lookup: 'admin' when ids are CustomUser ids, 'id' for Students ids
+        batch_size: Number of reports inserted per query
+
+    Returns:
+        Dictionary with the attendance id, created/failed counts and the ids
+        that could not be saved. Taking attendance twice for the same subject
+        and day is an error; the existing attendance id is returned so it can
+        be updated instead.
+    """
+    if session_year.archived_at:
+        return {"status": "Error", "message": "This session year has been archived",
+                "attendance_id": None, "created": 0, "failed": len(entries), "failed_ids": []}
+
+    statuses, failed_ids = _parse_entries(entries)
+    students = _resolve_students(list(statuses), lookup)
+    failed_ids += [key for key in statuses if key not in students]
+
+    if not students:
+        return {"status": "Error", "attendance_id": None, "created": 0,
+                "failed": len(failed_ids), "failed_ids": failed_ids}
+
+    try:
+        with transaction.atomic():
+            attendance = Attendance.objects.create(subject_id=subject,
+                                                   attendance_date=attendance_date,
+                                                   session_year_id=session_year)
+            reports = [AttendanceReport(student_id_id=student_id,
+                                        attendance_id=attendance,
+                                        status=statuses[key])
+                       for key, student_id in students.items()]
+            AttendanceReport.objects.bulk_create(reports, batch_size=batch_size)
+            record_attendance_changes(attendance, [(report.student_id_id, None, report.status) for report in reports])
+    except IntegrityError:
+        # unique_attendance: this subject's attendance for the day already exists
+        existing = Attendance.objects.filter(subject_id=subject, session_year_id=session_year,
+                                             attendance_date=attendance_date).values_list('id', flat=True).first()
+        return {"status": "Error", "message": "Attendance has already been taken for this date",
+                "attendance_id": existing, "created": 0,
+                "failed": len(failed_ids) + len(students), "failed_ids": failed_ids + list(students)}
+
+    return {"status": "OK", "attendance_id": attendance.id, "created": len(reports),
+            "failed": len(failed_ids), "failed_ids": failed_ids}
+
+
+def update_attendance(attendance, entries, lookup='admin', batch_size=500):
+    """
+    Update the statuses of an existing Attendance, writing only the rows that changed
+
+    Args:
+        attendance: Attendance instance
+        entries: List of {"id": student key, "status": 0/1} dictionaries
+        lookup: 'admin' when ids are CustomUser ids, 'id' for Students ids
+        batch_size: Number of reports updated per query
+
+    Returns:
+        Dictionary with changed/unchanged/failed counts and the ids that
+        have no report on this attendance
+    """
+    statuses, failed_ids = _parse_entries(entries)
+    key_field = 'student_id__' + STUDENT_LOOKUPS[lookup]
+
+    with transaction.atomic():
+        reports = (AttendanceReport.objects.select_for_update()
+                   .filter(attendance_id=attendance)
+                   .annotate(student_key=F(key_field))
+                   .only('id', 'status', 'student_id'))
+
+        seen = set()
+        changed = []
+        changes = []
+        now = timezone.now()
+        for report in reports:
+            key = str(report.student_key)
+            if key not in statuses:
+                continue
+            seen.add(key)
+            if report.status != statuses[key]:
+                changes.append((report.student_id_id, report.status, statuses[key]))
+                report.status = statuses[key]
+                report.updated_at = now
+                changed.append(report)
+
+        if changed:
+            AttendanceReport.objects.bulk_update(changed, ['status', 'updated_at'], batch_size=batch_size)
+            record_attendance_changes(attendance, changes)
+
+    failed_ids += [key for key in statuses if key not in seen]
+    return {"status": "OK", "attendance_id": attendance.id, "changed": len(changed),
+            "unchanged": len(seen) - len(changed), "failed": len(failed_ids), "failed_ids": failed_ids}
+
+
+def record_attendance_changes(attendance, changes):
+    """
+    Apply present/absent deltas for one Attendance row to AttendanceSummary
+    and invalidate the cached dashboards that show them
+
+    Args:
+        attendance: Attendance instance the reports belong to
+        changes: Iterable of (student_id, old_status, new_status) tuples.
+                 old_status is None for a newly created report and new_status
+                 is None for a deleted one.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for student_id, old_status, new_status in changes:
+        if old_status == new_status:
+            continue
+        if old_status is not None:
+            deltas[student_id][0 if old_status else 1] -= 1
+        if new_status is not None:
+            deltas[student_id][0 if new_status else 1] += 1
+
+    deltas = {student_id: delta for student_id, delta in deltas.items() if delta != [0, 0]}
+    if not deltas:
+        return
+
+    summaries = AttendanceSummary.objects.filter(subject_id=attendance.subject_id_id,
+                                                 session_year_id=attendance.session_year_id_id)
+    with transaction.atomic():
+        # Make sure every student has a row, then bump the counters with one
+        # UPDATE per distinct delta (at most a handful per call)
+        AttendanceSummary.objects.bulk_create(
+            [AttendanceSummary(student_id_id=student_id,
+                               subject_id_id=attendance.subject_id_id,
+                               session_year_id_id=attendance.session_year_id_id)
+             for student_id in deltas],
+            ignore_conflicts=True,
+        )
+
+        students_by_delta = defaultdict(list)
+        for student_id, delta in deltas.items():
+            students_by_delta[tuple(delta)].append(student_id)
+
+        for (present, absent), student_ids in students_by_delta.items():
+            summaries.filter(student_id__in=student_ids).update(present_count=F('present_count') + present,
+                                                                absent_count=F('absent_count') + absent)
+
+    # Bulk writes send no signals, so invalidate the cached dashboards here
+    invalidate_attendance_dashboards(attendance.subject_id_id, list(deltas))
+
+
+def record_report_change(before, after):
+    """
+    record_attendance_changes() for a single AttendanceReport write that
+    went through save() / delete() (the API, the admin site)
+
+    Args:
+        before: (attendance_id, student_id, status) of the stored row, or
+                None for a newly created report
+        after: The same for the saved row, or None for a deleted one
+    """
+    if before == after:
+        return
+    changes = defaultdict(list)
+    if before and after and before[:2] == after[:2]:
+        changes[after[0]].append((after[1], before[2], after[2]))
+    else:
+        if before:
+            changes[before[0]].append((before[1], before[2], None))
+        if after:
+            changes[after[0]].append((after[1], None, after[2]))
+    # The attendance is still there while its reports are cascade-deleted
+    attendances = Attendance.objects.in_bulk(list(changes))
+    for attendance_id, attendance_changes in changes.items():
+        if attendance_id in attendances:
+            record_attendance_changes(attendances[attendance_id], attendance_changes)
+
+
+def rebuild_attendance_summary(batch_size=1000):
+    """
+    Recompute AttendanceSummary from scratch out of AttendanceReport. The
+    summaries of archived session years are their only rollup and are kept.
+
+    Returns:
+        Number of summary rows written
+    """
+    rows = AttendanceReport.objects.values(
+        'student_id', 'attendance_id__subject_id', 'attendance_id__session_year_id'
+    ).annotate(
+        present=Count('id', filter=Q(status=True)),
+        absent=Count('id', filter=Q(status=False)),
+    ).order_by()
+
+    written = 0
+    with transaction.atomic():
+        AttendanceSummary.objects.filter(session_year_id__archived_at__isnull=True).delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(AttendanceSummary(student_id_id=row['student_id'],
+                                           subject_id_id=row['attendance_id__subject_id'],
+                                           session_year_id_id=row['attendance_id__session_year_id'],
+                                           present_count=row['present'],
+                                           absent_count=row['absent']))
+            if len(batch) >= batch_size:
+                AttendanceSummary.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            AttendanceSummary.objects.bulk_create(batch)
+            written += len(batch)
+    return written
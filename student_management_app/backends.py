@@ -0,0 +1,33 @@
+"""
+Email login
+
+EmailBackend resolves the user of a login form in one query on the unique
+lower(email) index of CustomUser, instead of loading the user by email and
+then again by username through ModelBackend. It is listed first in
+AUTHENTICATION_BACKENDS; username logins (the Django admin) fall through to
+ModelBackend.
+"""
+from django.contrib.auth.backends import ModelBackend
+from django.db.models.functions import Lower
+
+from .models import CustomUser
+
+
+def users_by_email(email):
+    # Matches the unique_user_email index: lower(email), blank emails excluded
+    return CustomUser.objects.alias(email_lower=Lower('email')).filter(email_lower=email.lower()).exclude(email='')
+
+
+class EmailBackend(ModelBackend):
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if not email or password is None:
+            return None
+        user = users_by_email(email).first()
+        if user is None:
+            # Hash anyway, so unknown emails take as long as wrong passwords
+            CustomUser().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
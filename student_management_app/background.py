@@ -0,0 +1,64 @@
+"""
+Background work
+
+Work that should not hold up a request (report files, notification fan-out)
+is run after the current transaction commits: as a Celery task when a broker
+is configured, otherwise in an in-process thread pool.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+from django.conf import settings
+from django.db import connection, transaction
+
+_executor = None
+
+
+def get_background_backend():
+    """
+    Returns:
+        'celery', 'thread' or 'sync' (run inline, used by tests)
+    """
+    backend = getattr(settings, 'BACKGROUND_JOB_BACKEND', None)
+    if backend:
+        return backend
+    return 'celery' if getattr(settings, 'CELERY_BROKER_URL', None) else 'thread'
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'BACKGROUND_JOB_THREADS', 2),
+                                       thread_name_prefix='background')
+    return _executor
+
+
+def _run_in_thread(func, args):
+    try:
+        func(*args)
+    finally:
+        # Each pool thread has its own connection; don't leave it open
+        connection.close()
+
+
+def run_in_background(func, task_name, *args):
+    """
+    Run func(*args) once the current transaction commits
+
+    Args:
+        func: Function to run in the thread pool (or inline with the sync backend)
+        task_name: Name of the equivalent Celery task in tasks.py
+    """
+    backend = get_background_backend()
+    if backend == 'sync':
+        func(*args)
+        return
+
+    def dispatch():
+        if backend == 'celery':
+            task = getattr(import_module('student_management_app.tasks'), task_name)
+            task.delay(*args)
+        else:
+            _get_executor().submit(_run_in_thread, func, args)
+
+    transaction.on_commit(dispatch)
@@ -0,0 +1,199 @@
+"""
+Endpoint benchmarks
+
+run_benchmarks() requests each BENCHMARKS endpoint `repeat` times through
+the test Client, as the HOD, the first staff member or the first student of
+a dataset made by synthetic_data.SyntheticDataset. The login benchmark
+posts the login form of a different student each time, from a fresh
+client. For each endpoint it records latency percentiles, requests per
+second of a single worker and the query count. It then runs one more
+request under tracemalloc for the peak Python memory, kept out of the
+timed runs because tracing slows them down.
+
+compare() turns two result sets into ratios against the baseline and flags
+the endpoints that got slower, ran more queries or used more memory than
+the allowed ratio. The bench command runs both against a scratch database.
+"""
+import json
+import time
+import tracemalloc
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from .instrumentation import QueryRecorder
+from .models import CustomUser, SessionYearModel, Subjects
+
+# name: (role, method, path); POST data comes from request_data()
+BENCHMARKS = {
+    'login': ('anonymous', 'post', '/doLogin'),
+    'admin_home': ('hod', 'get', '/admin_home/'),
+    'staff_home': ('staff', 'get', '/staff_home/'),
+    'student_home': ('student', 'get', '/student_home/'),
+    'get_students': ('staff', 'post', '/get_students/'),
+    'save_attendance_data': ('staff', 'post', '/save_attendance_data/'),
+    'api_students': ('staff', 'get', '/api/students/'),
+    'api_attendance': ('staff', 'get', '/api/attendance/'),
+    'api_attendance_reports': ('staff', 'get', '/api/attendance-reports/'),
+    'api_results': ('staff', 'get', '/api/results/'),
+    'api_announcements': ('staff', 'get', '/api/announcements/'),
+    'api_notifications': ('student', 'get', '/api/notifications/'),
+}
+
+# Ratios to the baseline compared by compare()
+COMPARED_METRICS = ('p50_ms', 'p95_ms', 'queries', 'peak_kb')
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a sorted list
+    """
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class BenchmarkContext:
+    """
+    Logged in clients and request data for the benchmarked endpoints
+    """
+
+    def __init__(self, password='password'):
+        staff = CustomUser.objects.filter(user_type=CustomUser.STAFF).order_by('id').first()
+        users = {
+            'hod': CustomUser.objects.filter(user_type=CustomUser.HOD).order_by('id').first(),
+            'staff': staff,
+            'student': CustomUser.objects.filter(user_type=CustomUser.STUDENT).order_by('id').first(),
+        }
+        self.clients = {}
+        for role, user in users.items():
+            self.clients[role] = Client()
+            self.clients[role].force_login(user)
+
+        # Logins rotate through the students, like the morning rush
+        self.password = password
+        self.login_emails = list(CustomUser.objects.filter(user_type=CustomUser.STUDENT).exclude(email='')
+                                 .order_by('id').values_list('email', flat=True)[:1000])
+        self.logins = 0
+
+        self.subject = Subjects.objects.filter(staff_id=staff).order_by('id').first()
+        self.session_year = SessionYearModel.objects.order_by('-session_end_year').first()
+        self.student_ids = list(CustomUser.objects.filter(students__course_id=self.subject.course_id_id,
+                                                          students__session_year_id=self.session_year)
+                                .values_list('id', flat=True))
+        # save_attendance_data needs a new day every time
+        self.next_day = self.session_year.session_end_year + timedelta(days=1)
+
+    def request_data(self, name):
+        if name == 'login':
+            self.logins += 1
+            return {"email": self.login_emails[self.logins % len(self.login_emails)], "password": self.password}
+        if name == 'get_students':
+            return {"subject": self.subject.id, "session_year_id": self.session_year.id}
+        if name == 'save_attendance_data':
+            self.next_day += timedelta(days=1)
+            return {"subject_id": self.subject.id, "session_year_id": self.session_year.id,
+                    "attendance_date": self.next_day.isoformat(),
+                    "student_ids": json.dumps([{"id": student_id, "status": student_id % 7 != 0}
+                                               for student_id in self.student_ids])}
+        return None
+
+    def request(self, name):
+        role, method, path = BENCHMARKS[name]
+        data = self.request_data(name)
+        client = self.clients.get(role) or Client()
+        response = client.post(path, data) if method == 'post' else client.get(path)
+        if name == 'login' and response.get('Location') == reverse('login'):
+            raise RuntimeError(f"Benchmark login as {data['email']} failed; wrong password?")
+        return response
+
+
+def measure(context, name, repeat, cold_cache=False):
+    """
+    Returns:
+        Dictionary with the endpoint's status, latency percentiles, queries
+        per request and peak memory
+    """
+    timings = []
+    queries = []
+    status = None
+    for _ in range(repeat + 1):
+        if cold_cache:
+            cache.clear()
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            start = time.perf_counter()
+            response = context.request(name)
+            elapsed = (time.perf_counter() - start) * 1000
+        status = response.status_code
+        timings.append(elapsed)
+        queries.append(recorder.count)
+    # The first request warms up imports, templates and caches
+    timings = sorted(timings[1:])
+    queries = queries[1:]
+
+    if cold_cache:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        context.request(name)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "status": status,
+        "runs": len(timings),
+        "p50_ms": round(percentile(timings, 50), 2),
+        "p95_ms": round(percentile(timings, 95), 2),
+        "p99_ms": round(percentile(timings, 99), 2),
+        "mean_ms": round(sum(timings) / len(timings), 2),
+        "per_second": round(1000 * len(timings) / sum(timings), 1),
+        "queries": max(queries),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(repeat=20, names=None, cold_cache=False, progress=None, password='password'):
+    """
+    Benchmark the given BENCHMARKS endpoints (all by default); `password`
+    is the one of the dataset's users, for the login benchmark
+
+    Returns:
+        Dictionary mapping each endpoint name to its measure() result
+    """
+    context = BenchmarkContext(password)
+    results = {}
+    for name in names or BENCHMARKS:
+        results[name] = measure(context, name, repeat, cold_cache)
+        if progress:
+            progress(name, results[name])
+    return results
+
+
+def compare(results, baseline, max_ratio=1.25):
+    """
+    Ratios of each endpoint's metrics to the baseline
+
+    Returns:
+        Dictionary mapping each endpoint in both result sets to its ratios
+        and the list of metrics that regressed beyond max_ratio
+    """
+    comparison = {}
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratios = {}
+        for metric in COMPARED_METRICS:
+            before = baseline[name].get(metric)
+            if before:
+                ratios[metric] = round(result[metric] / before, 2)
+        comparison[name] = {
+            "ratios": ratios,
+            "regressions": [metric for metric, ratio in ratios.items() if ratio > max_ratio],
+        }
+    return comparison
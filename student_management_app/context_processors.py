@@ -0,0 +1,17 @@
+"""
+Template context processors
+"""
+from django.utils.functional import SimpleLazyObject
+
+from .notifications import get_unread_count
+
+
+def notification_badge(request):
+    """
+    unread_notification_count for the sidebar badge; read from the cache
+    only when a template uses it
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {"unread_notification_count": SimpleLazyObject(lambda: get_unread_count(user.id))}
@@ -0,0 +1,251 @@
+"""
+Dashboard statistics service
+
+Computes the numbers shown on the HOD, staff and student dashboards with a
+fixed number of grouped queries, independent of how many courses, subjects,
+staff and students exist. Attendance figures are read from the precomputed
+AttendanceSummary table rather than by counting AttendanceReport rows, and
+the lectures of archived session years from ArchivedAttendanceTotal.
+"""
+from django.db.models import Count, Q, Sum
+
+from .models import (
+    Staffs, Courses, Subjects, Students, Attendance, AttendanceSummary, ArchivedAttendanceTotal,
+    LeaveReportStudent, LeaveReportStaff, FeedBackStudent, FeedBackStaffs
+)
+
+
+def _grouped_counts(queryset, group_field):
+    """
+    Count rows of a queryset grouped by a single field
+
+    Returns:
+        Dictionary mapping the group value to its row count
+    """
+    rows = queryset.values(group_field).annotate(total=Count('id')).order_by()
+    return {row[group_field]: row['total'] for row in rows}
+
+
+def _attendance_counts(group_field, **filters):
+    """
+    Number of attendances taken grouped by a single field, live and archived
+
+    Returns:
+        Dictionary mapping the group value to its attendance count
+    """
+    counts = _grouped_counts(Attendance.objects.filter(**filters), group_field)
+    archived = ArchivedAttendanceTotal.objects.filter(**filters).values(group_field).annotate(
+        total=Sum('attendance_count')).order_by()
+    for row in archived:
+        counts[row[group_field]] = counts.get(row[group_field], 0) + row['total']
+    return counts
+
+
+def _attendance_per_student(summaries):
+    """
+    Present / absent totals per student out of AttendanceSummary rows
+
+    Returns:
+        Dictionary mapping student id to a dict with 'present' and 'absent'
+    """
+    rows = summaries.values('student_id').annotate(
+        present=Sum('present_count'),
+        absent=Sum('absent_count'),
+    ).order_by()
+    return {row['student_id']: row for row in rows}
+
+
+def _status_counts(model, **filters):
+    """
+    Total / approved / pending / rejected counts for a leave model in one query
+    """
+    return model.objects.filter(**filters).aggregate(
+        total=Count('id'),
+        approved=Count('id', filter=Q(leave_status=1)),
+        pending=Count('id', filter=Q(leave_status=0)),
+        rejected=Count('id', filter=Q(leave_status=2)),
+    )
+
+
+def _feedback_counts(model):
+    """
+    Total / replied counts for a feedback model in one query
+    """
+    return model.objects.aggregate(
+        total=Count('id'),
+        replied=Count('id', filter=~Q(feedback_reply="")),
+    )
+
+
+def get_admin_dashboard_stats():
+    """
+    Build the context used by hod_template/home_content.html
+
+    Returns:
+        Dictionary with the same keys admin_home has always passed to the template
+    """
+    # Total Subjects and students in Each Course
+    subjects_per_course = _grouped_counts(Subjects.objects.all(), 'course_id')
+    students_per_course = _grouped_counts(Students.objects.all(), 'course_id')
+
+    course_name_list = []
+    subject_count_list = []
+    student_count_list_in_course = []
+    for course_id, course_name in Courses.objects.values_list('id', 'course_name'):
+        course_name_list.append(course_name)
+        subject_count_list.append(subjects_per_course.get(course_id, 0))
+        student_count_list_in_course.append(students_per_course.get(course_id, 0))
+
+    subject_list = []
+    student_count_list_in_subject = []
+    for subject_name, course_id in Subjects.objects.values_list('subject_name', 'course_id'):
+        subject_list.append(subject_name)
+        student_count_list_in_subject.append(students_per_course.get(course_id, 0))
+
+    # For Staffs
+    attendance_per_staff_user = _attendance_counts('subject_id__staff_id')
+    leaves_per_staff = _grouped_counts(LeaveReportStaff.objects.filter(leave_status=1), 'staff_id')
+
+    staff_attendance_present_list = []
+    staff_attendance_leave_list = []
+    staff_name_list = []
+    for staff_id, admin_id, username in Staffs.objects.values_list('id', 'admin_id', 'admin__username'):
+        staff_attendance_present_list.append(attendance_per_staff_user.get(admin_id, 0))
+        staff_attendance_leave_list.append(leaves_per_staff.get(staff_id, 0))
+        staff_name_list.append(username)
+
+    # For Students
+    attendance_per_student = _attendance_per_student(AttendanceSummary.objects.all())
+    leaves_per_student = _grouped_counts(LeaveReportStudent.objects.filter(leave_status=1), 'student_id')
+
+    student_attendance_present_list = []
+    student_attendance_leave_list = []
+    student_name_list = []
+    for student_id, username in Students.objects.values_list('id', 'admin__username'):
+        attendance = attendance_per_student.get(student_id, {})
+        student_attendance_present_list.append(attendance.get('present', 0))
+        student_attendance_leave_list.append(leaves_per_student.get(student_id, 0) + attendance.get('absent', 0))
+        student_name_list.append(username)
+
+    student_leaves = _status_counts(LeaveReportStudent)
+    staff_leaves = _status_counts(LeaveReportStaff)
+    student_feedback = _feedback_counts(FeedBackStudent)
+    staff_feedback = _feedback_counts(FeedBackStaffs)
+
+    return {
+        "all_student_count": len(student_name_list),
+        "subject_count": len(subject_list),
+        "course_count": len(course_name_list),
+        "staff_count": len(staff_name_list),
+        "course_name_list": course_name_list,
+        "subject_count_list": subject_count_list,
+        "student_count_list_in_course": student_count_list_in_course,
+        "subject_list": subject_list,
+        "student_count_list_in_subject": student_count_list_in_subject,
+        "staff_attendance_present_list": staff_attendance_present_list,
+        "staff_attendance_leave_list": staff_attendance_leave_list,
+        "staff_name_list": staff_name_list,
+        "student_attendance_present_list": student_attendance_present_list,
+        "student_attendance_leave_list": student_attendance_leave_list,
+        "student_name_list": student_name_list,
+        "student_leave_count": student_leaves['total'],
+        "student_leave_approved": student_leaves['approved'],
+        "student_leave_pending": student_leaves['pending'],
+        "student_leave_rejected": student_leaves['rejected'],
+        "staff_leave_count": staff_leaves['total'],
+        "staff_leave_approved": staff_leaves['approved'],
+        "staff_leave_pending": staff_leaves['pending'],
+        "staff_leave_rejected": staff_leaves['rejected'],
+        "student_feedback_count": student_feedback['total'],
+        "student_feedback_replied": student_feedback['replied'],
+        "staff_feedback_count": staff_feedback['total'],
+        "staff_feedback_replied": staff_feedback['replied'],
+    }
+
+
+def get_staff_dashboard_stats(user):
+    """
+    Build the context used by staff_template/staff_home_template.html
+
+    Args:
+        user: Logged in staff CustomUser
+    """
+    subjects = list(Subjects.objects.filter(staff_id=user.id).values_list('id', 'subject_name', 'course_id'))
+    subject_ids = [subject_id for subject_id, _, _ in subjects]
+    course_ids = {course_id for _, _, course_id in subjects}
+
+    attendance_per_subject = _attendance_counts('subject_id', subject_id__in=subject_ids)
+    leaves = _status_counts(LeaveReportStaff, staff_id__admin=user.id)
+
+    students = list(Students.objects.filter(course_id__in=course_ids)
+                    .values_list('id', 'admin__first_name', 'admin__last_name'))
+    attendance_per_student = _attendance_per_student(
+        AttendanceSummary.objects.filter(student_id__in=[student_id for student_id, _, _ in students]))
+
+    student_list = []
+    attendance_present_list = []
+    attendance_absent_list = []
+    for student_id, first_name, last_name in students:
+        attendance = attendance_per_student.get(student_id, {})
+        student_list.append(first_name+" "+last_name)
+        attendance_present_list.append(attendance.get('present', 0))
+        attendance_absent_list.append(attendance.get('absent', 0))
+
+    return {
+        "students_count": len(students),
+        "attendance_count": sum(attendance_per_subject.values()),
+        "leave_count": leaves['approved'],
+        "leave_pending": leaves['pending'],
+        "leave_rejected": leaves['rejected'],
+        "subject_count": len(subjects),
+        "subject_list": [subject_name for _, subject_name, _ in subjects],
+        "attendance_list": [attendance_per_subject.get(subject_id, 0) for subject_id in subject_ids],
+        "student_list": student_list,
+        "attendance_present_list": attendance_present_list,
+        "attendance_absent_list": attendance_absent_list,
+    }
+
+
+def get_student_dashboard_stats(student):
+    """
+    Build the context used by student_template/student_home_template.html
+
+    Args:
+        student: Students instance of the logged in user
+    """
+    attendance_per_subject = {
+        row['subject_id']: row
+        for row in AttendanceSummary.objects.filter(student_id=student.id).values('subject_id').annotate(
+            present=Sum('present_count'),
+            absent=Sum('absent_count'),
+        ).order_by()
+    }
+    attendance_present = sum(row['present'] for row in attendance_per_subject.values())
+    attendance_absent = sum(row['absent'] for row in attendance_per_subject.values())
+    total_attendance = attendance_present + attendance_absent
+
+    subject_name = []
+    data_present = []
+    data_absent = []
+    for subject_id, name in Subjects.objects.filter(course_id=student.course_id_id).values_list('id', 'subject_name'):
+        attendance = attendance_per_subject.get(subject_id, {})
+        subject_name.append(name)
+        data_present.append(attendance.get('present', 0))
+        data_absent.append(attendance.get('absent', 0))
+
+    # Calculate attendance percentage
+    if total_attendance > 0:
+        attendance_percentage = (attendance_present / total_attendance) * 100
+    else:
+        attendance_percentage = 0
+
+    return {
+        "total_attendance": total_attendance,
+        "attendance_present": attendance_present,
+        "attendance_absent": attendance_absent,
+        "total_subjects": len(subject_name),
+        "subject_name": subject_name,
+        "data_present": data_present,
+        "data_absent": data_absent,
+        "attendance_percentage": round(attendance_percentage, 1)
+    }
@@ -0,0 +1,140 @@
+"""
+Versioned dashboard cache
+
+Each dashboard is cached under a key built from version tokens: a global
+'all' version plus one for the dashboard's owner (the HOD dashboard, a
+staff member or a student). Writes that change the numbers replace the
+affected tokens (see signals.py and attendance.record_attendance_changes),
+so stale entries are never read again and simply age out. Tokens are
+random rather than counters, so a bump is a single set_many() and a token
+evicted from the cache can never come back with an old value. Works with
+any Django cache backend (LocMemCache in development, Redis in production).
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Subjects
+from .dashboard import get_admin_dashboard_stats, get_staff_dashboard_stats, get_student_dashboard_stats
+
+DASHBOARD_ROLES = ('admin', 'staff', 'student')
+
+
+def _version_key(scope):
+    return f"dashboard:version:{scope}"
+
+
+def _metric_key(role, kind):
+    return f"dashboard:metrics:{role}:{kind}"
+
+
+def _new_version():
+    return uuid.uuid4().hex[:16]
+
+
+def get_dashboard_versions(scopes):
+    """
+    Current version token of each scope, creating missing ones
+
+    Returns:
+        List of tokens in the order of `scopes`
+    """
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_version(), None)
+        # Another process may have won the add()
+        versions.update(cache.get_many(missing))
+    return [versions[key] for key in keys]
+
+
+def bump_dashboard_versions(scopes):
+    """
+    Invalidate every dashboard cached under any of the given scopes
+
+    Args:
+        scopes: Iterable of 'all', 'admin', 'staff:<user id>' or 'student:<student id>'
+    """
+    version = _new_version()
+    keys = {_version_key(scope): version for scope in set(scopes)}
+    # After commit, so a dashboard rebuilt mid-transaction can't be cached under the new version
+    transaction.on_commit(lambda: cache.set_many(keys, None))
+
+
+def invalidate_attendance_dashboards(subject_id, student_ids):
+    """
+    Bump the dashboards that show attendance of the given students in a subject:
+    the HOD, the students themselves and every staff member teaching the course
+    """
+    course_subjects = Subjects.objects.filter(id=subject_id).values('course_id')
+    staff_ids = set(Subjects.objects.filter(course_id__in=course_subjects).values_list('staff_id', flat=True))
+    bump_dashboard_versions(['admin']
+                            + [f"staff:{staff_id}" for staff_id in staff_ids]
+                            + [f"student:{student_id}" for student_id in student_ids])
+
+
+def _record(role, kind):
+    key = _metric_key(role, kind)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.add(key, 1, None)
+
+
+def _cached(role, owner, scopes, build):
+    versions = get_dashboard_versions(['all'] + scopes)
+    key = f"dashboard:{role}:{owner}:" + ".".join(versions)
+    stats = cache.get(key)
+    if stats is not None:
+        _record(role, 'hits')
+        return stats
+    _record(role, 'misses')
+    stats = build()
+    cache.set(key, stats, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300))
+    return stats
+
+
+def get_cached_admin_dashboard_stats():
+    """Cached get_admin_dashboard_stats()"""
+    return _cached('admin', 'hod', ['admin'], get_admin_dashboard_stats)
+
+
+def get_cached_staff_dashboard_stats(user):
+    """Cached get_staff_dashboard_stats()"""
+    return _cached('staff', user.id, [f"staff:{user.id}"], lambda: get_staff_dashboard_stats(user))
+
+
+def get_cached_student_dashboard_stats(student):
+    """Cached get_student_dashboard_stats()"""
+    return _cached('student', student.id, [f"student:{student.id}"], lambda: get_student_dashboard_stats(student))
+
+
+def get_dashboard_cache_stats():
+    """
+    Hit / miss counters per dashboard since the last reset
+
+    Returns:
+        Dictionary mapping role to a dict with hits, misses and hit_rate
+    """
+    keys = [_metric_key(role, kind) for role in DASHBOARD_ROLES for kind in ('hits', 'misses')]
+    counts = cache.get_many(keys)
+    stats = {}
+    for role in DASHBOARD_ROLES:
+        hits = counts.get(_metric_key(role, 'hits'), 0)
+        misses = counts.get(_metric_key(role, 'misses'), 0)
+        stats[role] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+    return stats
+
+
+def reset_dashboard_cache_stats():
+    cache.delete_many([_metric_key(role, kind) for role in DASHBOARD_ROLES for kind in ('hits', 'misses')])
@@ -0,0 +1,137 @@
+"""
+Streaming CSV / NDJSON / Excel exports
+
+Rows are read with values_list().iterator() and written to the response as
+they arrive, so an export of millions of rows uses constant memory and the
+first bytes reach the client immediately. Excel files cannot be sent before
+they are complete, so they are written row by row to a temporary file first.
+"""
+import csv
+import json
+import tempfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (header, field lookup) pairs shared by the export endpoints and report jobs
+STUDENT_EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('username', 'admin__username'),
+    ('email', 'admin__email'),
+    ('first_name', 'admin__first_name'),
+    ('last_name', 'admin__last_name'),
+    ('gender', 'gender'),
+    ('address', 'address'),
+    ('course_id', 'course_id'),
+    ('course_name', 'course_id__course_name'),
+    ('session_year_id', 'session_year_id'),
+    ('created_at', 'created_at'),
+)
+
+ATTENDANCE_REPORT_EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('student_id', 'student_id'),
+    ('username', 'student_id__admin__username'),
+    ('attendance_id', 'attendance_id'),
+    ('subject_id', 'attendance_id__subject_id'),
+    ('subject_name', 'attendance_id__subject_id__subject_name'),
+    ('attendance_date', 'attendance_id__attendance_date'),
+    ('status', 'status'),
+    ('created_at', 'created_at'),
+)
+
+RESULT_EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('student_id', 'student_id'),
+    ('username', 'student_id__admin__username'),
+    ('subject_id', 'subject_id'),
+    ('subject_name', 'subject_id__subject_name'),
+    ('subject_exam_marks', 'subject_exam_marks'),
+    ('subject_assignment_marks', 'subject_assignment_marks'),
+    ('created_at', 'created_at'),
+)
+
+
+class Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(headers, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_ndjson(headers, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+def stream_export(queryset, columns, file_type, filename, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Stream a queryset as CSV, NDJSON or Excel
+
+    Args:
+        queryset: Queryset to export
+        columns: Sequence of (header, field lookup) pairs
+        file_type: 'csv', 'ndjson' or 'xlsx'
+        filename: Download name without extension
+        chunk_size: Rows fetched from the database per round trip
+
+    Returns:
+        StreamingHttpResponse (FileResponse for xlsx)
+    """
+    headers = [header for header, _ in columns]
+    rows = queryset.values_list(*[field for _, field in columns]).iterator(chunk_size=chunk_size)
+
+    if file_type == 'xlsx':
+        # openpyxl / reportlab are optional dependencies, only needed here
+        from .utils import stream_excel_report
+        output = stream_excel_report(filename, rows, columns=headers, output=tempfile.TemporaryFile())
+        if output is None:
+            return JsonResponse({'error': 'Failed to generate Excel export'}, status=500)
+        return FileResponse(output, as_attachment=True, filename=f"{filename}.xlsx",
+                            content_type=EXPORT_CONTENT_TYPES['xlsx'])
+
+    content = iter_csv(headers, rows) if file_type == 'csv' else iter_ndjson(headers, rows)
+
+    response = StreamingHttpResponse(content, content_type=EXPORT_CONTENT_TYPES[file_type])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{file_type}"'
+    return response
+
+
+class StreamingExportMixin:
+    """
+    Adds GET <collection>/export/?file_type=csv|ndjson|xlsx to a ViewSet. The
+    ViewSet's filters and ordering apply to the export.
+
+    export_columns: Sequence of (header, field lookup) pairs
+    export_filename: Download name without extension
+    """
+    export_columns = ()
+    export_filename = 'export'
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the filtered collection as CSV, NDJSON or Excel"""
+        file_type = request.query_params.get('file_type', 'csv')
+        if file_type not in EXPORT_CONTENT_TYPES:
+            return Response({'error': f'file_type must be one of: {", ".join(EXPORT_CONTENT_TYPES)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_queryset(self.get_queryset())
+        return stream_export(queryset, self.export_columns, file_type, self.export_filename)
@@ -0,0 +1,171 @@
+"""
+Per-view query instrumentation
+
+QueryInstrumentationMiddleware counts and times every query a request runs
+(through connection.execute_wrapper, so it works with DEBUG off), groups
+them by a fingerprint with the literal values removed and logs one JSON
+line per request to the student_management_app logger. Requests over the
+query or time budget are logged at WARNING, the rest at INFO.
+
+Each process also keeps the last QUERY_STATS_WINDOW requests of every URL
+name, which the HOD-only /api/query-stats/ endpoint summarises.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('student_management_app.instrumentation')
+
+HISTOGRAM_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN \((?:\s*(?:%s|\?)\s*,?)+\)", re.IGNORECASE)
+
+
+def fingerprint(sql):
+    """
+    SQL with literals and IN lists collapsed, so the queries of an N+1 loop
+    share one fingerprint
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    return _IN_LIST_RE.sub('IN (...)', sql)
+
+
+class QueryRecorder:
+    """
+    execute_wrapper that counts, times and fingerprints queries
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        """Fingerprints run more than once, most repeated first"""
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count > 1]
+
+
+class QueryStats:
+    """
+    Rolling per-URL-name window of request measurements for this process
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.duplicates = defaultdict(Counter)
+
+    def add(self, view_name, record, duplicates):
+        window = getattr(settings, 'QUERY_STATS_WINDOW', 200)
+        with self.lock:
+            if view_name not in self.samples:
+                self.samples[view_name] = deque(maxlen=window)
+            self.samples[view_name].append((record['queries'], record['db_ms'], record['total_ms']))
+            for sql, count in duplicates:
+                self.duplicates[view_name][sql] += count
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+            self.duplicates.clear()
+
+    def summary(self, view_name):
+        with self.lock:
+            samples = list(self.samples[view_name])
+            top_duplicates = self.duplicates[view_name].most_common(3)
+        queries = [sample[0] for sample in samples]
+        db_ms = [sample[1] for sample in samples]
+        total_ms = sorted(sample[2] for sample in samples)
+
+        histogram = Counter()
+        for elapsed in total_ms:
+            bucket = next((f"<{limit}ms" for limit in HISTOGRAM_BUCKETS_MS if elapsed < limit),
+                          f">={HISTOGRAM_BUCKETS_MS[-1]}ms")
+            histogram[bucket] += 1
+
+        return {
+            "view": view_name,
+            "requests": len(samples),
+            "avg_queries": round(sum(queries) / len(samples), 1),
+            "max_queries": max(queries),
+            "avg_db_ms": round(sum(db_ms) / len(samples), 2),
+            "p50_ms": total_ms[len(total_ms) // 2],
+            "p95_ms": total_ms[min(len(total_ms) - 1, int(len(total_ms) * 0.95))],
+            "histogram": dict(histogram),
+            "duplicate_queries": [{"sql": sql, "count": count} for sql, count in top_duplicates],
+        }
+
+    def top(self, order_by='avg_queries', limit=10):
+        """
+        Summaries of the URL names with the highest `order_by` value
+        """
+        with self.lock:
+            view_names = list(self.samples)
+        summaries = [self.summary(view_name) for view_name in view_names]
+        return sorted(summaries, key=lambda summary: summary[order_by], reverse=True)[:limit]
+
+
+query_stats = QueryStats()
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Middleware recording query count, DB time, duplicate queries and
+    non-DB (view + template) time for every request
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else '<unresolved>'
+        duplicates = recorder.duplicates()
+        db_ms = recorder.time * 1000
+        record = {
+            "view": view_name,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "queries": recorder.count,
+            "duplicate_queries": sum(count for _, count in duplicates),
+            "db_ms": round(db_ms, 2),
+            "app_ms": round(total_ms - db_ms, 2),
+            "total_ms": round(total_ms, 2),
+        }
+        query_stats.add(view_name, record, duplicates)
+
+        over_budget = (recorder.count > getattr(settings, 'QUERY_BUDGET_MAX_QUERIES', 50)
+                       or total_ms > getattr(settings, 'QUERY_BUDGET_SLOW_MS', 500))
+        if over_budget:
+            record["top_duplicates"] = [{"sql": sql[:300], "count": count} for sql, count in duplicates[:3]]
+        logger.log(logging.WARNING if over_budget else logging.INFO, json.dumps(record))
+        return response
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from student_management_app.archive import archive_session_year, closed_session_years
+
+
+class Command(BaseCommand):
+    help = 'Moves the attendance of ended session years into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--session-year', type=int,
+                            help='Archive only this session year (it must have ended)')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Number of attendances moved per transaction')
+
+    def handle(self, *args, **options):
+        session_years = closed_session_years().order_by('session_end_year')
+        if options['session_year']:
+            session_years = session_years.filter(id=options['session_year'])
+            if not session_years.exists():
+                raise CommandError(f"Session year {options['session_year']} is still open or already archived")
+
+        for session_year in session_years:
+            moved = archive_session_year(session_year, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ Archived session year {session_year.id}: '
+                f'{moved["attendances"]} attendances, {moved["reports"]} reports'))
@@ -0,0 +1,120 @@
+import json
+import logging
+import platform
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from student_management_app.benchmarks import BENCHMARKS, compare, run_benchmarks
+from student_management_app.synthetic_data import SyntheticDataset
+
+
+class Command(BaseCommand):
+    help = ('Generates a synthetic dataset in a scratch test database, times the key pages and API lists '
+            '(latency percentiles, queries, peak memory) and compares the results with a baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=2000)
+        parser.add_argument('--staff', type=int, default=50)
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--password', default='password',
+                            help='Password of the generated users, hashed with the configured PASSWORD_HASHERS')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument('--endpoint', action='append', choices=list(BENCHMARKS), dest='endpoints',
+                            help='Benchmark only this endpoint (repeatable)')
+        parser.add_argument('--cold-cache', action='store_true', help='Clear the cache before every request')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+        parser.add_argument('--max-ratio', type=float, default=1.25,
+                            help='Flag metrics more than this many times the baseline')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error when a metric is flagged')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read baseline {options['baseline']}: {e}")
+
+        # The benchmarks write attendance, so never run on the real database
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        # Every request is measured here; don't also log the slow ones
+        instrumentation_logger = logging.getLogger('student_management_app.instrumentation')
+        log_level = instrumentation_logger.level
+        instrumentation_logger.setLevel(logging.ERROR)
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write('Generating data...')
+            start = time.perf_counter()
+            counts = SyntheticDataset(students=options['students'], staff=options['staff'], days=options['days'],
+                                      seed=options['seed'], password=options['password']).generate()
+            self.stdout.write(f'  {sum(counts.values())} rows in {time.perf_counter() - start:.1f}s')
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+
+            self.stdout.write(f'\n{"endpoint":<24}{"status":>7}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}'
+                              f'{"req/s":>9}{"queries":>9}{"peak KB":>10}')
+            results = run_benchmarks(repeat=options['repeat'], names=options['endpoints'],
+                                     cold_cache=options['cold_cache'], progress=self.write_result,
+                                     password=options['password'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            instrumentation_logger.setLevel(log_level)
+
+        report = {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "dataset": {key: options[key] for key in ('students', 'staff', 'days', 'seed')},
+                "rows": counts,
+                "repeat": options['repeat'],
+                "cold_cache": options['cold_cache'],
+                "database": connection.vendor,
+                "django": django.get_version(),
+                "python": platform.python_version(),
+            },
+            "results": results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f'\nResults written to {options["output"]}')
+
+        if baseline is not None:
+            self.compare(results, baseline, options)
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Benchmarked {len(results)} endpoints'))
+
+    def write_result(self, name, result):
+        style = self.style.ERROR if result['status'] >= 400 else str
+        self.stdout.write(style(f'{name:<24}{result["status"]:>7}{result["p50_ms"]:>10}{result["p95_ms"]:>10}'
+                                f'{result["p99_ms"]:>10}{result["per_second"]:>9}{result["queries"]:>9}'
+                                f'{result["peak_kb"]:>10}'))
+
+    def compare(self, results, baseline, options):
+        if baseline.get('meta', {}).get('dataset') != {key: options[key] for key in ('students', 'staff', 'days',
+                                                                                     'seed')}:
+            self.stdout.write(self.style.WARNING('\nThe baseline was run on a different dataset'))
+
+        comparison = compare(results, baseline.get('results', {}), options['max_ratio'])
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\nRatio to baseline (flagged above {options["max_ratio"]}x)'))
+        regressions = 0
+        for name, row in comparison.items():
+            ratios = '  '.join(f'{metric} {ratio:.2f}x' for metric, ratio in row['ratios'].items())
+            if row['regressions']:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(f'{name:<24}{ratios}  REGRESSED: {", ".join(row["regressions"])}'))
+            else:
+                self.stdout.write(f'{name:<24}{ratios}')
+
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'{regressions} endpoints regressed against the baseline')
@@ -0,0 +1,189 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.operations import RemoveConstraint, RemoveIndex
+from django.db.migrations.state import ProjectState
+
+from student_management_app.models import (
+    CustomUser, Staffs, Courses, Subjects, Students, SessionYearModel,
+    Attendance, AttendanceReport, LeaveReportStudent, LeaveReportStaff,
+    StudentResult, Announcement, Notification
+)
+
+# Added by migration 0009_hot_path_indexes_and_constraints
+BENCHMARKED_INDEXES = (
+    'attendancereport_status_idx', 'notification_user_unread_idx', 'announcement_audience_idx',
+    'leavereportstudent_status_idx', 'leavereportstaff_status_idx',
+)
+BENCHMARKED_CONSTRAINTS = ('unique_attendance', 'unique_attendance_report', 'unique_student_result')
+BENCHMARKED_MODELS = (
+    Attendance, AttendanceReport, LeaveReportStudent, LeaveReportStaff,
+    StudentResult, Announcement, Notification,
+)
+
+
+class Command(BaseCommand):
+    help = ('Generates sample data in a scratch test database and shows the query plans and '
+            'timings of the hot lookups with and without the hot path indexes and constraints')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=500)
+        parser.add_argument('--subjects', type=int, default=5)
+        parser.add_argument('--days', type=int, default=20, help='Days of attendance per subject')
+        parser.add_argument('--notifications', type=int, default=20, help='Notifications per student')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query; the median is reported')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        # The indexes are dropped half way through, so never run on the real database
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write('Generating data...')
+            sample = self.generate(options)
+            self.analyze()
+            queries = self.hot_queries(sample)
+
+            after = self.measure(queries, options['repeat'])
+            self.drop_indexes()
+            self.analyze()
+            before = self.measure(queries, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for label, _ in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{label}'))
+            for name, results in (('before', before), ('after', after)):
+                elapsed, plan = results[label]
+                self.stdout.write(f'  {name}: {elapsed:.3f} ms')
+                for line in plan.splitlines():
+                    self.stdout.write(f'      {line}')
+        total_before = sum(elapsed for elapsed, _ in before.values())
+        total_after = sum(elapsed for elapsed, _ in after.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ Total median time: {total_before:.3f} ms before, {total_after:.3f} ms after'))
+
+    def generate(self, options):
+        rng = random.Random(options['seed'])
+        password = make_password(None)
+        session_year = SessionYearModel.objects.create(session_start_year=date(2024, 1, 1),
+                                                       session_end_year=date(2024, 12, 31))
+        course = Courses.objects.create(course_name='Benchmark Course')
+
+        staff_users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'bench_staff{n}', password=password, user_type=CustomUser.STAFF)
+            for n in range(options['subjects'])])
+        staffs = Staffs.objects.bulk_create([Staffs(admin=user, address='') for user in staff_users])
+        subjects = Subjects.objects.bulk_create([
+            Subjects(subject_name=f'Subject {n}', course_id=course, staff_id=user)
+            for n, user in enumerate(staff_users)])
+
+        student_users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'bench_student{n}', password=password, user_type=CustomUser.STUDENT)
+            for n in range(options['students'])], batch_size=500)
+        students = Students.objects.bulk_create([
+            Students(admin=user, course_id=course, session_year_id=session_year,
+                     address='', profile_pic='', gender='Male')
+            for user in student_users], batch_size=500)
+
+        days = [date(2024, 2, 1) + timedelta(days=n) for n in range(options['days'])]
+        attendances = Attendance.objects.bulk_create([
+            Attendance(subject_id=subject, session_year_id=session_year, attendance_date=day)
+            for subject in subjects for day in days], batch_size=500)
+        for attendance in attendances:
+            AttendanceReport.objects.bulk_create([
+                AttendanceReport(student_id=student, attendance_id=attendance, status=rng.random() < 0.85)
+                for student in students], batch_size=1000)
+
+        StudentResult.objects.bulk_create([
+            StudentResult(student_id=student, subject_id=subject,
+                          subject_exam_marks=rng.randint(0, 100), subject_assignment_marks=rng.randint(0, 100))
+            for student in students for subject in subjects], batch_size=1000)
+        LeaveReportStudent.objects.bulk_create([
+            LeaveReportStudent(student_id=student, leave_date='2024-02-02', leave_message='',
+                               leave_status=rng.choice((0, 1, 1, 1, 2)))
+            for student in students for _ in range(5)], batch_size=1000)
+        LeaveReportStaff.objects.bulk_create([
+            LeaveReportStaff(staff_id=staff, leave_date='2024-02-02', leave_message='',
+                             leave_status=rng.choice((0, 1, 1, 1, 2)))
+            for staff in staffs for _ in range(20)], batch_size=1000)
+        Announcement.objects.bulk_create([
+            Announcement(title=f'Announcement {n}', message='', created_by=staff_users[0],
+                         target_audience=rng.choice(('all', 'students', 'staff', 'admin')),
+                         is_active=rng.random() < 0.3)
+            for n in range(len(students) * 2)], batch_size=1000)
+        Notification.objects.bulk_create([
+            Notification(user=user, title='Notice', message='', notification_type='general',
+                         is_read=rng.random() < 0.8)
+            for user in student_users for _ in range(options['notifications'])], batch_size=1000)
+
+        return {
+            'session_year': session_year,
+            'subject': subjects[len(subjects) // 2],
+            'student': students[len(students) // 2],
+            'attendance': attendances[len(attendances) // 2],
+            'day': days[len(days) // 2],
+        }
+
+    def hot_queries(self, sample):
+        return [
+            ('AttendanceReport by (student_id, status)',
+             AttendanceReport.objects.filter(student_id=sample['student'], status=False)),
+            ('AttendanceReport by (attendance_id, student_id)',
+             AttendanceReport.objects.filter(attendance_id=sample['attendance'], student_id=sample['student'])),
+            ('Attendance by (subject_id, session_year_id, attendance_date)',
+             Attendance.objects.filter(subject_id=sample['subject'], session_year_id=sample['session_year'],
+                                       attendance_date=sample['day'])),
+            ('Unread notifications of a user, newest first',
+             Notification.objects.filter(user=sample['student'].admin_id, is_read=False)
+             .order_by('-created_at')[:10]),
+            ('Active announcements for students, newest first',
+             Announcement.objects.filter(is_active=True, target_audience__in=['all', 'students'])
+             .order_by('-created_at')[:10]),
+            ('Pending student leaves', LeaveReportStudent.objects.filter(leave_status=0)),
+            ('Pending staff leaves', LeaveReportStaff.objects.filter(leave_status=0)),
+            ('StudentResult by (student_id, subject_id)',
+             StudentResult.objects.filter(student_id=sample['student'], subject_id=sample['subject'])),
+        ]
+
+    def measure(self, queries, repeat):
+        """
+        Returns:
+            Dictionary mapping each label to (median milliseconds, query plan)
+        """
+        results = {}
+        for label, queryset in queries:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            results[label] = (statistics.median(timings), queryset.explain())
+        return results
+
+    def analyze(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def drop_indexes(self):
+        # Run RemoveIndex / RemoveConstraint like a migration would; SQLite has
+        # to rebuild the table from the model state without the constraint
+        from_state = ProjectState.from_apps(apps)
+        with connection.schema_editor() as schema_editor:
+            for model in BENCHMARKED_MODELS:
+                operations = [RemoveIndex(model._meta.model_name, index.name)
+                              for index in model._meta.indexes if index.name in BENCHMARKED_INDEXES]
+                operations += [RemoveConstraint(model._meta.model_name, constraint.name)
+                               for constraint in model._meta.constraints if constraint.name in BENCHMARKED_CONSTRAINTS]
+                for operation in operations:
+                    to_state = from_state.clone()
+                    operation.state_forwards(model._meta.app_label, to_state)
+                    operation.database_forwards(model._meta.app_label, schema_editor, from_state, to_state)
+                    from_state = to_state
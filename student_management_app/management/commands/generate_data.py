@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from student_management_app.models import CustomUser
+from student_management_app.synthetic_data import SyntheticDataset
+
+
+class Command(BaseCommand):
+    help = ('Generates a synthetic college of the given size with bulk inserts for load testing, e.g. '
+            '--students 50000 --staff 500 --days 180 --seed 7')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--staff', type=int, default=50)
+        parser.add_argument('--days', type=int, default=30, help='Days of attendance up to today (weekdays only)')
+        parser.add_argument('--courses', type=int, default=None, help='Defaults to one course per 10 staff')
+        parser.add_argument('--subjects-per-course', type=int, default=6)
+        parser.add_argument('--notifications', type=int, default=10, help='Notifications per student and staff member')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows inserted per query')
+        parser.add_argument('--prefix', default='synthetic', help='Username prefix of the generated users')
+        parser.add_argument('--password', default='password', help='Password of every generated user')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if CustomUser.objects.filter(username__startswith=f"{prefix}_").exists():
+            raise CommandError(f"Users named {prefix}_* already exist; use another --prefix or a fresh database")
+
+        start = time.perf_counter()
+        dataset = SyntheticDataset(
+            students=options['students'], staff=options['staff'], days=options['days'], seed=options['seed'],
+            courses=options['courses'], subjects_per_course=options['subjects_per_course'],
+            notifications=options['notifications'], batch_size=options['batch_size'], prefix=prefix,
+            password=options['password'], progress=lambda message: self.stdout.write(f'  {message}'),
+        )
+        counts = dataset.generate()
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Generated {sum(counts.values())} rows in {time.perf_counter() - start:.1f}s '
+            f'(log in as {prefix}_admin, {prefix}_staff0 or {prefix}_student0)'))
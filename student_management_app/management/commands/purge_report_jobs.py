@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from student_management_app.reports import purge_expired_report_jobs
+
+
+class Command(BaseCommand):
+    help = 'Deletes report job files past their expiry date'
+
+    def handle(self, *args, **options):
+        expired = purge_expired_report_jobs()
+        self.stdout.write(self.style.SUCCESS(f'✓ Expired {expired} report jobs'))
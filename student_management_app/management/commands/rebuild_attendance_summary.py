@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from student_management_app.attendance import rebuild_attendance_summary
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-student attendance summary table from AttendanceReport'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of summary rows inserted per query')
+
+    def handle(self, *args, **options):
+        written = rebuild_attendance_summary(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt attendance summary: {written} rows'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from student_management_app.notifications import reconcile_unread_counts
+
+
+class Command(BaseCommand):
+    help = 'Recounts the cached unread notification counters and corrects any that drifted'
+
+    def handle(self, *args, **options):
+        corrected = reconcile_unread_counts()
+        self.stdout.write(self.style.SUCCESS(f'✓ Corrected {corrected} unread counters'))
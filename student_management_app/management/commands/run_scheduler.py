@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from student_management_app.scheduler import run_scheduler
+
+
+class Command(BaseCommand):
+    help = 'Publishes announcements and notifications whose scheduled date has come and archives expired ones'
+
+    def handle(self, *args, **options):
+        result = run_scheduler()
+        for step, count in result.items():
+            self.stdout.write(f'{step.replace("_", " ").capitalize()}: {count}')
+        self.stdout.write(self.style.SUCCESS('✓ Scheduler run complete'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from student_management_app.notifications import resume_announcement_fanouts
+
+
+class Command(BaseCommand):
+    help = 'Sends the notifications of announcements that have not been fully sent yet'
+
+    def handle(self, *args, **options):
+        created = resume_announcement_fanouts()
+        self.stdout.write(self.style.SUCCESS(f'✓ Created {created} announcement notifications'))
@@ -2,96 +2,123 @@
 Custom middleware for request processing
 """
 from django.shortcuts import redirect
-from django.urls import reverse
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
 from django.contrib import messages
+from django.utils.functional import SimpleLazyObject
+
+from .models import CustomUser
+from .profiles import get_user_profile
+
+PUBLIC = 'public'
+
+# Roles allowed to use the views of each module. Views defined anywhere else
+# (admin site, REST API, static files, debug toolbar) use their own auth.
+VIEW_MODULE_ROLES = {
+    'student_management_app.views': PUBLIC,
+    'student_management_app.HodViews': frozenset([CustomUser.HOD]),
+    'student_management_app.StaffViews': frozenset([CustomUser.STAFF]),
+    'student_management_app.StudentViews': frozenset([CustomUser.STUDENT]),
+}
+
+DASHBOARD_URL_NAMES = {
+    CustomUser.HOD: 'admin_home',
+    CustomUser.STAFF: 'staff_home',
+    CustomUser.STUDENT: 'student_home',
+}
+
+
+def build_route_policies(urlconf=None):
+    """
+    Walk the URLconf once and map every view to the roles allowed to call it
+
+    Returns:
+        Dictionary mapping view callback to PUBLIC or a frozenset of user types
+    """
+    policies = {}
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+            elif isinstance(pattern, URLPattern):
+                roles = VIEW_MODULE_ROLES.get(pattern.callback.__module__)
+                if roles is not None:
+                    policies[pattern.callback] = roles
+
+    walk(get_resolver(urlconf).url_patterns)
+    return policies
 
 
 class RoleBasedAccessMiddleware:
     """
     Middleware to restrict access based on user roles
+
+    The route policy table is compiled from the URLconf on the first
+    request. After that each request costs one dictionary lookup on the view
+    Django has already resolved, instead of reversing URLs and scanning
+    path prefixes.
     """
-    
+
     def __init__(self, get_response):
         self.get_response = get_response
-        
+        self.policies = None
+
     def __call__(self, request):
-        # URLs that don't require authentication
-        public_urls = [
-            reverse('home'),
-            reverse('contact'),
-            reverse('login'),
-            reverse('doLogin'),
-            reverse('registration'),
-            reverse('doRegistration'),
-            reverse('logout_user'),
-            '/admin/',
-            '/static/',
-            '/media/',
-            '/__debug__/',
-        ]
-        
-        # Check if current path is public
-        current_path = request.path
-        is_public = any(current_path.startswith(url) for url in public_urls)
-        
-        if is_public:
-            response = self.get_response(request)
-            return response
-            
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.policies is None:
+            self.policies = build_route_policies()
+
+        roles = self.policies.get(view_func)
+        if roles is None or roles == PUBLIC:
+            return None
+
         # Check authentication for protected routes
         if not request.user.is_authenticated:
-            if not current_path.startswith('/admin/'):
-                messages.warning(request, "Please login to access this page!")
-                return redirect('login')
-        else:
-            # Role-based routing
-            user_type = request.user.user_type
-            
-            # Admin routes
-            if current_path.startswith('/admin_') or current_path.startswith('/add_') or \
-               current_path.startswith('/manage_') or current_path.startswith('/edit_') or \
-               current_path.startswith('/delete_') or current_path.startswith('/check_'):
-                if user_type != 1:  # CustomUser.HOD
-                    messages.error(request, "You don't have permission to access this page!")
-                    return redirect('home')
-            
-            # Staff routes
-            elif current_path.startswith('/staff_') or current_path.startswith('/get_students') or \
-                 current_path.startswith('/save_attendance') or current_path.startswith('/get_attendance') or \
-                 current_path.startswith('/update_attendance'):
-                if user_type != 2:  # CustomUser.STAFF
-                    messages.error(request, "You don't have permission to access this page!")
-                    return redirect('home')
-            
-            # Student routes
-            elif current_path.startswith('/student_'):
-                if user_type != 3:  # CustomUser.STUDENT
-                    messages.error(request, "You don't have permission to access this page!")
-                    return redirect('home')
-        
-        response = self.get_response(request)
-        return response
+            messages.warning(request, "Please login to access this page!")
+            return redirect('login')
+
+        # user_type is stored as a string ('1', '2', '3')
+        if str(request.user.user_type) not in roles:
+            messages.error(request, "You don't have permission to access this page!")
+            return redirect('home')
+        return None
 
 
 class LoginRedirectMiddleware:
     """
     Middleware to redirect authenticated users from login page to their dashboard
     """
-    
+
     def __init__(self, get_response):
         self.get_response = get_response
-        
+        self.login_path = None
+
     def __call__(self, request):
+        if self.login_path is None:
+            self.login_path = reverse('login')
+
         # Check if user is trying to access login page while authenticated
-        if request.path == reverse('login') and request.user.is_authenticated:
-            user_type = request.user.user_type
-            
-            if user_type == 1:  # Admin
-                return redirect('admin_home')
-            elif user_type == 2:  # Staff
-                return redirect('staff_home')
-            elif user_type == 3:  # Student
-                return redirect('student_home')
-        
+        if request.path == self.login_path and request.user.is_authenticated:
+            dashboard = DASHBOARD_URL_NAMES.get(str(request.user.user_type))
+            if dashboard:
+                return redirect(dashboard)
+
         response = self.get_response(request)
         return response
+
+
+class UserProfileMiddleware:
+    """
+    Middleware that adds request.profile: the logged in user's AdminHOD,
+    Staffs or Students row, looked up on first access and at most once per
+    request
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.profile = SimpleLazyObject(lambda: get_user_profile(request.user))
+        return self.get_response(request)
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_management_app', '0005_attendancesummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['created_at', 'id'], name='attendance_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancereport',
+            index=models.Index(fields=['created_at', 'id'], name='attendancereport_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['created_at', 'id'], name='notification_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentresult',
+            index=models.Index(fields=['created_at', 'id'], name='studentresult_keyset_idx'),
+        ),
+    ]
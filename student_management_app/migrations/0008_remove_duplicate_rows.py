@@ -0,0 +1,69 @@
+# Clears the duplicate rows 0009 makes impossible, so its unique
+# constraints can be created on existing databases
+
+from django.db import migrations
+from django.db.models import Count, Max, Min, Q
+
+
+def remove_duplicate_rows(apps, schema_editor):
+    Attendance = apps.get_model('student_management_app', 'Attendance')
+    AttendanceReport = apps.get_model('student_management_app', 'AttendanceReport')
+    AttendanceSummary = apps.get_model('student_management_app', 'AttendanceSummary')
+    StudentResult = apps.get_model('student_management_app', 'StudentResult')
+    removed = False
+
+    # Attendance taken twice for the same subject and day: move the reports
+    # onto the oldest row, then drop the others
+    duplicates = (Attendance.objects.values('subject_id', 'session_year_id', 'attendance_date')
+                  .annotate(total=Count('id'), keep=Min('id')).filter(total__gt=1).order_by())
+    for group in duplicates:
+        others = Attendance.objects.filter(subject_id=group['subject_id'],
+                                           session_year_id=group['session_year_id'],
+                                           attendance_date=group['attendance_date']).exclude(id=group['keep'])
+        AttendanceReport.objects.filter(attendance_id__in=others).update(attendance_id=group['keep'])
+        others.delete()
+        removed = True
+
+    # More than one report per student and attendance: keep the latest
+    duplicates = (AttendanceReport.objects.values('attendance_id', 'student_id')
+                  .annotate(total=Count('id'), keep=Max('id')).filter(total__gt=1).order_by())
+    for group in duplicates:
+        AttendanceReport.objects.filter(attendance_id=group['attendance_id'],
+                                        student_id=group['student_id']).exclude(id=group['keep']).delete()
+        removed = True
+
+    # More than one result per student and subject: keep the latest
+    duplicates = (StudentResult.objects.values('student_id', 'subject_id')
+                  .annotate(total=Count('id'), keep=Max('id')).filter(total__gt=1).order_by())
+    for group in duplicates:
+        StudentResult.objects.filter(student_id=group['student_id'],
+                                     subject_id=group['subject_id']).exclude(id=group['keep']).delete()
+
+    if removed:
+        # Same as rebuild_attendance_summary, on the historical models
+        AttendanceSummary.objects.all().delete()
+        rows = AttendanceReport.objects.values(
+            'student_id', 'attendance_id__subject_id', 'attendance_id__session_year_id'
+        ).annotate(
+            present=Count('id', filter=Q(status=True)),
+            absent=Count('id', filter=Q(status=False)),
+        ).order_by()
+        AttendanceSummary.objects.bulk_create([
+            AttendanceSummary(student_id_id=row['student_id'],
+                              subject_id_id=row['attendance_id__subject_id'],
+                              session_year_id_id=row['attendance_id__session_year_id'],
+                              present_count=row['present'],
+                              absent_count=row['absent'])
+            for row in rows
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_management_app', '0007_reportjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_management_app', '0008_remove_duplicate_rows'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(fields=['is_active', 'target_audience', 'created_at'], name='announcement_audience_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancereport',
+            index=models.Index(fields=['student_id', 'status'], name='attendancereport_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leavereportstaff',
+            index=models.Index(fields=['leave_status'], name='leavereportstaff_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leavereportstudent',
+            index=models.Index(fields=['leave_status'], name='leavereportstudent_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', 'created_at'], name='notification_user_unread_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(fields=('subject_id', 'session_year_id', 'attendance_date'), name='unique_attendance'),
+        ),
+        migrations.AddConstraint(
+            model_name='attendancereport',
+            constraint=models.UniqueConstraint(fields=('attendance_id', 'student_id'), name='unique_attendance_report'),
+        ),
+        migrations.AddConstraint(
+            model_name='studentresult',
+            constraint=models.UniqueConstraint(fields=('student_id', 'subject_id'), name='unique_student_result'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_management_app', '0009_hot_path_indexes_and_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='announcement',
+            name='fanout_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='fanout_cursor',
+            field=models.IntegerField(default=0),
+        ),
+        # Announcements posted before the fan-out existed are not sent out again
+        migrations.AddField(
+            model_name='announcement',
+            name='fanout_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent')], default='sent', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='announcement',
+            name='fanout_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='announcement',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='student_management_app.announcement'),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(fields=('announcement', 'user'), name='unique_announcement_notification'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_management_app', '0011_notification_feed_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notification_user_feed_idx',
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(fields=['fanout_status', 'scheduled_date'], name='announcement_publish_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(condition=models.Q(('archived_at__isnull', True)), fields=['expiry_date'], name='announcement_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('archived_at__isnull', True)), fields=['user', 'created_at', 'id'], name='notification_user_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('scheduled_date__isnull', False)), fields=['scheduled_date'], name='notification_schedule_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('archived_at__isnull', True)), fields=['expiry_date'], name='notification_expiry_idx'),
+        ),
+    ]
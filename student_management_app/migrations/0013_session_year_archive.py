@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_management_app', '0012_scheduled_publication'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sessionyearmodel',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ArchivedAttendance',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('attendance_date', models.DateField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('session_year_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='student_management_app.sessionyearmodel')),
+                ('subject_id', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='student_management_app.subjects')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedAttendanceReport',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('status', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('attendance_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='student_management_app.archivedattendance')),
+                ('student_id', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='student_management_app.students')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedAttendanceTotal',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('attendance_count', models.PositiveIntegerField(default=0)),
+                ('session_year_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='student_management_app.sessionyearmodel')),
+                ('subject_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='student_management_app.subjects')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedattendance',
+            index=models.Index(fields=['session_year_id', 'subject_id', 'attendance_date'], name='archivedattendance_session_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedattendancereport',
+            index=models.Index(fields=['student_id', 'attendance_id'], name='archivedreport_student_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='archivedattendancetotal',
+            constraint=models.UniqueConstraint(fields=('subject_id', 'session_year_id'), name='unique_archived_attendance_total'),
+        ),
+    ]
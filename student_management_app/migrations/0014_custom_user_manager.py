@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:56
+
+import student_management_app.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_management_app', '0013_session_year_archive'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', student_management_app.models.CustomUserManager()),
+            ],
+        ),
+    ]
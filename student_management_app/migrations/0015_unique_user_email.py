@@ -0,0 +1,33 @@
+# Emails are the login name: unique regardless of case, blank emails aside.
+# Accounts sharing an email can't be merged automatically, so the migration
+# stops and lists them instead.
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_duplicate_emails(apps, schema_editor):
+    CustomUser = apps.get_model('student_management_app', 'CustomUser')
+    duplicates = list(CustomUser.objects.exclude(email='').values(email_lower=Lower('email'))
+                      .annotate(total=Count('id')).filter(total__gt=1).values_list('email_lower', flat=True))
+    if duplicates:
+        raise RuntimeError(f"Users share the emails {', '.join(sorted(duplicates))}; "
+                           f"change or clear them before migrating")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('student_management_app', '0014_custom_user_manager'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='unique_user_email'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# 0005 created AttendanceSummary empty and 0008 only filled it when it had
+# removed duplicate rows, so upgraded databases had no summaries for the
+# attendance taken before 0005. Recompute them; archived session years keep
+# their summaries, which are their only rollup.
+
+from django.db import migrations
+from django.db.models import Count, Q
+
+
+def rebuild_attendance_summary(apps, schema_editor):
+    AttendanceReport = apps.get_model('student_management_app', 'AttendanceReport')
+    AttendanceSummary = apps.get_model('student_management_app', 'AttendanceSummary')
+
+    # Same as attendance.rebuild_attendance_summary, on the historical models
+    AttendanceSummary.objects.filter(session_year_id__archived_at__isnull=True).delete()
+    rows = AttendanceReport.objects.values(
+        'student_id', 'attendance_id__subject_id', 'attendance_id__session_year_id'
+    ).annotate(
+        present=Count('id', filter=Q(status=True)),
+        absent=Count('id', filter=Q(status=False)),
+    ).order_by()
+    AttendanceSummary.objects.bulk_create([
+        AttendanceSummary(student_id_id=row['student_id'],
+                          subject_id_id=row['attendance_id__subject_id'],
+                          session_year_id_id=row['attendance_id__session_year_id'],
+                          present_count=row['present'],
+                          absent_count=row['absent'])
+        for row in rows.iterator(chunk_size=1000)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_management_app', '0015_unique_user_email'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_attendance_summary, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,20 @@
-from django.contrib.auth.models import AbstractUser
-from django.db import models
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce, Greatest, Lower
+from django.utils import timezone
+
+
+class CustomUserManager(UserManager):
+
+    def create_superuser(self, username, email=None, password=None, **extra_fields):
+        # Superusers are HODs (the user_type default); give them their profile
+        with transaction.atomic():
+            user = super().create_superuser(username, email, password, **extra_fields)
+            if str(user.user_type) == CustomUser.HOD:
+                AdminHOD.objects.create(admin=user)
+        return user
+
 
 # Overriding the Default Django Auth User and adding One More Field (user_type)
 class CustomUser(AbstractUser):
@@ -17,12 +30,21 @@ class CustomUser(AbstractUser):
 
     user_type_data = ((HOD, "HOD"), (STAFF, "Staff"), (STUDENT, "Student"))
     user_type = models.CharField(default=1, choices=user_type_data, max_length=10)
+    objects = CustomUserManager()
+
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # Emails are the login name; also the index of the login lookup
+            models.UniqueConstraint(Lower('email'), condition=~Q(email=''), name='unique_user_email'),
+        ]
 
 
 class SessionYearModel(models.Model):
     id = models.AutoField(primary_key=True)
     session_start_year = models.DateField()
     session_end_year = models.DateField()
+    # Set once the session's attendance has been moved to the archive tables
+    archived_at = models.DateTimeField(null=True, blank=True)
     objects = models.Manager()
 
 
@@ -94,6 +116,16 @@ class Attendance(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     objects = models.Manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='attendance_keyset_idx'),
+        ]
+        constraints = [
+            # One attendance per subject and day; later changes go through update_attendance
+            models.UniqueConstraint(fields=['subject_id', 'session_year_id', 'attendance_date'],
+                                    name='unique_attendance'),
+        ]
+
 
 class AttendanceReport(models.Model):
     # Individual Student Attendance
@@ -105,6 +137,82 @@ class AttendanceReport(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     objects = models.Manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='attendancereport_keyset_idx'),
+            models.Index(fields=['student_id', 'status'], name='attendancereport_status_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['attendance_id', 'student_id'], name='unique_attendance_report'),
+        ]
+
+
+class AttendanceSummary(models.Model):
+    # Precomputed Present / Absent Counts per Student, Subject and Session Year
+    id = models.AutoField(primary_key=True)
+    student_id = models.ForeignKey(Students, on_delete=models.CASCADE)
+    subject_id = models.ForeignKey(Subjects, on_delete=models.CASCADE)
+    session_year_id = models.ForeignKey(SessionYearModel, on_delete=models.CASCADE)
+    present_count = models.PositiveIntegerField(default=0)
+    absent_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    objects = models.Manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student_id', 'subject_id', 'session_year_id'],
+                                    name='unique_attendance_summary'),
+        ]
+
+
+# Attendance of archived session years, moved out of Attendance /
+# AttendanceReport by archive_session_years so the hot tables only hold open
+# sessions. Rows keep their original ids.
+class ArchivedAttendance(models.Model):
+    id = models.IntegerField(primary_key=True)
+    subject_id = models.ForeignKey(Subjects, on_delete=models.DO_NOTHING)
+    attendance_date = models.DateField()
+    session_year_id = models.ForeignKey(SessionYearModel, on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['session_year_id', 'subject_id', 'attendance_date'],
+                         name='archivedattendance_session_idx'),
+        ]
+
+
+class ArchivedAttendanceReport(models.Model):
+    id = models.IntegerField(primary_key=True)
+    student_id = models.ForeignKey(Students, on_delete=models.DO_NOTHING)
+    attendance_id = models.ForeignKey(ArchivedAttendance, on_delete=models.CASCADE)
+    status = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student_id', 'attendance_id'], name='archivedreport_student_idx'),
+        ]
+
+
+class ArchivedAttendanceTotal(models.Model):
+    # Number of Attendance rows archived per Subject and Session Year, read by the dashboards
+    id = models.AutoField(primary_key=True)
+    subject_id = models.ForeignKey(Subjects, on_delete=models.CASCADE)
+    session_year_id = models.ForeignKey(SessionYearModel, on_delete=models.CASCADE)
+    attendance_count = models.PositiveIntegerField(default=0)
+    objects = models.Manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['subject_id', 'session_year_id'], name='unique_archived_attendance_total'),
+        ]
+
 
 class LeaveReportStudent(models.Model):
     id = models.AutoField(primary_key=True)
@@ -116,6 +224,11 @@ class LeaveReportStudent(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     objects = models.Manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['leave_status'], name='leavereportstudent_status_idx'),
+        ]
+
 
 class LeaveReportStaff(models.Model):
     id = models.AutoField(primary_key=True)
@@ -127,6 +240,11 @@ class LeaveReportStaff(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     objects = models.Manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['leave_status'], name='leavereportstaff_status_idx'),
+        ]
+
 
 class FeedBackStudent(models.Model):
     id = models.AutoField(primary_key=True)
@@ -162,6 +280,14 @@ class StudentResult(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     objects = models.Manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='studentresult_keyset_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['student_id', 'subject_id'], name='unique_student_result'),
+        ]
+
 
 class Timetable(models.Model):
     """Model for class timetable/schedule"""
@@ -191,8 +317,49 @@ class Timetable(models.Model):
         return f"{self.subject.subject_name} - {self.day_of_week} {self.start_time}"
 
 
+class ScheduledQuerySet(models.QuerySet):
+    """QuerySet for models with scheduled_date / expiry_date / archived_at"""
+
+    def live(self, now=None):
+        """Rows already published and not yet expired or archived"""
+        now = now or timezone.now()
+        return self.filter(Q(scheduled_date__isnull=True) | Q(scheduled_date__lte=now),
+                           Q(expiry_date__isnull=True) | Q(expiry_date__gt=now),
+                           archived_at__isnull=True)
+
+    def with_published_at(self):
+        """Adds published_at: when the row went (or goes) live"""
+        # Rows created after their scheduled date go live on creation
+        return self.annotate(published_at=Greatest('created_at', Coalesce('scheduled_date', 'created_at')))
+
+    def published_after(self, published_at, pk=None):
+        """
+        Rows that went live after a publish time cursor; rows published at
+        the cursor's own time are compared by id
+        """
+        queryset = self.with_published_at()
+        if pk is None:
+            return queryset.filter(published_at__gt=published_at)
+        return queryset.filter(Q(published_at__gt=published_at) | Q(published_at=published_at, id__gt=pk))
+
+    def cursor_published_at(self, pk):
+        """
+        Publish time of row `pk` (or of the last row before it, if it was
+        deleted), as a one-value queryset for first() / afirst()
+        """
+        return self.filter(id__lte=pk).with_published_at().order_by('-id').values_list('published_at', flat=True)
+
+
 class Announcement(models.Model):
     """Model for system-wide announcements"""
+    FANOUT_PENDING = 'pending'
+    FANOUT_SENDING = 'sending'
+    FANOUT_SENT = 'sent'
+    FANOUT_STATUS_CHOICES = [
+        (FANOUT_PENDING, 'Pending'),
+        (FANOUT_SENDING, 'Sending'),
+        (FANOUT_SENT, 'Sent'),
+    ]
     URGENCY_CHOICES = [
         ('low', 'Low'),
         ('medium', 'Medium'),
@@ -219,12 +386,25 @@ class Announcement(models.Model):
     expiry_date = models.DateTimeField(null=True, blank=True)
     created_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     is_active = models.BooleanField(default=True)
+    # Progress of the per-user notification fan-out (see notifications.py);
+    # fanout_cursor is the last recipient user id notified
+    fanout_status = models.CharField(max_length=10, choices=FANOUT_STATUS_CHOICES, default=FANOUT_PENDING)
+    fanout_cursor = models.IntegerField(default=0)
+    fanout_count = models.PositiveIntegerField(default=0)
+    # Set by the scheduler (scheduler.py) once expiry_date has passed
+    archived_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    objects = models.Manager()
+    objects = ScheduledQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_active', 'target_audience', 'created_at'], name='announcement_audience_idx'),
+            models.Index(fields=['fanout_status', 'scheduled_date'], name='announcement_publish_idx'),
+            models.Index(fields=['expiry_date'], name='announcement_expiry_idx',
+                         condition=Q(archived_at__isnull=True)),
+        ]
 
     def __str__(self):
         return self.title
@@ -261,11 +441,29 @@ class Notification(models.Model):
     expiry_date = models.DateTimeField(null=True, blank=True)
     is_read = models.BooleanField(default=False)
     link = models.CharField(max_length=255, blank=True, null=True)
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, null=True, blank=True)
+    # Set by the scheduler (scheduler.py) once expiry_date has passed
+    archived_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    objects = models.Manager()
+    objects = ScheduledQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='notification_keyset_idx'),
+            models.Index(fields=['user', 'is_read', 'created_at'], name='notification_user_unread_idx'),
+            # Only covers the live set; archived notifications drop out of it
+            models.Index(fields=['user', 'created_at', 'id'], name='notification_user_live_idx',
+                         condition=Q(archived_at__isnull=True)),
+            models.Index(fields=['scheduled_date'], name='notification_schedule_idx',
+                         condition=Q(scheduled_date__isnull=False)),
+            models.Index(fields=['expiry_date'], name='notification_expiry_idx',
+                         condition=Q(archived_at__isnull=True)),
+        ]
+        constraints = [
+            # Makes the announcement fan-out safe to retry
+            models.UniqueConstraint(fields=['announcement', 'user'], name='unique_announcement_notification'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.title}"
@@ -288,34 +486,52 @@ class ActivityLog(models.Model):
         return f"{self.user.username} - {self.action}"
 
 
-#Creating Django Signals
-@receiver(post_save, sender=CustomUser)
-
-# Now Creating a Function which will
-# automatically insert data in HOD, Staff or Student
-def create_user_profile(sender, instance, created, **kwargs):
-    # if Created is true (Means Data Inserted)
-    if created:
-      
-        # Check the user_type and insert the data in respective tables
-        if instance.user_type == 1:
-            AdminHOD.objects.create(admin=instance)
-        if instance.user_type == 2:
-            Staffs.objects.create(admin=instance)
-        if instance.user_type == 3:
-            Students.objects.create(admin=instance,
-                                    course_id=Courses.objects.get(id=1),
-                                    session_year_id=SessionYearModel.objects.get(id=1),
-                                    address="",
-                                    profile_pic="",
-                                    gender="")
-    
+class ReportJob(models.Model):
+    """Report generated off the request path and kept on disk until it expires"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    EXPIRED = 'expired'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+        (EXPIRED, 'Expired'),
+    ]
+    REPORT_TYPE_CHOICES = [
+        ('students', 'Students'),
+        ('attendance', 'Attendance'),
+        ('results', 'Results'),
+    ]
+    FILE_FORMAT_CHOICES = [
+        ('pdf', 'PDF'),
+        ('xlsx', 'Excel'),
+    ]
+    id = models.AutoField(primary_key=True)
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    report_type = models.CharField(max_length=20, choices=REPORT_TYPE_CHOICES)
+    file_format = models.CharField(max_length=10, choices=FILE_FORMAT_CHOICES, default='xlsx')
+    title = models.CharField(max_length=255, blank=True)
+    filters = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    progress = models.PositiveSmallIntegerField(default=0)
+    total_rows = models.PositiveIntegerField(default=0)
+    result_file = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    objects = models.Manager()
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='reportjob_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.report_type} ({self.file_format}) - {self.status}"
 
-@receiver(post_save, sender=CustomUser)
-def save_user_profile(sender, instance, **kwargs):
-    if instance.user_type == 1:
-        instance.adminhod.save()
-    if instance.user_type == 2:
-        instance.staffs.save()
-    if instance.user_type == 3:
-        instance.students.save()
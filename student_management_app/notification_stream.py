@@ -0,0 +1,220 @@
+"""
+Live notification stream
+
+Clients follow their notifications over Server-Sent Events
+(/notifications/stream/) or long-poll (/notifications/poll/), passing the id
+of the last notification they have as the `since` cursor. An idle client
+costs no queries: its stream waits on a wake-up from the broker and only
+reads the new rows once something was published for its user. The cursor
+stands for the notification's publish time, so rows that reach their
+scheduled date after the client's last one are still sent.
+
+Writers call publish_notifications() with the ids of the users that got
+new rows. The default InProcessBroker wakes streams served by the same
+process. RedisBroker relays wake-ups through one Redis channel, so every
+ASGI process sees the notifications created by web workers, Celery workers
+and the other ASGI processes. Pick one with NOTIFICATION_STREAM_BROKER.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+STREAM_FIELDS = ('id', 'title', 'message', 'notification_type', 'urgency', 'category', 'link', 'created_at')
+
+
+class InProcessBroker:
+    """
+    Wakes the streams of this process; publish() may be called from any thread
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, user_ids):
+        self.wake(user_ids)
+
+    def wake(self, user_ids):
+        with self._lock:
+            targets = [subscriber for user_id in user_ids for subscriber in self._subscribers.get(user_id, ())]
+        for loop, event in targets:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The stream's event loop has already closed
+                pass
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        """
+        Yields an asyncio.Event that is set whenever something is published
+        for the user
+        """
+        subscriber = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._subscribers[user_id].add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                self._subscribers[user_id].discard(subscriber)
+                if not self._subscribers[user_id]:
+                    del self._subscribers[user_id]
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Publishes wake-ups to a Redis channel; each event loop runs one listener
+    that relays them to its own streams
+    """
+    channel = 'notifications:wake'
+
+    def __init__(self):
+        super().__init__()
+        self.url = settings.NOTIFICATION_STREAM_REDIS_URL
+        self._client = None
+        self._listeners = {}
+
+    def publish(self, user_ids):
+        import redis
+        try:
+            if self._client is None:
+                self._client = redis.Redis.from_url(self.url)
+            self._client.publish(self.channel, json.dumps(list(user_ids)))
+        except redis.RedisError as e:
+            # Streams still catch up on their next wake-up or reconnect
+            logger.error(f"Failed to publish notification wake-up: {str(e)}")
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+        client = aioredis.Redis.from_url(self.url)
+        try:
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        self.wake(json.loads(message['data']))
+        except Exception as e:
+            logger.error(f"Notification wake-up listener stopped: {str(e)}")
+        finally:
+            await client.aclose()
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        loop = asyncio.get_running_loop()
+        listener = self._listeners.get(loop)
+        if listener is None or listener.done():
+            self._listeners[loop] = loop.create_task(self._listen())
+        async with super().subscribe(user_id) as wake:
+            yield wake
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(getattr(settings, 'NOTIFICATION_STREAM_BROKER',
+                                            'student_management_app.notification_stream.InProcessBroker'))()
+        return _broker
+
+
+def publish_notifications(user_ids):
+    """
+    Wake the streams of the given users once the current transaction commits
+    """
+    user_ids = sorted(set(user_ids))
+    if user_ids:
+        transaction.on_commit(lambda: get_broker().publish(user_ids))
+
+
+async def latest_notification_id(user_id):
+    latest = await (Notification.objects.live().filter(user_id=user_id).with_published_at()
+                    .order_by('-published_at', '-id').values_list('id', flat=True).afirst())
+    return latest or 0
+
+
+async def fetch_notifications(user_id, since, limit=None):
+    """
+    Live notifications of a user published after the notification `since`,
+    in publish order; scheduled rows are sent when they go live, although
+    their ids are older than the cursor
+    """
+    limit = limit or getattr(settings, 'NOTIFICATION_STREAM_BATCH_SIZE', 50)
+    queryset = Notification.objects.live().filter(user_id=user_id)
+    published_at = None
+    if since:
+        published_at = await Notification.objects.filter(user_id=user_id).cursor_published_at(since).afirst()
+    queryset = (queryset.published_after(published_at, since) if published_at
+                else queryset.filter(id__gt=since).with_published_at())
+    queryset = queryset.order_by('published_at', 'id').values(*STREAM_FIELDS)
+    return [row async for row in queryset[:limit]]
+
+
+async def sse_events(user_id, since=None):
+    """
+    Server-Sent Events for the user's new notifications
+
+    Sends a comment every NOTIFICATION_STREAM_HEARTBEAT seconds to keep
+    proxies from closing an idle stream, and ends after
+    NOTIFICATION_STREAM_TIMEOUT seconds; the browser's EventSource then
+    reconnects with the last event id as Last-Event-ID.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + getattr(settings, 'NOTIFICATION_STREAM_TIMEOUT', 300)
+    heartbeat = getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', 15)
+
+    # Subscribe before the first read so nothing committed in between is missed
+    async with get_broker().subscribe(user_id) as wake:
+        if since is None:
+            since = await latest_notification_id(user_id)
+        yield "retry: 3000\n\n"
+        wake.set()
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                await asyncio.wait_for(wake.wait(), min(heartbeat, remaining))
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            wake.clear()
+            rows = await fetch_notifications(user_id, since)
+            for row in rows:
+                since = row['id']
+                yield f"id: {row['id']}\nevent: notification\ndata: {json.dumps(row, cls=DjangoJSONEncoder)}\n\n"
+            if len(rows) == getattr(settings, 'NOTIFICATION_STREAM_BATCH_SIZE', 50):
+                # More rows are waiting
+                wake.set()
+
+
+async def long_poll(user_id, since=None, timeout=None):
+    """
+    One JSON document with the user's notifications after `since`, sent as
+    soon as there are any or after `timeout` seconds with an empty list
+    """
+    timeout = timeout if timeout is not None else getattr(settings, 'NOTIFICATION_POLL_TIMEOUT', 25)
+    async with get_broker().subscribe(user_id) as wake:
+        if since is None:
+            since = await latest_notification_id(user_id)
+        rows = await fetch_notifications(user_id, since)
+        if not rows:
+            try:
+                await asyncio.wait_for(wake.wait(), timeout)
+                rows = await fetch_notifications(user_id, since)
+            except asyncio.TimeoutError:
+                pass
+    yield json.dumps({"notifications": rows, "since": rows[-1]['id'] if rows else since}, cls=DjangoJSONEncoder)
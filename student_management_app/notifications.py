@@ -0,0 +1,232 @@
+"""
+Announcement notification fan-out and unread counters
+
+A new Announcement is expanded into one Notification per recipient by a
+background worker, in chunks of NOTIFICATION_FANOUT_CHUNK_SIZE users taken
+in user id order. Each chunk is inserted in the same transaction that
+moves the announcement's fanout_cursor past it, with the announcement row
+locked, so a worker that dies part way resumes after the last committed
+chunk. The (announcement, user) unique constraint keeps a retried chunk
+from creating duplicates.
+
+Each user's unread notification count is kept in the cache, so the
+sidebar badge costs no query. Single-row writes adjust it by one (see
+signals.py); bulk writes adjust it by the rows they updated, or drop it to
+be recounted on the next read. reconcile_unread_counts() corrects any
+counter that drifted. The same writes touch the user's "notifications
+modified" time, which my_notifications uses for its ETag / Last-Modified.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .background import run_in_background
+from .notification_stream import publish_notifications
+from .models import Announcement, CustomUser, Notification
+
+logger = logging.getLogger(__name__)
+
+# user_type values each target_audience reaches; 'all' reaches every user
+AUDIENCE_USER_TYPES = {
+    'students': [CustomUser.STUDENT],
+    'staff': [CustomUser.STAFF],
+    'admin': [CustomUser.HOD],
+}
+
+
+def announcement_recipients(announcement):
+    """
+    Active users in the announcement's target audience, except its author
+    """
+    users = CustomUser.objects.filter(is_active=True).exclude(id=announcement.created_by_id)
+    user_types = AUDIENCE_USER_TYPES.get(announcement.target_audience)
+    if user_types is not None:
+        users = users.filter(user_type__in=user_types)
+    return users
+
+
+def unread_count_key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def get_unread_count(user_id):
+    """
+    Number of live unread notifications of a user, counted on a cache miss only
+    """
+    key = unread_count_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.live().filter(user_id=user_id, is_read=False).count()
+        cache.add(key, count, getattr(settings, 'UNREAD_COUNT_CACHE_TIMEOUT', 86400))
+    return max(count, 0)
+
+
+def adjust_unread_count(user_id, delta):
+    """
+    Add delta to a user's cached unread count once the current transaction
+    commits. A counter that is not cached is left to be counted on its next read.
+    """
+    def adjust():
+        try:
+            cache.incr(unread_count_key(user_id), delta)
+        except ValueError:
+            pass
+
+    if delta:
+        transaction.on_commit(adjust)
+
+
+def invalidate_unread_counts(user_ids):
+    """
+    Drop the cached unread counts of the given users once the current
+    transaction commits
+    """
+    keys = [unread_count_key(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def notifications_modified_key(user_id):
+    return f"notifications:modified:{user_id}"
+
+
+def touch_notifications(user_ids):
+    """
+    Record that the notifications of the given users changed, once the
+    current transaction commits
+    """
+    def touch():
+        now = time.time()
+        cache.set_many({notifications_modified_key(user_id): now for user_id in user_ids}, None)
+
+    if user_ids:
+        transaction.on_commit(touch)
+
+
+def get_notifications_modified(user_id):
+    """
+    Unix time of the last change to a user's notifications; a time that
+    was evicted from the cache restarts at now
+    """
+    key = notifications_modified_key(user_id)
+    modified = cache.get(key)
+    if modified is None:
+        cache.add(key, time.time(), None)
+        modified = cache.get(key)
+    return modified
+
+
+def mark_notifications_read(notifications, user_id):
+    """
+    Mark the unread notifications of a queryset as read and adjust the
+    user's unread count by the number of rows updated
+
+    Returns:
+        Number of notifications marked read
+    """
+    updated = notifications.filter(is_read=False).update(is_read=True)
+    if updated:
+        adjust_unread_count(user_id, -updated)
+        touch_notifications([user_id])
+    return updated
+
+
+def reconcile_unread_counts(batch_size=1000):
+    """
+    Recount every cached unread counter and correct those that drifted
+
+    Returns:
+        Number of counters corrected
+    """
+    corrected = 0
+    last_id = 0
+    while True:
+        batch = list(CustomUser.objects.filter(id__gt=last_id).order_by('id')
+                     .values_list('id', flat=True)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1]
+        cached = cache.get_many([unread_count_key(user_id) for user_id in batch])
+        cached_ids = [user_id for user_id in batch if unread_count_key(user_id) in cached]
+        if not cached_ids:
+            continue
+        actual = dict(Notification.objects.live().filter(user_id__in=cached_ids, is_read=False)
+                      .values('user_id').annotate(count=Count('id')).values_list('user_id', 'count'))
+        fixes = {unread_count_key(user_id): actual.get(user_id, 0) for user_id in cached_ids
+                 if cached[unread_count_key(user_id)] != actual.get(user_id, 0)}
+        if fixes:
+            cache.set_many(fixes, getattr(settings, 'UNREAD_COUNT_CACHE_TIMEOUT', 86400))
+            corrected += len(fixes)
+    return corrected
+
+
+def enqueue_announcement_fanout(announcement):
+    """
+    Send an announcement's notifications in the background once the current
+    transaction commits
+    """
+    run_in_background(fan_out_announcement, 'send_announcement', announcement.id)
+
+
+def fan_out_announcement(announcement_id, chunk_size=None):
+    """
+    Create the notifications of a live, active announcement that has not
+    been fully sent, resuming after the last recipient already notified
+
+    Returns:
+        Number of notifications created by this call
+    """
+    chunk_size = chunk_size or getattr(settings, 'NOTIFICATION_FANOUT_CHUNK_SIZE', 1000)
+    created = 0
+    while True:
+        with transaction.atomic():
+            # Scheduled announcements are sent by the scheduler once they are live
+            announcement = (Announcement.objects.live().select_for_update()
+                            .filter(id=announcement_id, is_active=True)
+                            .exclude(fanout_status=Announcement.FANOUT_SENT).first())
+            if announcement is None:
+                break
+
+            recipient_ids = list(announcement_recipients(announcement)
+                                 .filter(id__gt=announcement.fanout_cursor)
+                                 .order_by('id').values_list('id', flat=True)[:chunk_size])
+            if not recipient_ids:
+                announcement.fanout_status = Announcement.FANOUT_SENT
+                announcement.save(update_fields=['fanout_status'])
+                logger.info(f"Announcement {announcement.id} sent to {announcement.fanout_count} users")
+                break
+
+            Notification.objects.bulk_create([
+                Notification(user_id=user_id, announcement=announcement,
+                             title=announcement.title, message=announcement.message,
+                             notification_type='announcement', urgency=announcement.urgency,
+                             category=announcement.category, scheduled_date=announcement.scheduled_date,
+                             expiry_date=announcement.expiry_date)
+                for user_id in recipient_ids], ignore_conflicts=True)
+            # A retried chunk may insert fewer rows than it has recipients
+            invalidate_unread_counts(recipient_ids)
+            touch_notifications(recipient_ids)
+            publish_notifications(recipient_ids)
+            announcement.fanout_status = Announcement.FANOUT_SENDING
+            announcement.fanout_cursor = recipient_ids[-1]
+            announcement.fanout_count += len(recipient_ids)
+            announcement.save(update_fields=['fanout_status', 'fanout_cursor', 'fanout_count'])
+            created += len(recipient_ids)
+    return created
+
+
+def resume_announcement_fanouts():
+    """
+    Finish every active announcement that has not been fully sent, e.g.
+    after a worker was stopped part way
+
+    Returns:
+        Number of notifications created
+    """
+    announcement_ids = list(Announcement.objects.live().filter(is_active=True)
+                            .exclude(fanout_status=Announcement.FANOUT_SENT)
+                            .order_by('id').values_list('id', flat=True))
+    return sum(fan_out_announcement(announcement_id) for announcement_id in announcement_ids)
@@ -0,0 +1,143 @@
+"""
+Keyset (cursor) pagination for high-volume API collections
+
+PageNumberPagination needs an OFFSET scan and a COUNT(*) over the whole
+table for every page. KeysetPagination instead remembers the (created_at, id)
+of the last row sent and asks for the rows strictly after it, which the
+(created_at, id) indexes answer directly however deep the client scrolls.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest-first pagination on (created_at, id)
+
+    Query parameters:
+        cursor: Opaque position returned in the `next` / `previous` links
+        page_size: Rows per page, capped at CURSOR_PAGINATION_MAX_PAGE_SIZE
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.page_size = api_settings.PAGE_SIZE
+        self.max_page_size = getattr(settings, 'CURSOR_PAGINATION_MAX_PAGE_SIZE', 100)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def decode_cursor(self, request):
+        """
+        Returns:
+            Tuple of (created_at, id, reverse) or None on the first page
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            created_at = parse_datetime(data['c'])
+            if created_at is None:
+                raise ValueError
+            return created_at, int(data['i']), bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        payload = json.dumps({'c': instance.created_at.isoformat(), 'i': instance.id, 'r': int(reverse)})
+        encoded = urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor[2])
+
+        if cursor:
+            created_at, row_id, _ = cursor
+            if reverse:
+                queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=row_id))
+            else:
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=row_id))
+
+        if reverse:
+            queryset = queryset.order_by('created_at', 'id')
+        else:
+            queryset = queryset.order_by('-created_at', '-id')
+
+        # Fetch one extra row to learn whether another page exists
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = results
+        return results
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class SelectablePaginationMixin:
+    """
+    Lets a client opt into keyset pagination per request with
+    ?pagination=cursor (or by following a `cursor` link). Other requests keep
+    the default page-number pagination.
+    """
+    keyset_pagination_class = KeysetPagination
+
+    def use_keyset_pagination(self):
+        params = self.request.query_params
+        return (params.get('pagination') == 'cursor'
+                or self.keyset_pagination_class.cursor_query_param in params)
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.request is not None and self.use_keyset_pagination():
+                self._paginator = self.keyset_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
@@ -0,0 +1,133 @@
+"""
+Role profile lookup
+
+Resolves the AdminHOD / Staffs / Students row of a user with one query
+(student profiles come with their course and session year). The result can
+be kept in the cache for USER_PROFILE_CACHE_TIMEOUT seconds; signals.py
+drops the cached copy whenever the profile is saved or deleted.
+
+create_user_with_profile() / create_user_profile() write the profile when a
+user is added. There is no post_save receiver on CustomUser, so saving a
+user (e.g. last_login at every login) never touches its profile row.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import CustomUser, AdminHOD, Staffs, Students, Courses, SessionYearModel
+
+PROFILE_QUERYSETS = {
+    CustomUser.HOD: lambda: AdminHOD.objects.all(),
+    CustomUser.STAFF: lambda: Staffs.objects.all(),
+    CustomUser.STUDENT: lambda: Students.objects.select_related('course_id', 'session_year_id'),
+}
+
+PROFILE_MODELS = {
+    CustomUser.HOD: AdminHOD,
+    CustomUser.STAFF: Staffs,
+    CustomUser.STUDENT: Students,
+}
+
+# Course / session year given to students added without one
+DEFAULT_COURSE_CACHE_KEY = "profile_defaults:course"
+DEFAULT_SESSION_YEAR_CACHE_KEY = "profile_defaults:session_year"
+
+
+def profile_cache_key(user_id):
+    return f"profile:{user_id}"
+
+
+def get_user_profile(user):
+    """
+    Args:
+        user: CustomUser (usually request.user)
+
+    Returns:
+        The AdminHOD, Staffs or Students instance of the user, or None for
+        anonymous users and users without a profile
+    """
+    if not user.is_authenticated:
+        return None
+    queryset = PROFILE_QUERYSETS.get(str(user.user_type))
+    if queryset is None:
+        return None
+
+    timeout = getattr(settings, 'USER_PROFILE_CACHE_TIMEOUT', 0)
+    profile = cache.get(profile_cache_key(user.id)) if timeout else None
+    if profile is None:
+        profile = queryset().filter(admin_id=user.id).first()
+        if profile is None:
+            return None
+        if timeout:
+            # Cached before .admin is attached, so the user row isn't stored with it
+            cache.set(profile_cache_key(user.id), profile, timeout)
+
+    # The user is already loaded by auth; don't query it again through .admin
+    profile.admin = user
+    return profile
+
+
+def invalidate_user_profile(user_id):
+    cache.delete(profile_cache_key(user_id))
+
+
+def _cached_default_id(cache_key, queryset):
+    pk = cache.get(cache_key)
+    if pk is None:
+        pk = queryset.order_by('id').values_list('id', flat=True).first()
+        if pk is not None:
+            cache.set(cache_key, pk, getattr(settings, 'PROFILE_DEFAULTS_CACHE_TIMEOUT', 3600))
+    return pk
+
+
+def default_course_id():
+    return _cached_default_id(DEFAULT_COURSE_CACHE_KEY, Courses.objects.all())
+
+
+def default_session_year_id():
+    return _cached_default_id(DEFAULT_SESSION_YEAR_CACHE_KEY, SessionYearModel.objects.all())
+
+
+def invalidate_profile_defaults():
+    cache.delete_many([DEFAULT_COURSE_CACHE_KEY, DEFAULT_SESSION_YEAR_CACHE_KEY])
+
+
+def create_user_profile(user, **fields):
+    """
+    Insert the AdminHOD, Staffs or Students row of a newly created user
+
+    Args:
+        user: Saved CustomUser
+        **fields: Profile fields; students without a course or session year
+                  get the first one (looked up once and cached)
+
+    Returns:
+        The created profile, or None for an unknown user type
+    """
+    model = PROFILE_MODELS.get(str(user.user_type))
+    if model is None:
+        return None
+    if model is Students:
+        if 'course_id' not in fields and 'course_id_id' not in fields:
+            fields['course_id_id'] = default_course_id()
+        if 'session_year_id' not in fields and 'session_year_id_id' not in fields:
+            fields['session_year_id_id'] = default_session_year_id()
+    return model.objects.create(admin=user, **fields)
+
+
+def create_user_with_profile(user_type, password=None, profile=None, **user_fields):
+    """
+    CustomUser.objects.create_user() and create_user_profile() in one
+    transaction
+
+    Args:
+        user_type: CustomUser.HOD, CustomUser.STAFF or CustomUser.STUDENT
+        profile: Dictionary of profile fields
+
+    Returns:
+        The created user
+    """
+    with transaction.atomic():
+        user = CustomUser.objects.create_user(password=password, user_type=str(user_type), **user_fields)
+        create_user_profile(user, **(profile or {}))
+    return user
@@ -0,0 +1,209 @@
+"""
+Bulk user provisioning
+
+import_users() enrolls students or staff members from CSV rows in one go.
+The rows are validated against the database with a fixed number of
+queries. The passwords are hashed in a process pool, because PBKDF2 is CPU
+bound and holds the GIL. The CustomUser rows and their Students / Staffs
+profiles are written with bulk_create, so none of the per-row post_save
+signals run.
+
+The HOD upload page runs the same import inside the request, so an account
+is never committed without its password.
+"""
+import csv
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+from .dashboard_cache import bump_dashboard_versions
+from .models import CustomUser, Staffs, Students, Courses, SessionYearModel
+
+logger = logging.getLogger(__name__)
+
+STAFF_COLUMNS = ('username', 'email', 'password', 'first_name', 'last_name', 'address')
+STUDENT_COLUMNS = STAFF_COLUMNS + ('gender', 'course_id', 'session_year_id')
+IMPORT_COLUMNS = {
+    CustomUser.STAFF: STAFF_COLUMNS,
+    CustomUser.STUDENT: STUDENT_COLUMNS,
+}
+# Key of the non-blank cells a CSV row has beyond its header
+EXTRA_VALUES = '__extra__'
+# A blank password would make an account nobody can log in to
+REQUIRED_COLUMNS = {
+    CustomUser.STAFF: ('username', 'email', 'password'),
+    CustomUser.STUDENT: ('username', 'email', 'password', 'course_id', 'session_year_id'),
+}
+
+
+def read_csv(file):
+    """
+    Rows of an uploaded or opened CSV file with a header line
+
+    Args:
+        file: Binary or text file object
+
+    Returns:
+        List of dictionaries with stripped values; non-blank cells beyond
+        the header are listed under EXTRA_VALUES and fail validation
+    """
+    content = file.read()
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    reader = csv.DictReader(io.StringIO(content))
+    return [_clean_row(row) for row in reader]
+
+
+def _clean_row(row):
+    # DictReader puts the cells beyond the header in a list under None; a
+    # trailing comma only adds blank ones
+    extra = [value.strip() for value in row.pop(None, None) or [] if value.strip()]
+    cleaned = {(key or '').strip(): (value or '').strip() for key, value in row.items()}
+    if extra:
+        cleaned[EXTRA_VALUES] = extra
+    return cleaned
+
+
+def _setup_worker():
+    # Spawned workers start without Django configured
+    import django
+    django.setup()
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    make_password() for each password, in PROVISIONING_HASH_WORKERS
+    processes; blank passwords become unusable ones
+
+    Returns:
+        List of hashes in the order of the passwords
+    """
+    if workers is None:
+        workers = getattr(settings, 'PROVISIONING_HASH_WORKERS', None)
+    if workers is None:
+        # The setting's default: one process per CPU
+        workers = os.cpu_count()
+    hashes = [None if password else make_password(None) for password in passwords]
+    pending = [(index, password) for index, password in enumerate(passwords) if password]
+    if workers and workers > 1 and len(pending) > 1:
+        chunksize = max(1, len(pending) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as executor:
+            hashed = list(executor.map(make_password, [password for _, password in pending], chunksize=chunksize))
+    else:
+        hashed = [make_password(password) for _, password in pending]
+    for (index, _), password_hash in zip(pending, hashed):
+        hashes[index] = password_hash
+    return hashes
+
+
+def validate_rows(rows, user_type):
+    """
+    Check import rows for missing values, invalid emails, unknown courses /
+    session years and usernames or emails already taken, in the file or in
+    the database
+
+    Returns:
+        Tuple of (valid rows, errors). Each error is a dictionary with the
+        CSV line number, the username and a message.
+    """
+    required = REQUIRED_COLUMNS[user_type]
+    usernames = {row.get('username', '') for row in rows}
+    emails = {row.get('email', '').lower() for row in rows}
+    taken_usernames = set(CustomUser.objects.filter(username__in=usernames).values_list('username', flat=True))
+    taken_emails = set(CustomUser.objects.annotate(email_lower=Lower('email'))
+                       .filter(email_lower__in=emails).values_list('email_lower', flat=True))
+    course_ids = session_year_ids = set()
+    if user_type == CustomUser.STUDENT:
+        course_ids = {str(pk) for pk in Courses.objects.values_list('id', flat=True)}
+        session_year_ids = {str(pk) for pk in SessionYearModel.objects.values_list('id', flat=True)}
+
+    valid = []
+    errors = []
+    for line, row in enumerate(rows, start=2):
+        username = row.get('username', '')
+        email = row.get('email', '').lower()
+        missing = [column for column in required if not row.get(column)]
+        try:
+            validate_email(email)
+            invalid_email = False
+        except ValidationError:
+            invalid_email = True
+
+        if row.get(EXTRA_VALUES):
+            error = f"More values than columns: {', '.join(row[EXTRA_VALUES])}"
+        elif missing:
+            error = f"Missing {', '.join(missing)}"
+        elif invalid_email:
+            error = f"Invalid email {email}"
+        elif username in taken_usernames:
+            error = f"Username {username} is already taken"
+        elif email in taken_emails:
+            error = f"Email {email} is already taken"
+        elif user_type == CustomUser.STUDENT and row['course_id'] not in course_ids:
+            error = f"Unknown course {row['course_id']}"
+        elif user_type == CustomUser.STUDENT and row['session_year_id'] not in session_year_ids:
+            error = f"Unknown session year {row['session_year_id']}"
+        else:
+            taken_usernames.add(username)
+            taken_emails.add(email)
+            valid.append(row)
+            continue
+        errors.append({"line": line, "username": username, "error": error})
+    return valid, errors
+
+
+def _profile(user, row, user_type):
+    if user_type == CustomUser.STAFF:
+        return Staffs(admin=user, address=row.get('address', ''))
+    return Students(admin=user, address=row.get('address', ''), gender=row.get('gender', ''), profile_pic='',
+                    course_id_id=int(row['course_id']), session_year_id_id=int(row['session_year_id']))
+
+
+def import_users(rows, user_type, workers=None, batch_size=None):
+    """
+    Create a CustomUser and its Staffs / Students profile for every valid row
+
+    Args:
+        rows: Dictionaries with the IMPORT_COLUMNS of the user type
+        user_type: CustomUser.STAFF or CustomUser.STUDENT
+
+    Returns:
+        Dictionary with the created / failed counts and the errors of the
+        rows that were skipped
+    """
+    batch_size = batch_size or getattr(settings, 'PROVISIONING_BATCH_SIZE', 1000)
+    valid, errors = validate_rows(rows, user_type)
+    result = {"created": 0, "failed": len(errors), "errors": errors}
+    if not valid:
+        return result
+
+    passwords = [row.get('password', '') for row in valid]
+    hashes = hash_passwords(passwords, workers)
+    users = [CustomUser(username=row['username'], email=row['email'], first_name=row.get('first_name', ''),
+                        last_name=row.get('last_name', ''), user_type=user_type, password=password_hash)
+             for row, password_hash in zip(valid, hashes)]
+    try:
+        with transaction.atomic():
+            users = CustomUser.objects.bulk_create(users, batch_size=batch_size)
+            profile_model = Staffs if user_type == CustomUser.STAFF else Students
+            profile_model.objects.bulk_create([_profile(user, row, user_type) for user, row in zip(users, valid)],
+                                              batch_size=batch_size)
+            # bulk_create sends no signals; the rosters on every dashboard changed
+            bump_dashboard_versions(['all'])
+    except IntegrityError as e:
+        # A username or email was taken between validation and insert
+        logger.error(f"User import failed: {str(e)}")
+        result["failed"] += len(valid)
+        result["errors"].append({"line": None, "username": None, "error": "Import failed, please retry"})
+        return result
+
+    result["created"] = len(users)
+    return result
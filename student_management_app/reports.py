@@ -0,0 +1,166 @@
+"""
+Background report jobs
+
+A ReportJob is created by the API and handed to a background worker (see
+background.run_in_background). The worker streams the rows out of the
+database, writes the PDF or Excel file under REPORT_JOB_ROOT and records
+progress on the job as it goes, so the request that enqueued it returns
+immediately. Finished files are kept until
+REPORT_JOB_TTL seconds have passed and are then removed by
+purge_expired_report_jobs (the purge_report_jobs command).
+"""
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .background import run_in_background
+from .exports import (
+    EXPORT_CHUNK_SIZE, EXPORT_CONTENT_TYPES,
+    STUDENT_EXPORT_COLUMNS, ATTENDANCE_REPORT_EXPORT_COLUMNS, RESULT_EXPORT_COLUMNS
+)
+from .models import Students, AttendanceReport, StudentResult, ReportJob
+
+logger = logging.getLogger(__name__)
+
+# What each report_type reads and which filters a client may apply to it
+REPORT_SOURCES = {
+    'students': {
+        'model': Students,
+        'columns': STUDENT_EXPORT_COLUMNS,
+        'filters': ('course_id', 'session_year_id', 'gender'),
+    },
+    'attendance': {
+        'model': AttendanceReport,
+        'columns': ATTENDANCE_REPORT_EXPORT_COLUMNS,
+        'filters': ('student_id', 'attendance_id', 'status',
+                    'attendance_id__subject_id', 'attendance_id__session_year_id'),
+    },
+    'results': {
+        'model': StudentResult,
+        'columns': RESULT_EXPORT_COLUMNS,
+        'filters': ('student_id', 'subject_id'),
+    },
+}
+
+REPORT_CONTENT_TYPES = {
+    'pdf': 'application/pdf',
+    'xlsx': EXPORT_CONTENT_TYPES['xlsx'],
+}
+
+
+def enqueue_report_job(job):
+    """
+    Hand a pending ReportJob to a worker once the current transaction commits
+    """
+    run_in_background(run_report_job, 'generate_report', job.id)
+
+
+def report_job_root():
+    """Directory of the report files, REPORT_JOB_ROOT"""
+    return getattr(settings, 'REPORT_JOB_ROOT', os.path.join(settings.BASE_DIR, 'reports'))
+
+
+def report_job_path(job):
+    """Absolute path of a job's result file"""
+    return os.path.join(report_job_root(), job.result_file)
+
+
+def _track_progress(job_id, rows, total):
+    """
+    Pass rows through, saving the percentage done every EXPORT_CHUNK_SIZE rows
+    """
+    done = 0
+    for done, row in enumerate(rows, 1):
+        yield row
+        if total and done % EXPORT_CHUNK_SIZE == 0:
+            # 100 is only reported once the file has been written
+            ReportJob.objects.filter(id=job_id).update(progress=min(99, done * 100 // total))
+
+
+def run_report_job(job_id):
+    """
+    Generate the file for a pending ReportJob and record the outcome on it
+
+    Args:
+        job_id: ReportJob id
+
+    Returns:
+        The ReportJob, or None if it was not pending (already picked up by
+        another worker)
+    """
+    # Claiming the job with a conditional UPDATE makes a redelivered task a no-op
+    claimed = ReportJob.objects.filter(id=job_id, status=ReportJob.PENDING).update(
+        status=ReportJob.RUNNING, started_at=timezone.now(), progress=0)
+    if not claimed:
+        return None
+
+    job = ReportJob.objects.get(id=job_id)
+    source = REPORT_SOURCES[job.report_type]
+    headers = [header for header, _ in source['columns']]
+    fields = [field for _, field in source['columns']]
+    title = job.title or f"{job.get_report_type_display()} Report"
+    filename = f"report_{job.id}.{job.file_format}"
+    path = os.path.join(report_job_root(), filename)
+
+    try:
+        queryset = source['model'].objects.filter(**job.filters).order_by('id')
+        total = queryset.count()
+        ReportJob.objects.filter(id=job.id).update(total_rows=total)
+        rows = _track_progress(job.id, queryset.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE), total)
+
+        os.makedirs(report_job_root(), exist_ok=True)
+        # reportlab / openpyxl are only needed by the worker
+        if job.file_format == 'xlsx':
+            from .utils import stream_excel_report
+            output = stream_excel_report(title, rows, columns=headers, output=path)
+        else:
+            from .utils import generate_pdf_report
+            max_rows = getattr(settings, 'REPORT_JOB_PDF_MAX_ROWS', 5000)
+            if total > max_rows:
+                raise ValueError(f"PDF reports are limited to {max_rows} rows ({total} requested), use xlsx instead")
+            output = generate_pdf_report(title, [list(row) for row in rows], filename=filename, columns=headers)
+            if output is not None:
+                with open(path, 'wb') as result:
+                    result.write(output.getvalue())
+        if output is None:
+            raise RuntimeError("Report generation failed")
+    except Exception as e:
+        logger.error(f"Report job {job.id} failed: {str(e)}")
+        if os.path.exists(path):
+            os.remove(path)
+        job.status = ReportJob.FAILED
+        job.error = str(e)
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'completed_at'])
+        return job
+
+    job.status = ReportJob.COMPLETED
+    job.progress = 100
+    job.total_rows = total
+    job.result_file = filename
+    job.completed_at = timezone.now()
+    job.expires_at = job.completed_at + timedelta(seconds=getattr(settings, 'REPORT_JOB_TTL', 60 * 60 * 24))
+    job.save(update_fields=['status', 'progress', 'total_rows', 'result_file', 'completed_at', 'expires_at'])
+    logger.info(f"Report job {job.id} completed: {total} rows")
+    return job
+
+
+def purge_expired_report_jobs(now=None):
+    """
+    Delete the files of completed jobs past their expiry and mark them expired
+
+    Returns:
+        Number of jobs expired
+    """
+    now = now or timezone.now()
+    jobs = list(ReportJob.objects.filter(status=ReportJob.COMPLETED, expires_at__lte=now)
+                .only('id', 'result_file'))
+    for job in jobs:
+        path = report_job_path(job)
+        if job.result_file and os.path.exists(path):
+            os.remove(path)
+    ReportJob.objects.filter(id__in=[job.id for job in jobs]).update(status=ReportJob.EXPIRED, result_file='')
+    return len(jobs)
@@ -0,0 +1,128 @@
+"""
+Scheduled publication and expiry
+
+run_scheduler() is called periodically (the run_scheduler command from
+cron, or the Celery beat task) and moves announcements and notifications
+through their lifetime with indexed range queries on scheduled_date /
+expiry_date, SCHEDULER_BATCH_SIZE rows at a time:
+
+- announcements whose scheduled_date has come are sent out
+- announcements and notifications past their expiry_date are deactivated
+  and archived, so they drop out of the live indexes read by the views
+- users with notifications that went live or expired get their unread
+  counter, modified time and open streams refreshed
+
+Read paths use ScheduledQuerySet.live(), so an item is shown or hidden on
+time even when the scheduler runs late; the scheduler only keeps the live
+set small and does the work that has to happen once.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Announcement, Notification
+from .notification_stream import publish_notifications
+from .notifications import enqueue_announcement_fanout, invalidate_unread_counts, touch_notifications
+
+logger = logging.getLogger(__name__)
+
+LAST_RUN_KEY = 'scheduler:last_run'
+
+
+def _batch_size():
+    return getattr(settings, 'SCHEDULER_BATCH_SIZE', 1000)
+
+
+def _refresh_users(user_ids):
+    invalidate_unread_counts(user_ids)
+    touch_notifications(user_ids)
+    publish_notifications(user_ids)
+
+
+def publish_due_announcements(now):
+    """
+    Send out the active announcements whose scheduled_date has come
+
+    Returns:
+        Number of announcements sent out
+    """
+    due = list(Announcement.objects.live(now).filter(is_active=True, fanout_status=Announcement.FANOUT_PENDING)
+               .exclude(scheduled_date__isnull=True).order_by('scheduled_date', 'id')[:_batch_size()])
+    for announcement in due:
+        enqueue_announcement_fanout(announcement)
+    return len(due)
+
+
+def archive_expired_announcements(now):
+    """
+    Returns:
+        Number of announcements archived
+    """
+    archived = 0
+    while True:
+        with transaction.atomic():
+            ids = list(Announcement.objects.filter(archived_at__isnull=True, expiry_date__lte=now)
+                       .order_by('expiry_date', 'id').values_list('id', flat=True)[:_batch_size()])
+            if not ids:
+                return archived
+            archived += Announcement.objects.filter(id__in=ids).update(is_active=False, archived_at=now)
+
+
+def archive_expired_notifications(now):
+    """
+    Returns:
+        Number of notifications archived
+    """
+    archived = 0
+    while True:
+        with transaction.atomic():
+            rows = list(Notification.objects.filter(archived_at__isnull=True, expiry_date__lte=now)
+                        .order_by('expiry_date', 'id').values_list('id', 'user_id')[:_batch_size()])
+            if not rows:
+                return archived
+            archived += Notification.objects.filter(id__in=[row[0] for row in rows]).update(archived_at=now)
+            _refresh_users({row[1] for row in rows})
+
+
+def announce_due_notifications(since, now):
+    """
+    Refresh the users with notifications scheduled in (since, now]
+
+    Returns:
+        Number of notifications that went live
+    """
+    published = 0
+    after = Q(scheduled_date__gt=since)
+    while True:
+        rows = list(Notification.objects.filter(after, archived_at__isnull=True, scheduled_date__lte=now)
+                    .order_by('scheduled_date', 'id').values_list('scheduled_date', 'id', 'user_id')
+                    [:_batch_size()])
+        if not rows:
+            return published
+        published += len(rows)
+        last_date, last_id, _ = rows[-1]
+        after = Q(scheduled_date__gt=last_date) | Q(scheduled_date=last_date, id__gt=last_id)
+        _refresh_users({row[2] for row in rows})
+
+
+def run_scheduler(now=None):
+    """
+    Returns:
+        Dictionary with the number of items each step handled
+    """
+    now = now or timezone.now()
+    since = cache.get(LAST_RUN_KEY) or now - timedelta(seconds=getattr(settings, 'SCHEDULER_LOOKBACK', 3600))
+    result = {
+        "announcements_published": publish_due_announcements(now),
+        "announcements_archived": archive_expired_announcements(now),
+        "notifications_published": announce_due_notifications(since, now),
+        "notifications_archived": archive_expired_notifications(now),
+    }
+    cache.set(LAST_RUN_KEY, now, None)
+    logger.info(f"Scheduler run: {result}")
+    return result
@@ -2,12 +2,14 @@
 Serializers for REST API
 """
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from .models import (
     CustomUser, Staffs, Students, Courses, Subjects,
     Attendance, AttendanceReport, LeaveReportStudent, LeaveReportStaff,
     StudentResult, Timetable, Announcement, Notification,
-    SessionYearModel
+    SessionYearModel, ReportJob, ArchivedAttendance, ArchivedAttendanceReport
 )
+from .reports import REPORT_SOURCES
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -37,10 +39,16 @@ class CourseSerializer(serializers.ModelSerializer):
         fields = ['id', 'course_name', 'created_at', 'student_count', 'subject_count']
         read_only_fields = ['id', 'created_at']
     
+    # The counts are annotated by CourseViewSet; fall back to a query for
+    # instances that did not come from the ViewSet queryset
     def get_student_count(self, obj):
+        if hasattr(obj, 'student_count'):
+            return obj.student_count
         return obj.students_set.count()
     
     def get_subject_count(self, obj):
+        if hasattr(obj, 'subject_count'):
+            return obj.subject_count
         return obj.subjects_set.count()
 
 
@@ -97,13 +105,37 @@ class AttendanceSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at']
     
+    # The counts are annotated by AttendanceViewSet; fall back to a query for
+    # instances that did not come from the ViewSet queryset
     def get_present_count(self, obj):
+        if hasattr(obj, 'present_count'):
+            return obj.present_count
         return obj.attendancereport_set.filter(status=True).count()
     
     def get_absent_count(self, obj):
+        if hasattr(obj, 'absent_count'):
+            return obj.absent_count
         return obj.attendancereport_set.filter(status=False).count()
 
 
+class AttendanceStudentStatusSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    status = serializers.BooleanField()
+
+
+class AttendanceBulkCreateSerializer(serializers.Serializer):
+    """Attendance of a whole class submitted in one request"""
+    subject_id = serializers.PrimaryKeyRelatedField(queryset=Subjects.objects.all())
+    session_year_id = serializers.PrimaryKeyRelatedField(queryset=SessionYearModel.objects.all())
+    attendance_date = serializers.DateField()
+    students = AttendanceStudentStatusSerializer(many=True, allow_empty=False)
+
+
+class AttendanceBulkUpdateSerializer(serializers.Serializer):
+    """New statuses for students of an existing attendance"""
+    students = AttendanceStudentStatusSerializer(many=True, allow_empty=False)
+
+
 class AttendanceReportSerializer(serializers.ModelSerializer):
     student_name = serializers.CharField(source='student_id.admin.get_full_name', read_only=True)
     subject_name = serializers.CharField(source='attendance_id.subject_id.subject_name', read_only=True)
@@ -118,6 +150,32 @@ class AttendanceReportSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class ArchivedAttendanceSerializer(AttendanceSerializer):
+    """Attendance of an archived session year (read only)"""
+
+    class Meta(AttendanceSerializer.Meta):
+        model = ArchivedAttendance
+        read_only_fields = AttendanceSerializer.Meta.fields
+
+    def get_present_count(self, obj):
+        if hasattr(obj, 'present_count'):
+            return obj.present_count
+        return obj.archivedattendancereport_set.filter(status=True).count()
+
+    def get_absent_count(self, obj):
+        if hasattr(obj, 'absent_count'):
+            return obj.absent_count
+        return obj.archivedattendancereport_set.filter(status=False).count()
+
+
+class ArchivedAttendanceReportSerializer(AttendanceReportSerializer):
+    """Attendance report of an archived session year (read only)"""
+
+    class Meta(AttendanceReportSerializer.Meta):
+        model = ArchivedAttendanceReport
+        read_only_fields = AttendanceReportSerializer.Meta.fields
+
+
 class LeaveReportStudentSerializer(serializers.ModelSerializer):
     student_name = serializers.CharField(source='student_id.admin.get_full_name', read_only=True)
     status_display = serializers.SerializerMethodField()
@@ -204,6 +262,41 @@ class NotificationSerializer(serializers.ModelSerializer):
         model = Notification
         fields = [
             'id', 'user', 'user_name', 'title', 'message',
-            'notification_type', 'is_read', 'link', 'created_at'
+            'notification_type', 'urgency', 'category', 'is_read', 'link',
+            'expiry_date', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'report_type', 'file_format', 'title', 'filters',
+            'status', 'progress', 'total_rows', 'error', 'download_url',
+            'created_at', 'started_at', 'completed_at', 'expires_at'
+        ]
+        read_only_fields = [
+            'id', 'status', 'progress', 'total_rows', 'error',
+            'created_at', 'started_at', 'completed_at', 'expires_at'
+        ]
+
+    def get_download_url(self, obj):
+        if obj.status != ReportJob.COMPLETED:
+            return None
+        return reverse('api:report-job-download', kwargs={'pk': obj.id}, request=self.context.get('request'))
+
+    def validate(self, data):
+        filters = data.get('filters') or {}
+        if not isinstance(filters, dict):
+            raise serializers.ValidationError({'filters': 'Must be an object'})
+        allowed = REPORT_SOURCES[data['report_type']]['filters']
+        invalid = [key for key in filters if key not in allowed]
+        if invalid:
+            raise serializers.ValidationError(
+                {'filters': f"Unsupported filters: {', '.join(invalid)}. Allowed: {', '.join(allowed)}"})
+        if any(isinstance(value, (dict, list)) for value in filters.values()):
+            raise serializers.ValidationError({'filters': 'Filter values must be plain values'})
+        return data
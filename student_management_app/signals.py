@@ -0,0 +1,115 @@
+"""
+Signal handlers that keep derived data in step with model writes
+
+Connected in StudentManagementAppConfig.ready(). Bulk writes (bulk_create,
+bulk_update, queryset.update) do not send these signals; the batched write
+paths in attendance.py and notifications.py update the derived data
+themselves.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .attendance import record_report_change
+from .dashboard_cache import bump_dashboard_versions
+from .notifications import adjust_unread_count, invalidate_unread_counts, touch_notifications
+from .notification_stream import publish_notifications
+from .profiles import invalidate_profile_defaults, invalidate_user_profile
+from .models import (
+    AdminHOD, Courses, SessionYearModel, Subjects, Staffs, Students, AttendanceReport, LeaveReportStudent, LeaveReportStaff,
+    FeedBackStudent, FeedBackStaffs, StudentResult, Notification
+)
+
+
+# Fields of an AttendanceReport that AttendanceSummary counts
+SUMMARY_FIELDS = {'attendance_id', 'student_id', 'status'}
+
+
+def _report_key(report):
+    return report.attendance_id_id, report.student_id_id, report.status
+
+
+@receiver(pre_save, sender=AttendanceReport)
+def attendance_report_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    # The summary delta needs the stored status of an edited report
+    instance._summary_before = None
+    if raw or instance._state.adding or (update_fields is not None and not SUMMARY_FIELDS & set(update_fields)):
+        return
+    instance._summary_before = (AttendanceReport.objects.filter(pk=instance.pk)
+                                .values_list('attendance_id', 'student_id', 'status').first())
+
+
+@receiver(post_save, sender=AttendanceReport)
+def attendance_report_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # save_attendance / update_attendance write in bulk, send no signals and
+    # record their own changes, so nothing is counted twice
+    if raw or (update_fields is not None and not SUMMARY_FIELDS & set(update_fields)):
+        return
+    record_report_change(None if created else getattr(instance, '_summary_before', None), _report_key(instance))
+
+
+@receiver(post_delete, sender=AttendanceReport)
+def attendance_report_deleted(sender, instance, **kwargs):
+    record_report_change(_report_key(instance), None)
+
+
+@receiver([post_save, post_delete], sender=LeaveReportStaff)
+def staff_leave_changed(sender, instance, **kwargs):
+    bump_dashboard_versions(['admin', f"staff:{instance.staff_id.admin_id}"])
+
+
+@receiver([post_save, post_delete], sender=StudentResult)
+def student_result_changed(sender, instance, **kwargs):
+    bump_dashboard_versions(['admin', f"student:{instance.student_id_id}"])
+
+
+@receiver([post_save, post_delete], sender=LeaveReportStudent)
+@receiver([post_save, post_delete], sender=FeedBackStudent)
+@receiver([post_save, post_delete], sender=FeedBackStaffs)
+def admin_dashboard_changed(sender, instance, **kwargs):
+    bump_dashboard_versions(['admin'])
+
+
+@receiver([post_save, post_delete], sender=Courses)
+@receiver([post_save, post_delete], sender=Subjects)
+@receiver([post_save, post_delete], sender=Staffs)
+@receiver([post_save, post_delete], sender=Students)
+def roster_changed(sender, instance, **kwargs):
+    bump_dashboard_versions(['all'])
+
+
+@receiver([post_save, post_delete], sender=Courses)
+@receiver([post_save, post_delete], sender=SessionYearModel)
+def profile_defaults_changed(sender, instance, **kwargs):
+    invalidate_profile_defaults()
+
+
+@receiver([post_save, post_delete], sender=AdminHOD)
+@receiver([post_save, post_delete], sender=Staffs)
+@receiver([post_save, post_delete], sender=Students)
+def profile_changed(sender, instance, **kwargs):
+    invalidate_user_profile(instance.admin_id)
+
+
+@receiver(post_save, sender=Notification)
+def notification_saved(sender, instance, created, **kwargs):
+    touch_notifications([instance.user_id])
+    if created and not (instance.scheduled_date or instance.expiry_date):
+        adjust_unread_count(instance.user_id, 0 if instance.is_read else 1)
+    else:
+        # Edits may change is_read and scheduled notifications only count
+        # once live; recount rather than guess
+        invalidate_unread_counts([instance.user_id])
+    if created:
+        publish_notifications([instance.user_id])
+
+
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    touch_notifications([instance.user_id])
+    if instance.is_read:
+        return
+    if not (instance.scheduled_date or instance.expiry_date or instance.archived_at):
+        adjust_unread_count(instance.user_id, -1)
+    else:
+        # Scheduled, expired and archived rows are only counted while live
+        invalidate_unread_counts([instance.user_id])
@@ -0,0 +1,285 @@
+"""
+Synthetic data for load testing and benchmarks
+
+SyntheticDataset builds a college of a given size (courses, subjects, staff,
+students, a session year per calendar year, a lecture per subject on every
+weekday with a report for each enrolled student, results, leaves,
+feedback, announcements and notifications) with bulk_create in batches of
+batch_size rows, never holding more than one batch of the big tables in
+memory. The same seed always yields the same college.
+
+AttendanceReport, by far the biggest table, skips the model layer and is
+written with executemany() on plain tuples.
+
+bulk_create sends no signals, so the profiles, AttendanceSummary rows and
+dashboard cache versions the signal handlers would maintain are written
+here as well.
+"""
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import islice
+from random import Random
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .dashboard_cache import bump_dashboard_versions
+from .models import (
+    CustomUser, AdminHOD, Staffs, Courses, Subjects, Students, SessionYearModel, Attendance, AttendanceReport,
+    AttendanceSummary, LeaveReportStudent, LeaveReportStaff, FeedBackStudent, FeedBackStaffs, StudentResult,
+    Announcement, Notification
+)
+
+FIRST_NAMES = (
+    'Aarav', 'Aditi', 'Arjun', 'Diya', 'Emma', 'Ethan', 'Fatima', 'Hana', 'Isaac', 'Ishaan', 'Kavya', 'Liam',
+    'Maya', 'Noah', 'Olivia', 'Priya', 'Rahul', 'Sara', 'Tanvi', 'Vikram', 'Yusuf', 'Zara',
+)
+LAST_NAMES = (
+    'Ahmed', 'Brown', 'Das', 'Garcia', 'Gupta', 'Iyer', 'Johnson', 'Khan', 'Kumar', 'Lee', 'Mehta', 'Nair',
+    'Patel', 'Rao', 'Reddy', 'Sharma', 'Singh', 'Smith', 'Verma', 'Williams',
+)
+COURSE_NAMES = ('BCA', 'MCA', 'B.Tech CSE', 'B.Tech ECE', 'B.Com', 'MBA', 'B.Sc Physics', 'BA Economics')
+SUBJECT_NAMES = (
+    'Mathematics', 'Programming', 'Data Structures', 'Databases', 'Networks', 'Operating Systems',
+    'Statistics', 'Economics', 'Accounting', 'Communication Skills', 'Physics', 'Electronics',
+)
+LEAVE_MESSAGES = ('Medical appointment', 'Family function', 'Feeling unwell', 'Travel', 'Personal work')
+FEEDBACK_MESSAGES = ('Please share the slides', 'Lab hours are too short', 'Great course', 'More practice tests')
+NOTIFICATION_TYPES = ('attendance', 'leave', 'result', 'announcement', 'feedback', 'general')
+
+# Share of students present at a lecture and of notifications already read
+PRESENT_RATE = 0.85
+READ_RATE = 0.7
+
+
+def batched(iterable, size):
+    """
+    Yield lists of up to size items from an iterable
+    """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class SyntheticDataset:
+    """
+    Generates a college with `students` students and `staff` staff members
+    whose attendance covers the last `days` days up to `today`
+
+    Usernames are '<prefix>_student<n>', '<prefix>_staff<n>' and
+    '<prefix>_admin'; every user's password is `password`.
+    """
+
+    def __init__(self, students, staff, days, seed=0, courses=None, subjects_per_course=6, notifications=10,
+                 batch_size=5000, prefix='synthetic', password='password', today=None, progress=None):
+        self.students = students
+        self.staff = max(staff, 1)
+        self.days = days
+        self.courses = courses or max(1, self.staff // 10)
+        self.subjects_per_course = subjects_per_course
+        self.notifications = notifications
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.password = password
+        self.today = today or timezone.localdate()
+        self.progress = progress or (lambda message: None)
+        self.rng = Random(seed)
+        self.counts = {}
+
+    def generate(self):
+        """
+        Returns:
+            Dictionary mapping each table to the number of rows written
+        """
+        self.password_hash = make_password(self.password)
+        self.write_session_years()
+        self.write_staff()
+        self.write_courses()
+        self.write_students()
+        self.write_attendance()
+        self.write_results()
+        self.write_leaves_and_feedback()
+        self.write_announcements_and_notifications()
+        bump_dashboard_versions(['all'])
+        return self.counts
+
+    def insert(self, model, objects):
+        """
+        bulk_create an iterable of unsaved instances batch by batch
+
+        Returns:
+            The created instances (with their ids)
+        """
+        start = time.perf_counter()
+        created = []
+        for batch in batched(objects, self.batch_size):
+            created += model.objects.bulk_create(batch)
+        self.report(model, len(created), start)
+        return created
+
+    def stream(self, model, objects):
+        """
+        Like insert() for the big tables, without keeping the instances
+        """
+        start = time.perf_counter()
+        written = 0
+        for batch in batched(objects, self.batch_size):
+            model.objects.bulk_create(batch)
+            written += len(batch)
+        self.report(model, written, start)
+
+    def copy(self, model, fields, rows):
+        """
+        INSERT tuples of field values with executemany(), batch_size rows per
+        transaction; created_at / updated_at are set to now
+        """
+        start = time.perf_counter()
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        columns = [model._meta.get_field(name).column for name in fields] + ['created_at', 'updated_at']
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(model._meta.db_table),
+            ', '.join(connection.ops.quote_name(column) for column in columns),
+            ', '.join(['%s'] * len(columns)))
+        written = 0
+        for batch in batched(rows, self.batch_size):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, [row + (now, now) for row in batch])
+            written += len(batch)
+        self.report(model, written, start)
+
+    def report(self, model, rows, start):
+        name = model._meta.object_name
+        self.counts[name] = self.counts.get(name, 0) + rows
+        self.progress(f"{name}: {rows} rows in {time.perf_counter() - start:.1f}s")
+
+    def user(self, username, user_type):
+        first_name = self.rng.choice(FIRST_NAMES)
+        last_name = self.rng.choice(LAST_NAMES)
+        return CustomUser(username=username, email=f"{username}@college.com", password=self.password_hash,
+                          first_name=first_name, last_name=last_name, user_type=user_type)
+
+    def write_session_years(self):
+        # One session per calendar year the attendance covers; the current one is open
+        self.start_date = self.today - timedelta(days=max(self.days - 1, 0))
+        self.session_years = {
+            year: session_year for year, session_year in zip(
+                range(self.start_date.year, self.today.year + 1),
+                self.insert(SessionYearModel, (
+                    SessionYearModel(session_start_year=date(year, 1, 1), session_end_year=date(year, 12, 31))
+                    for year in range(self.start_date.year, self.today.year + 1))))
+        }
+        self.current_session = self.session_years[self.today.year]
+
+    def write_staff(self):
+        admin = self.insert(CustomUser, [self.user(f"{self.prefix}_admin", CustomUser.HOD)])[0]
+        self.insert(AdminHOD, [AdminHOD(admin=admin)])
+        self.admin = admin
+        self.staff_users = self.insert(CustomUser, (self.user(f"{self.prefix}_staff{n}", CustomUser.STAFF)
+                                                    for n in range(self.staff)))
+        self.staffs = self.insert(Staffs, (Staffs(admin=user, address=f"{n} Faculty Road")
+                                           for n, user in enumerate(self.staff_users)))
+
+    def write_courses(self):
+        courses = self.insert(Courses, (
+            Courses(course_name=COURSE_NAMES[n % len(COURSE_NAMES)] + (f" {n // len(COURSE_NAMES) + 1}"
+                                                                       if n >= len(COURSE_NAMES) else ''))
+            for n in range(self.courses)))
+        subjects = self.insert(Subjects, (
+            Subjects(subject_name=f"{SUBJECT_NAMES[(n + k) % len(SUBJECT_NAMES)]} {k + 1}", course_id=course,
+                     staff_id=self.staff_users[(n * self.subjects_per_course + k) % len(self.staff_users)])
+            for n, course in enumerate(courses) for k in range(self.subjects_per_course)))
+        self.course_ids = [course.id for course in courses]
+        self.subjects_by_course = defaultdict(list)
+        for subject in subjects:
+            self.subjects_by_course[subject.course_id_id].append(subject.id)
+
+    def write_students(self):
+        users = self.insert(CustomUser, (self.user(f"{self.prefix}_student{n}", CustomUser.STUDENT)
+                                         for n in range(self.students)))
+        students = self.insert(Students, (
+            Students(admin=user, course_id_id=self.rng.choice(self.course_ids),
+                     session_year_id=self.current_session, gender=self.rng.choice(('Male', 'Female')),
+                     profile_pic='', address=f"{n} Campus Street")
+            for n, user in enumerate(users)))
+        self.student_users = [user.id for user in users]
+        self.students_by_course = defaultdict(list)
+        for student in students:
+            self.students_by_course[student.course_id_id].append(student.id)
+
+    def write_attendance(self):
+        lecture_days = [self.start_date + timedelta(days=n) for n in range(self.days)]
+        lecture_days = [day for day in lecture_days if day.weekday() < 5]
+        attendances = self.insert(Attendance, (
+            Attendance(subject_id_id=subject_id, attendance_date=day,
+                       session_year_id=self.session_years[day.year])
+            for subjects in self.subjects_by_course.values() for subject_id in subjects for day in lecture_days))
+
+        summaries = defaultdict(lambda: [0, 0])
+        course_by_subject = {subject_id: course_id for course_id, subjects in self.subjects_by_course.items()
+                             for subject_id in subjects}
+
+        def reports():
+            for attendance in attendances:
+                subject_id = attendance.subject_id_id
+                session_year_id = attendance.session_year_id_id
+                for student_id in self.students_by_course[course_by_subject[subject_id]]:
+                    status = self.rng.random() < PRESENT_RATE
+                    summaries[(student_id, subject_id, session_year_id)][0 if status else 1] += 1
+                    yield student_id, attendance.id, status
+
+        self.copy(AttendanceReport, ('student_id', 'attendance_id', 'status'), reports())
+        self.stream(AttendanceSummary, (
+            AttendanceSummary(student_id_id=student_id, subject_id_id=subject_id, session_year_id_id=session_year_id,
+                              present_count=present, absent_count=absent)
+            for (student_id, subject_id, session_year_id), (present, absent) in summaries.items()))
+
+    def write_results(self):
+        self.stream(StudentResult, (
+            StudentResult(student_id_id=student_id, subject_id_id=subject_id,
+                          subject_exam_marks=round(min(100, max(0, self.rng.gauss(65, 15))), 1),
+                          subject_assignment_marks=round(min(100, max(0, self.rng.gauss(75, 12))), 1))
+            for course_id, students in self.students_by_course.items()
+            for student_id in students for subject_id in self.subjects_by_course[course_id]))
+
+    def leave_date(self):
+        return str(self.start_date + timedelta(days=self.rng.randrange(max(self.days, 1))))
+
+    def write_leaves_and_feedback(self):
+        # Most leaves are approved (1), some pending (0) or rejected (2)
+        statuses = (0, 1, 1, 1, 2)
+        self.stream(LeaveReportStudent, (
+            LeaveReportStudent(student_id_id=student_id, leave_date=self.leave_date(),
+                               leave_message=self.rng.choice(LEAVE_MESSAGES), leave_status=self.rng.choice(statuses))
+            for students in self.students_by_course.values() for student_id in students
+            for _ in range(self.rng.randint(0, 3))))
+        self.stream(LeaveReportStaff, (
+            LeaveReportStaff(staff_id=staff, leave_date=self.leave_date(),
+                             leave_message=self.rng.choice(LEAVE_MESSAGES), leave_status=self.rng.choice(statuses))
+            for staff in self.staffs for _ in range(self.rng.randint(0, 5))))
+        self.stream(FeedBackStudent, (
+            FeedBackStudent(student_id_id=student_id, feedback=self.rng.choice(FEEDBACK_MESSAGES),
+                            feedback_reply='Noted, thanks' if self.rng.random() < 0.5 else '')
+            for students in self.students_by_course.values() for student_id in students
+            if self.rng.random() < 0.2))
+        self.stream(FeedBackStaffs, (
+            FeedBackStaffs(staff_id=staff, feedback=self.rng.choice(FEEDBACK_MESSAGES),
+                           feedback_reply='Noted, thanks' if self.rng.random() < 0.5 else '')
+            for staff in self.staffs if self.rng.random() < 0.5))
+
+    def write_announcements_and_notifications(self):
+        announcements = self.insert(Announcement, (
+            Announcement(title=f"Announcement {n + 1}", message="Please read the attached circular.",
+                         target_audience=self.rng.choice(('all', 'students', 'staff')),
+                         urgency=self.rng.choice(('low', 'medium', 'high')),
+                         created_by_id=self.rng.choice([self.admin.id] + [user.id for user in self.staff_users]),
+                         fanout_status=Announcement.FANOUT_SENT)
+            for n in range(max(5, self.staff // 10))))
+        titles = [announcement.title for announcement in announcements]
+        self.stream(Notification, (
+            Notification(user_id=user_id, title=self.rng.choice(titles), message="",
+                         notification_type=self.rng.choice(NOTIFICATION_TYPES),
+                         is_read=self.rng.random() < READ_RATE)
+            for user_id in self.student_users + [user.id for user in self.staff_users]
+            for _ in range(self.notifications)))
@@ -0,0 +1,55 @@
+"""
+Celery tasks
+
+Only used when CELERY_BROKER_URL is set; without a broker the same
+functions run in the in-process thread pool instead (see
+background.run_in_background).
+"""
+from celery import shared_task
+
+from .archive import archive_session_year, closed_session_years
+from .notifications import fan_out_announcement, resume_announcement_fanouts, reconcile_unread_counts
+from .reports import run_report_job, purge_expired_report_jobs
+from .scheduler import run_scheduler
+
+
+@shared_task(ignore_result=True)
+def generate_report(job_id):
+    """Generate the file for a ReportJob"""
+    run_report_job(job_id)
+
+
+@shared_task
+def purge_report_jobs():
+    """Remove expired report files (schedule with celery beat)"""
+    return purge_expired_report_jobs()
+
+
+@shared_task(ignore_result=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=5)
+def send_announcement(announcement_id):
+    """Create the notifications of an announcement; retries resume where the last attempt stopped"""
+    fan_out_announcement(announcement_id)
+
+
+@shared_task
+def resume_announcements():
+    """Finish announcements left part way sent (schedule with celery beat)"""
+    return resume_announcement_fanouts()
+
+
+@shared_task
+def reconcile_unread_notification_counts():
+    """Correct drifted unread notification counters (schedule with celery beat)"""
+    return reconcile_unread_counts()
+
+
+@shared_task
+def run_schedule():
+    """Publish due and archive expired announcements / notifications (schedule with celery beat every minute)"""
+    return run_scheduler()
+
+
+@shared_task
+def archive_session_years():
+    """Archive the attendance of ended session years (schedule with celery beat daily)"""
+    return [archive_session_year(session_year) for session_year in closed_session_years()]
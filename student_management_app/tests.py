@@ -1,3 +1,1205 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import importlib
+import json
+import os
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.contrib.auth import authenticate
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .archive import archive_session_year
+from .benchmarks import compare, run_benchmarks
+from .attendance import rebuild_attendance_summary, record_attendance_changes, save_attendance, update_attendance
+from .reports import purge_expired_report_jobs
+from .notifications import (
+    fan_out_announcement, resume_announcement_fanouts, get_unread_count, reconcile_unread_counts, unread_count_key
+)
+from .middleware import build_route_policies
+from .notification_stream import InProcessBroker, get_broker, latest_notification_id, sse_events
+from .scheduler import run_scheduler
+from .provisioning import hash_passwords, import_users, read_csv
+from .synthetic_data import SyntheticDataset
+from .instrumentation import fingerprint, query_stats
+from .profiles import create_user_with_profile, default_course_id, default_session_year_id, get_user_profile
+from .dashboard_cache import get_cached_staff_dashboard_stats, get_cached_student_dashboard_stats
+from .dashboard import get_admin_dashboard_stats, get_staff_dashboard_stats, get_student_dashboard_stats
+from .models import (
+    CustomUser, Staffs, Courses, Subjects, Students, SessionYearModel,
+    Attendance, AttendanceReport, AttendanceSummary, LeaveReportStudent, LeaveReportStaff,
+    FeedBackStudent, FeedBackStaffs, StudentResult, Timetable, Announcement, Notification, ReportJob,
+    ArchivedAttendance, ArchivedAttendanceReport
+)
+
+
+def make_staff(username):
+    user = CustomUser.objects.create_user(username=username, email=f"{username}@college.com",
+                                          first_name=username, last_name="Staff", user_type=CustomUser.STAFF)
+    return Staffs.objects.create(admin=user, address="")
+
+
+def make_student(username, course, session_year):
+    user = CustomUser.objects.create_user(username=username, email=f"{username}@college.com",
+                                          first_name=username, last_name="Student", user_type=CustomUser.STUDENT)
+    return Students.objects.create(admin=user, course_id=course, session_year_id=session_year,
+                                   address="", profile_pic="", gender="Male")
+
+
+class SampleDataMixin:
+    """
+    Builds a small college: every call adds one course with one staff
+    member, two subjects, `students` students and a day of attendance.
+    """
+
+    def add_course(self, index, students=3):
+        if not hasattr(self, 'session_year'):
+            self.session_year = SessionYearModel.objects.create(session_start_year=datetime.date(2024, 1, 1),
+                                                                session_end_year=datetime.date(2024, 12, 31))
+        course = Courses.objects.create(course_name=f"Course {index}")
+        staff = make_staff(f"staff{index}")
+        subjects = [Subjects.objects.create(subject_name=f"Subject {index}-{n}", course_id=course, staff_id=staff.admin)
+                    for n in range(2)]
+        students = [make_student(f"student{index}-{n}", course, self.session_year) for n in range(students)]
+
+        for subject in subjects:
+            attendance = Attendance.objects.create(subject_id=subject, attendance_date=datetime.date(2024, 2, 1),
+                                                   session_year_id=self.session_year)
+            for n, student in enumerate(students):
+                AttendanceReport.objects.create(student_id=student, attendance_id=attendance, status=n % 2 == 0)
+
+        LeaveReportStaff.objects.create(staff_id=staff, leave_date="2024-02-02", leave_message="", leave_status=1)
+        for student in students:
+            LeaveReportStudent.objects.create(student_id=student, leave_date="2024-02-02", leave_message="", leave_status=1)
+            FeedBackStudent.objects.create(student_id=student, feedback="ok", feedback_reply="")
+        FeedBackStaffs.objects.create(staff_id=staff, feedback="ok", feedback_reply="thanks")
+        return course, staff, subjects, students
+
+
+class AdminDashboardStatsTests(SampleDataMixin, TestCase):
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            get_admin_dashboard_stats()
+        return len(queries)
+
+    def test_context_values(self):
+        self.add_course(1, students=3)
+        stats = get_admin_dashboard_stats()
+
+        self.assertEqual(stats["all_student_count"], 3)
+        self.assertEqual(stats["course_name_list"], ["Course 1"])
+        self.assertEqual(stats["subject_count_list"], [2])
+        self.assertEqual(stats["student_count_list_in_course"], [3])
+        self.assertEqual(stats["student_count_list_in_subject"], [3, 3])
+        self.assertEqual(stats["staff_attendance_present_list"], [2])
+        self.assertEqual(stats["staff_attendance_leave_list"], [1])
+        # Students 0 and 2 are present in both subjects, student 1 absent in both
+        self.assertEqual(stats["student_attendance_present_list"], [2, 0, 2])
+        self.assertEqual(stats["student_attendance_leave_list"], [1, 3, 1])
+        self.assertEqual(stats["student_leave_approved"], 3)
+        self.assertEqual(stats["student_feedback_replied"], 0)
+        self.assertEqual(stats["staff_feedback_replied"], 1)
+
+    def test_query_count_does_not_grow_with_data(self):
+        self.add_course(1)
+        baseline = self.count_queries()
+
+        for index in range(2, 6):
+            self.add_course(index, students=5)
+        self.assertEqual(self.count_queries(), baseline)
+
+
+class AttendanceSummaryTests(SampleDataMixin, TestCase):
+
+    def summary_rows(self):
+        return sorted(AttendanceSummary.objects.values_list('student_id', 'subject_id', 'session_year_id',
+                                                            'present_count', 'absent_count'))
+
+    def test_incremental_updates_match_rebuild(self):
+        _, _, subjects, students = self.add_course(1)
+        attendance = Attendance.objects.filter(subject_id=subjects[0]).get()
+        report = AttendanceReport.objects.get(attendance_id=attendance, student_id=students[1])
+        report.status = True
+        report.save()
+        record_attendance_changes(attendance, [(students[0].id, True, True)])
+
+        incremental = self.summary_rows()
+        call_command('rebuild_attendance_summary', stdout=StringIO())
+        self.assertEqual(self.summary_rows(), incremental)
+        self.assertIn((students[1].id, subjects[0].id, self.session_year.id, 1, 0), incremental)
+
+    def test_legacy_reports_are_backfilled_and_editable(self):
+        _, _, subjects, students = self.add_course(1)
+        attendance = Attendance.objects.filter(subject_id=subjects[0]).get()
+        # Reports taken before AttendanceSummary existed
+        AttendanceSummary.objects.all().delete()
+        migration = importlib.import_module('student_management_app.migrations.0016_backfill_attendance_summary')
+        migration.rebuild_attendance_summary(django_apps, None)
+
+        result = update_attendance(attendance, [{"id": students[0].id, "status": 0}], lookup='id')
+        self.assertEqual(result["changed"], 1)
+        self.assertIn((students[0].id, subjects[0].id, self.session_year.id, 0, 1), self.summary_rows())
+        incremental = self.summary_rows()
+        rebuild_attendance_summary()
+        self.assertEqual(self.summary_rows(), incremental)
+
+    def assert_matches_rebuild(self):
+        # Deletes may leave (0, 0) rows that a rebuild doesn't write
+        incremental = [row for row in self.summary_rows() if row[3] or row[4]]
+        rebuild_attendance_summary()
+        self.assertEqual(self.summary_rows(), incremental)
+        return incremental
+
+    def test_api_report_writes_update_the_summary(self):
+        _, staff, subjects, students = self.add_course(1)
+        client = APIClient()
+        client.force_authenticate(staff.admin)
+        first = Attendance.objects.get(subject_id=subjects[0])
+        attendance = Attendance.objects.create(subject_id=subjects[0], attendance_date=datetime.date(2024, 2, 5),
+                                               session_year_id=self.session_year)
+
+        response = client.post('/api/attendance-reports/', {"student_id": students[1].id,
+                                                            "attendance_id": attendance.id, "status": True})
+        self.assertEqual(response.status_code, 201)
+        self.assertIn((students[1].id, subjects[0].id, self.session_year.id, 1, 1), self.assert_matches_rebuild())
+
+        report_id = response.data["id"]
+        self.assertEqual(client.patch(f'/api/attendance-reports/{report_id}/', {"status": False}).status_code, 200)
+        self.assertIn((students[1].id, subjects[0].id, self.session_year.id, 0, 2), self.assert_matches_rebuild())
+
+        self.assertEqual(client.delete(f'/api/attendance-reports/{report_id}/').status_code, 204)
+        self.assertIn((students[1].id, subjects[0].id, self.session_year.id, 0, 1), self.assert_matches_rebuild())
+
+        # Deleting an attendance cascades to its reports
+        self.assertEqual(client.delete(f'/api/attendance/{first.id}/').status_code, 204)
+        self.assertNotIn(subjects[0].id, [row[1] for row in self.assert_matches_rebuild()])
+
+    def test_staff_and_student_dashboards(self):
+        _, staff, _, students = self.add_course(1)
+
+        staff_stats = get_staff_dashboard_stats(staff.admin)
+        self.assertEqual(staff_stats["students_count"], 3)
+        self.assertEqual(staff_stats["attendance_list"], [1, 1])
+        self.assertEqual(staff_stats["attendance_present_list"], [2, 0, 2])
+        self.assertEqual(staff_stats["attendance_absent_list"], [0, 2, 0])
+        self.assertEqual(staff_stats["leave_count"], 1)
+
+        student_stats = get_student_dashboard_stats(students[0])
+        self.assertEqual(student_stats["total_attendance"], 2)
+        self.assertEqual(student_stats["data_present"], [1, 1])
+        self.assertEqual(student_stats["attendance_percentage"], 100.0)
+
+
+class SaveAttendanceTests(SampleDataMixin, TestCase):
+
+    def setUp(self):
+        self.course, self.staff, self.subjects, self.students = self.add_course(1)
+        self.client.force_login(self.staff.admin)
+
+    def test_ajax_save_is_batched(self):
+        entries = [{"id": student.admin_id, "status": 1} for student in self.students] + [{"id": 999999, "status": 0}]
+        data = {"subject_id": self.subjects[0].id, "session_year_id": self.session_year.id,
+                "attendance_date": "2024-03-01", "student_ids": json.dumps(entries)}
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/save_attendance_data/', data)
+        result = response.json()
+
+        self.assertEqual(result["status"], "OK")
+        self.assertEqual(result["created"], 3)
+        self.assertEqual(result["failed_ids"], ["999999"])
+        self.assertEqual(AttendanceReport.objects.filter(attendance_id=result["attendance_id"], status=True).count(), 3)
+        self.assertEqual(AttendanceSummary.objects.get(student_id=self.students[1], subject_id=self.subjects[0]).present_count, 1)
+
+        # Same query count for a larger class
+        bigger = [{"id": make_student(f"extra{n}", self.course, self.session_year).admin_id, "status": 1} for n in range(10)]
+        data.update(attendance_date="2024-03-02", student_ids=json.dumps(entries + bigger))
+        with CaptureQueriesContext(connection) as bigger_queries:
+            self.client.post('/save_attendance_data/', data)
+        self.assertEqual(len(bigger_queries), len(queries))
+
+    def test_ajax_save_without_students_fails(self):
+        data = {"subject_id": self.subjects[0].id, "session_year_id": self.session_year.id,
+                "attendance_date": "2024-03-01", "student_ids": json.dumps([{"id": 999999, "status": 1}])}
+        response = self.client.post('/save_attendance_data/', data)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Attendance.objects.filter(attendance_date="2024-03-01").exists())
+
+    def test_same_subject_and_day_is_rejected(self):
+        data = {"subject_id": self.subjects[0].id, "session_year_id": self.session_year.id,
+                "attendance_date": "2024-02-01", "student_ids": json.dumps([{"id": self.students[0].admin_id, "status": 1}])}
+        response = self.client.post('/save_attendance_data/', data)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["attendance_id"],
+                         Attendance.objects.get(subject_id=self.subjects[0], attendance_date="2024-02-01").id)
+        self.assertEqual(AttendanceSummary.objects.get(student_id=self.students[0], subject_id=self.subjects[0]).present_count, 1)
+
+        subject, student = self.subjects[0], self.students[0]
+        for marks in ("40", "45"):
+            self.client.post('/staff_add_result_save/', {"student_list": student.admin_id, "subject": subject.id,
+                                                         "exam_marks": marks, "assignment_marks": "10"})
+        self.assertEqual(list(StudentResult.objects.filter(student_id=student, subject_id=subject)
+                              .values_list('subject_exam_marks', flat=True)), [45.0])
+
+    def test_api_bulk_create(self):
+        client = APIClient()
+        client.force_authenticate(self.staff.admin)
+        response = client.post('/api/attendance/bulk-create/', {
+            "subject_id": self.subjects[1].id,
+            "session_year_id": self.session_year.id,
+            "attendance_date": "2024-03-02",
+            "students": [{"id": student.id, "status": False} for student in self.students],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 3)
+        self.assertEqual(AttendanceReport.objects.filter(attendance_id=response.data["attendance_id"], status=False).count(), 3)
+
+
+class UpdateAttendanceTests(SampleDataMixin, TestCase):
+
+    def setUp(self):
+        _, self.staff, self.subjects, self.students = self.add_course(1)
+        self.attendance = Attendance.objects.get(subject_id=self.subjects[0])
+        self.client.force_login(self.staff.admin)
+
+    def test_ajax_update_writes_only_changes(self):
+        # Student 0 is already present, student 1 flips to present
+        entries = [{"id": self.students[0].admin_id, "status": 1}, {"id": self.students[1].admin_id, "status": 1}]
+        response = self.client.post('/update_attendance_data/', {"attendance_date": self.attendance.id,
+                                                                 "student_ids": json.dumps(entries)})
+        result = response.json()
+
+        self.assertEqual(result["changed"], 1)
+        self.assertEqual(result["unchanged"], 1)
+        self.assertTrue(AttendanceReport.objects.get(attendance_id=self.attendance, student_id=self.students[1]).status)
+        summary = AttendanceSummary.objects.get(student_id=self.students[1], subject_id=self.subjects[0])
+        self.assertEqual((summary.present_count, summary.absent_count), (1, 0))
+
+    def test_api_bulk_update(self):
+        client = APIClient()
+        client.force_authenticate(self.staff.admin)
+        response = client.post(f'/api/attendance/{self.attendance.id}/bulk-update/', {
+            "students": [{"id": student.id, "status": False} for student in self.students] + [{"id": 999999, "status": True}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["changed"], 2)
+        self.assertEqual(response.data["failed_ids"], ["999999"])
+        self.assertFalse(AttendanceReport.objects.filter(attendance_id=self.attendance, status=True).exists())
+
+
+class ApiQueryBudgetTests(SampleDataMixin, TestCase):
+    """
+    Every list endpoint must serialize a full page with a fixed number of
+    queries: the pagination COUNT plus the page itself.
+    """
+    budgets = {
+        '/api/users/': 2,
+        '/api/session-years/': 2,
+        '/api/courses/': 2,
+        '/api/subjects/': 2,
+        '/api/staff/': 2,
+        '/api/students/': 2,
+        '/api/attendance/': 2,
+        '/api/attendance-reports/': 2,
+        '/api/student-leaves/': 2,
+        '/api/staff-leaves/': 2,
+        '/api/results/': 2,
+        '/api/timetable/': 2,
+        '/api/announcements/': 2,
+        '/api/notifications/': 2,
+    }
+
+    def add_course(self, index, students=3):
+        course, staff, subjects, students = super().add_course(index, students)
+        for student in students:
+            StudentResult.objects.create(student_id=student, subject_id=subjects[0], subject_exam_marks=50)
+            Notification.objects.create(user=student.admin, title="Hello", message="", notification_type="general")
+        Timetable.objects.create(subject=subjects[0], course=course, session_year=self.session_year,
+                                 day_of_week='Monday', start_time=datetime.time(9), end_time=datetime.time(10))
+        Announcement.objects.create(title=f"News {index}", message="", target_audience='all', created_by=staff.admin)
+        return course, staff, subjects, students
+
+    def count_queries(self, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def test_list_endpoints_stay_within_budget(self):
+        self.add_course(1, students=1)
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.get(username="staff1"))
+        small = {url: self.count_queries(client, url) for url in self.budgets}
+
+        for index in range(2, 5):
+            self.add_course(index, students=4)
+        for url, budget in self.budgets.items():
+            with self.subTest(url=url):
+                queries = self.count_queries(client, url)
+                self.assertEqual(queries, small[url])
+                self.assertLessEqual(queries, budget)
+
+    def test_course_counts_are_annotated(self):
+        self.add_course(1, students=3)
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.get(username="staff1"))
+        course = client.get('/api/courses/').data['results'][0]
+        self.assertEqual((course['student_count'], course['subject_count']), (3, 2))
+        attendance = client.get('/api/attendance/').data['results'][0]
+        self.assertEqual((attendance['present_count'], attendance['absent_count']), (2, 1))
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.user = make_staff("reader").admin
+        Notification.objects.bulk_create([
+            Notification(user=self.user, title=f"N{n}", message="", notification_type="general") for n in range(25)
+        ])
+        # Give most rows the same timestamp so ties have to be broken on id
+        Notification.objects.filter(id__lte=Notification.objects.order_by('id')[19].id).update(
+            created_at=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_scrolls_forward_and_back_without_gaps(self):
+        expected = list(Notification.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        seen = []
+        pages = []
+        url = '/api/notifications/?pagination=cursor&page_size=10'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get(url).data
+            self.assertNotIn('count', data)
+            self.assertEqual(len(queries), 1)
+            pages.append(data)
+            seen += [row['id'] for row in data['results']]
+            url = data['next']
+        self.assertEqual(seen, expected)
+        self.assertEqual([len(page['results']) for page in pages], [10, 10, 5])
+
+        previous = self.client.get(pages[2]['previous']).data
+        self.assertEqual([row['id'] for row in previous['results']], expected[10:20])
+        self.assertIsNotNone(previous['previous'])
+
+    def test_page_size_is_capped_and_default_pagination_unchanged(self):
+        with self.settings(CURSOR_PAGINATION_MAX_PAGE_SIZE=5):
+            data = self.client.get('/api/notifications/?pagination=cursor&page_size=50').data
+        self.assertEqual(len(data['results']), 5)
+        self.assertEqual(self.client.get('/api/notifications/').data['count'], 25)
+        self.assertEqual(self.client.get('/api/notifications/?cursor=garbage').status_code, 404)
+
+
+class StreamingExportTests(SampleDataMixin, TestCase):
+
+    def setUp(self):
+        _, staff, _, _ = self.add_course(1)
+        self.client = APIClient()
+        self.client.force_authenticate(staff.admin)
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_export_applies_filters(self):
+        response = self.client.get('/api/attendance-reports/export/?file_type=csv&status=true')
+        lines = self.read(response).splitlines()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'student_id', 'username'])
+        self.assertEqual(len(lines), 1 + AttendanceReport.objects.filter(status=True).count())
+
+    def test_ndjson_export(self):
+        rows = [json.loads(line) for line in self.read(self.client.get('/api/students/export/?file_type=ndjson')).splitlines()]
+        self.assertEqual(sorted(row['username'] for row in rows), ['student1-0', 'student1-1', 'student1-2'])
+        self.assertEqual(self.client.get('/api/results/export/?file_type=xml').status_code, 400)
+
+    def test_xlsx_export_from_generator(self):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            self.skipTest("openpyxl is not installed")
+        from .utils import stream_excel_report
+
+        rows = ({"id": n, "name": f"Student {n}", "marks": n * 1.5} for n in range(500))
+        workbook = load_workbook(stream_excel_report("Results", rows, width_sample_size=10))
+        sheet = workbook.active
+        self.assertEqual([cell.value for cell in sheet[4]], ["id", "name", "marks"])
+        self.assertEqual(sheet.max_row, 4 + 500)
+        self.assertEqual(sheet.column_dimensions['B'].width, len("Student 0") + 2)
+
+        response = self.client.get('/api/students/export/?file_type=xlsx')
+        self.assertEqual(load_workbook(BytesIO(b"".join(response.streaming_content))).active.max_row, 4 + 3)
+
+
+class ReportJobTests(SampleDataMixin, TestCase):
+
+    def setUp(self):
+        _, staff, _, _ = self.add_course(1)
+        self.client = APIClient()
+        self.client.force_authenticate(staff.admin)
+        self.report_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.report_dir.cleanup)
+        settings_override = override_settings(BACKGROUND_JOB_BACKEND='sync', REPORT_JOB_ROOT=self.report_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_enqueue_poll_download_and_expire(self):
+        response = self.client.post('/api/report-jobs/', {
+            'report_type': 'attendance', 'file_format': 'pdf', 'filters': {'status': True},
+        }, format='json')
+        self.assertEqual(response.status_code, 202)
+        job = self.client.get(f"/api/report-jobs/{response.data['id']}/").data
+        self.assertEqual((job['status'], job['progress']), ('completed', 100))
+        self.assertEqual(job['total_rows'], AttendanceReport.objects.filter(status=True).count())
+
+        self.assertEqual(job['download_url'], f"http://testserver/api/report-jobs/{job['id']}/download/")
+        download = self.client.get(job['download_url'])
+        self.assertEqual(download['Content-Type'], 'application/pdf')
+        self.assertTrue(b"".join(download.streaming_content).startswith(b"%PDF"))
+        download.close()
+
+        path = os.path.join(self.report_dir.name, ReportJob.objects.get(id=job['id']).result_file)
+        self.assertEqual(purge_expired_report_jobs(now=datetime.datetime.fromisoformat(job['expires_at'])), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.client.get(f"/api/report-jobs/{job['id']}/download/").status_code, 410)
+
+    def test_invalid_filters_and_failures(self):
+        response = self.client.post('/api/report-jobs/', {
+            'report_type': 'students', 'filters': {'admin__password': 'x'},
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        with override_settings(REPORT_JOB_PDF_MAX_ROWS=1):
+            response = self.client.post('/api/report-jobs/', {'report_type': 'students', 'file_format': 'pdf'},
+                                        format='json')
+        self.assertEqual(response.data['status'], 'failed')
+        self.assertIn('limited to 1 rows', response.data['error'])
+        self.assertEqual(self.client.get(f"/api/report-jobs/{response.data['id']}/download/").status_code, 409)
+        self.assertEqual(os.listdir(self.report_dir.name), [])
+
+
+class DashboardCacheTests(SampleDataMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.course, self.staff, self.subjects, self.students = self.add_course(1)
+
+    def test_cached_until_a_write_invalidates_it(self):
+        stats = get_cached_staff_dashboard_stats(self.staff.admin)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_cached_staff_dashboard_stats(self.staff.admin), stats)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            LeaveReportStaff.objects.create(staff_id=self.staff, leave_date="2024-03-01", leave_message="", leave_status=1)
+        self.assertEqual(get_cached_staff_dashboard_stats(self.staff.admin)["leave_count"], stats["leave_count"] + 1)
+
+        student = self.students[1]
+        self.assertEqual(get_cached_student_dashboard_stats(student)["attendance_absent"], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            save_attendance(self.subjects[0], self.session_year, "2024-03-01", [{"id": student.admin_id, "status": 0}])
+        self.assertEqual(get_cached_student_dashboard_stats(student)["attendance_absent"], 3)
+        self.assertEqual(get_cached_staff_dashboard_stats(self.staff.admin)["attendance_list"], [2, 1])
+
+    def test_metrics_endpoint_is_hod_only(self):
+        get_cached_staff_dashboard_stats(self.staff.admin)
+        get_cached_staff_dashboard_stats(self.staff.admin)
+        hod = CustomUser.objects.create_user(username="hod", password="x", user_type=CustomUser.HOD)
+        client = APIClient()
+
+        client.force_authenticate(self.staff.admin)
+        self.assertEqual(client.get('/api/dashboard-cache/').status_code, 403)
+        client.force_authenticate(hod)
+        response = client.get('/api/dashboard-cache/')
+        self.assertEqual(response.data["staff"], {"hits": 1, "misses": 1, "hit_rate": 0.5})
+        self.assertEqual(client.post('/api/dashboard-cache/reset/').data["staff"]["hits"], 0)
+
+
+@override_settings(BACKGROUND_JOB_BACKEND='sync')
+class AnnouncementFanoutTests(SampleDataMixin, TestCase):
+
+    def setUp(self):
+        _, self.staff, _, self.students = self.add_course(1, students=5)
+        self.hod = CustomUser.objects.create_user(username="hod", password="x", user_type=CustomUser.HOD)
+        self.client.force_login(self.hod)
+
+    def post_announcement(self, target_audience):
+        self.client.post('/add_announcement_save/', {"title": "Exams", "message": "Next week",
+                                                     "target_audience": target_audience,
+                                                     "urgency": "high", "category": "academic"})
+        return Announcement.objects.get(title="Exams")
+
+    def test_announcement_reaches_its_audience(self):
+        announcement = self.post_announcement('students')
+        announcement.refresh_from_db()
+        self.assertEqual(announcement.fanout_status, Announcement.FANOUT_SENT)
+        self.assertEqual(announcement.fanout_count, 5)
+        self.assertEqual(set(Notification.objects.filter(announcement=announcement).values_list('user_id', flat=True)),
+                         {student.admin_id for student in self.students})
+        self.assertEqual(Notification.objects.get(user=self.students[0].admin).notification_type, 'announcement')
+
+    def test_resumes_after_the_last_chunk_without_duplicates(self):
+        announcement = Announcement.objects.create(title="All", message="", target_audience='all', created_by=self.hod)
+        recipients = list(CustomUser.objects.exclude(id=self.hod.id).order_by('id').values_list('id', flat=True))
+
+        # A worker stopped after notifying four users but only recorded the first two
+        Notification.objects.bulk_create([Notification(user_id=user_id, announcement=announcement, title="All",
+                                                       message="", notification_type='announcement')
+                                          for user_id in recipients[:4]])
+        Announcement.objects.filter(id=announcement.id).update(fanout_status=Announcement.FANOUT_SENDING,
+                                                               fanout_cursor=recipients[1], fanout_count=2)
+        self.assertEqual(resume_announcement_fanouts(), len(recipients) - 2)
+
+        self.assertEqual(Notification.objects.filter(announcement=announcement).count(), len(recipients))
+        self.assertEqual(fan_out_announcement(announcement.id), 0)
+
+
+@override_settings(BACKGROUND_JOB_BACKEND='sync')
+class SchedulerTests(SampleDataMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        _, _, _, self.students = self.add_course(1, students=2)
+        self.hod = CustomUser.objects.create_user(username="hod", password="x", user_type=CustomUser.HOD)
+        self.now = timezone.now()
+
+    def run_at(self, hours):
+        with self.captureOnCommitCallbacks(execute=True):
+            return run_scheduler(now=self.now + datetime.timedelta(hours=hours))
+
+    def test_scheduled_announcement_is_sent_when_due(self):
+        self.client.force_login(self.hod)
+        self.client.post('/add_announcement_save/', {
+            "title": "Later", "message": "", "target_audience": "students", "urgency": "low", "category": "general",
+            "scheduled_date": (self.now + datetime.timedelta(hours=1)).isoformat()})
+        announcement = Announcement.objects.get(title="Later")
+        self.assertEqual(announcement.fanout_status, Announcement.FANOUT_PENDING)
+        self.assertFalse(Announcement.objects.live().filter(id=announcement.id).exists())
+
+        self.assertEqual(self.run_at(0)["announcements_published"], 0)
+        with mock.patch('django.utils.timezone.now', return_value=self.now + datetime.timedelta(hours=2)):
+            self.assertEqual(self.run_at(2)["announcements_published"], 1)
+        announcement.refresh_from_db()
+        self.assertEqual(announcement.fanout_status, Announcement.FANOUT_SENT)
+        self.assertEqual(Notification.objects.filter(announcement=announcement).count(), 2)
+
+    def test_expired_items_are_archived(self):
+        user = self.students[0].admin
+        expiry = self.now + datetime.timedelta(hours=1)
+        announcement = Announcement.objects.create(title="Soon gone", message="", target_audience='all',
+                                                   created_by=self.hod, expiry_date=expiry)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=user, title="Soon gone", message="", notification_type='general',
+                                        expiry_date=expiry)
+        self.assertEqual(get_unread_count(user.id), 1)
+
+        result = self.run_at(2)
+        self.assertEqual((result["announcements_archived"], result["notifications_archived"]), (1, 1))
+        announcement.refresh_from_db()
+        self.assertFalse(announcement.is_active)
+        self.assertIsNotNone(announcement.archived_at)
+        self.assertEqual(get_unread_count(user.id), 0)
+        self.assertEqual(self.run_at(3)["notifications_archived"], 0)
+
+    def test_scheduled_notification_counts_once_live(self):
+        user = self.students[0].admin
+        self.run_at(0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=user, title="Later", message="", notification_type='general',
+                                        scheduled_date=self.now + datetime.timedelta(hours=1))
+        self.assertEqual(get_unread_count(user.id), 0)
+
+        with mock.patch('django.utils.timezone.now', return_value=self.now + datetime.timedelta(hours=2)):
+            self.assertEqual(self.run_at(2)["notifications_published"], 1)
+            self.assertEqual(get_unread_count(user.id), 1)
+
+
+class SessionArchiveTests(SampleDataMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.course, self.staff, self.subjects, self.students = self.add_course(1, students=3)
+        self.open_session = SessionYearModel.objects.create(session_start_year=datetime.date.today(),
+                                                            session_end_year=datetime.date.today()
+                                                            + datetime.timedelta(days=365))
+        Attendance.objects.create(subject_id=self.subjects[0], attendance_date=datetime.date.today(),
+                                  session_year_id=self.open_session)
+
+    def test_command_moves_closed_sessions_only(self):
+        before = (get_admin_dashboard_stats(), get_staff_dashboard_stats(self.staff.admin),
+                  get_student_dashboard_stats(self.students[0]))
+        out = StringIO()
+        call_command('archive_session_years', '--batch-size', '1', stdout=out)
+        self.assertIn("2 attendances, 6 reports", out.getvalue())
+
+        self.assertEqual(list(Attendance.objects.values_list('session_year_id', flat=True)), [self.open_session.id])
+        self.assertFalse(AttendanceReport.objects.exists())
+        self.assertEqual(ArchivedAttendanceReport.objects.filter(status=True).count(), 4)
+        self.session_year.refresh_from_db()
+        self.assertIsNotNone(self.session_year.archived_at)
+        self.assertIsNone(SessionYearModel.objects.get(id=self.open_session.id).archived_at)
+
+        # Summaries and archived lecture totals keep the dashboards unchanged
+        after = (get_admin_dashboard_stats(), get_staff_dashboard_stats(self.staff.admin),
+                 get_student_dashboard_stats(self.students[0]))
+        self.assertEqual(after, before)
+        rebuild_attendance_summary()
+        self.assertEqual(get_student_dashboard_stats(self.students[0]), before[2])
+
+    def test_api_reads_archive_only_for_archived_sessions(self):
+        archive_session_year(self.session_year)
+        client = APIClient()
+        client.force_authenticate(self.staff.admin)
+
+        live = client.get('/api/attendance/').data['results']
+        self.assertEqual([row['session_year_id'] for row in live], [self.open_session.id])
+
+        archived = client.get(f'/api/attendance/?session_year_id={self.session_year.id}').data['results']
+        self.assertEqual(len(archived), 2)
+        self.assertEqual((archived[0]['present_count'], archived[0]['absent_count']), (2, 1))
+        reports = client.get(f'/api/attendance/{archived[0]["id"]}/reports/?session_year_id={self.session_year.id}')
+        self.assertEqual(len(reports.data), 3)
+        reports = client.get(f'/api/attendance-reports/?session_year_id={self.session_year.id}&status=true')
+        self.assertEqual(reports.data['count'], 4)
+        student = client.get(f'/api/students/{self.students[0].id}/attendance/?session_year_id={self.session_year.id}')
+        self.assertEqual(len(student.data), 2)
+
+    def test_archived_session_is_read_only(self):
+        archive_session_year(self.session_year)
+        result = save_attendance(self.subjects[0], self.session_year, datetime.date(2024, 3, 1),
+                                 [{"id": self.students[0].admin_id, "status": 1}])
+        self.assertEqual(result["status"], "Error")
+        self.assertFalse(Attendance.objects.filter(session_year_id=self.session_year).exists())
+
+        attendance = ArchivedAttendance.objects.filter(subject_id=self.subjects[0]).get()
+        self.client.force_login(self.staff.admin)
+        response = self.client.post('/get_attendance_student/', {"attendance_date": attendance.id})
+        self.assertEqual(len(json.loads(response.content)), 3)
+
+
+class SyntheticDataTests(TestCase):
+
+    def generate(self, prefix, seed=7):
+        return SyntheticDataset(students=12, staff=3, days=14, seed=seed, subjects_per_course=2, notifications=2,
+                                batch_size=7, prefix=prefix, today=datetime.date(2025, 1, 6)).generate()
+
+    def statuses(self, prefix):
+        return list(AttendanceReport.objects.filter(student_id__admin__username__startswith=f"{prefix}_")
+                    .order_by('id').values_list('status', flat=True))
+
+    def test_generates_consistent_college(self):
+        counts = self.generate('a')
+        # 14 days up to a Monday: 10 weekdays over two session years
+        self.assertEqual(SessionYearModel.objects.count(), 2)
+        self.assertEqual(counts['Attendance'], 2 * 10)
+        self.assertEqual(counts['AttendanceReport'], 12 * 2 * 10)
+        self.assertEqual(counts['StudentResult'], 12 * 2)
+        self.assertEqual(Students.objects.count(), 12)
+        self.assertEqual(Staffs.objects.count(), 3)
+        self.assertTrue(self.client.login(username='a_student0', password='password'))
+
+        summaries = sorted(AttendanceSummary.objects.values_list('student_id', 'subject_id', 'session_year_id',
+                                                                 'present_count', 'absent_count'))
+        rebuild_attendance_summary()
+        self.assertEqual(sorted(AttendanceSummary.objects.values_list(
+            'student_id', 'subject_id', 'session_year_id', 'present_count', 'absent_count')), summaries)
+
+    def test_same_seed_same_data(self):
+        self.generate('a')
+        self.generate('b')
+        self.generate('c', seed=8)
+        self.assertEqual(self.statuses('a'), self.statuses('b'))
+        self.assertNotEqual(self.statuses('a'), self.statuses('c'))
+
+
+class BenchmarkTests(TestCase):
+
+    def test_run_benchmarks(self):
+        SyntheticDataset(students=6, staff=2, days=3, today=datetime.date(2025, 1, 8)).generate()
+        names = ['admin_home', 'staff_home', 'student_home', 'get_students', 'save_attendance_data', 'api_students']
+        results = run_benchmarks(repeat=2, names=names)
+
+        self.assertEqual(list(results), names)
+        for name, result in results.items():
+            with self.subTest(name=name):
+                self.assertEqual(result['status'], 200)
+                self.assertEqual(result['runs'], 2)
+                self.assertGreater(result['queries'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(Attendance.objects.filter(attendance_date__gt=datetime.date(2025, 12, 31)).count(), 4)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_login_benchmark(self):
+        SyntheticDataset(students=3, staff=1, days=1, today=datetime.date(2025, 1, 8)).generate()
+        result = run_benchmarks(repeat=3, names=['login'])['login']
+        self.assertEqual((result['status'], result['runs']), (302, 3))
+        self.assertGreater(result['per_second'], 0)
+        with self.assertRaises(RuntimeError):
+            run_benchmarks(repeat=1, names=['login'], password='wrong')
+
+    def test_compare_flags_regressions(self):
+        baseline = {'admin_home': {'p50_ms': 10, 'p95_ms': 20, 'queries': 4, 'peak_kb': 0},
+                    'removed': {'p50_ms': 1, 'p95_ms': 1, 'queries': 1, 'peak_kb': 1}}
+        results = {'admin_home': {'p50_ms': 11, 'p95_ms': 40, 'queries': 6, 'peak_kb': 100},
+                   'added': {'p50_ms': 1, 'p95_ms': 1, 'queries': 1, 'peak_kb': 1}}
+        comparison = compare(results, baseline, max_ratio=1.25)
+        self.assertEqual(list(comparison), ['admin_home'])
+        self.assertEqual(comparison['admin_home']['ratios'], {'p50_ms': 1.1, 'p95_ms': 2.0, 'queries': 1.5})
+        self.assertEqual(comparison['admin_home']['regressions'], ['p95_ms', 'queries'])
+
+
+class BulkImportTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.course = Courses.objects.create(course_name="BCA")
+        self.session_year = SessionYearModel.objects.create(session_start_year=datetime.date(2025, 1, 1),
+                                                            session_end_year=datetime.date(2025, 12, 31))
+
+    def student_rows(self, count, start=0):
+        return [{"username": f"new{n}", "email": f"new{n}@college.com", "password": f"secret{n}",
+                 "first_name": "New", "last_name": f"Student {n}", "address": "", "gender": "Female",
+                 "course_id": str(self.course.id), "session_year_id": str(self.session_year.id)}
+                for n in range(start, start + count)]
+
+    def test_command_imports_with_process_pool(self):
+        make_staff("taken")
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write("username,email,password,first_name,last_name,address\n"
+                    "ann,ann@college.com,pw-ann,Ann,Lee,1 Road\n"
+                    "bob,bob@college.com,pw-bob,Bob,Rao,2 Road\n"
+                    "taken,other@college.com,pw,Dup,User,\n"
+                    "carl,ANN@college.com,pw,Carl,Das,\n"
+                    ",nobody@college.com,pw,No,Name,\n"
+                    "dan,dan@college.com,,Dan,Roy,\n")
+        self.addCleanup(os.remove, f.name)
+        out = StringIO()
+        call_command('import_users', f.name, '--type', 'staff', '--workers', '2', stdout=out)
+
+        self.assertIn("Created 2 staff accounts, 4 rows skipped", out.getvalue())
+        self.assertIn("line 7 (dan): Missing password", out.getvalue())
+        self.assertIn("line 4 (taken): Username taken is already taken", out.getvalue())
+        self.assertIn("line 5 (carl): Email ann@college.com is already taken", out.getvalue())
+        ann = Staffs.objects.select_related('admin').get(admin__username="ann")
+        self.assertEqual(ann.address, "1 Road")
+        self.assertTrue(ann.admin.check_password("pw-ann"))
+        self.assertEqual(ann.admin.user_type, CustomUser.STAFF)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+                       PROVISIONING_HASH_WORKERS=0)
+    def test_rows_with_extra_cells(self):
+        rows = read_csv(BytesIO(b"username,email,password\n"
+                                b"bob,bob@college.com,pw,\n"
+                                b"eve,eve@college.com,pw,oops\n"))
+        result = import_users(rows, CustomUser.STAFF)
+        self.assertEqual(result["created"], 1)
+        self.assertEqual(result["errors"], [{"line": 3, "username": "eve", "error": "More values than columns: oops"}])
+
+        self.client.force_login(CustomUser.objects.create_user(username="hod", password="x", user_type=CustomUser.HOD))
+        upload = BytesIO(b"username,email,password\ndan,dan@college.com,pw,extra\n")
+        upload.name = "staff.csv"
+        response = self.client.post('/import_users_save/', {"user_type": CustomUser.STAFF, "csv_file": upload})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(CustomUser.objects.filter(username="dan").exists())
+
+    @override_settings(PROVISIONING_HASH_WORKERS=None)
+    def test_default_workers_are_one_per_cpu(self):
+        with mock.patch('student_management_app.provisioning.os.cpu_count', return_value=3), \
+                mock.patch('student_management_app.provisioning.ProcessPoolExecutor') as pool:
+            pool.return_value.__enter__.return_value.map.return_value = ["hash-a", "hash-b"]
+            self.assertEqual(hash_passwords(["a", "b"]), ["hash-a", "hash-b"])
+        self.assertEqual(pool.call_args.kwargs["max_workers"], 3)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+                       PROVISIONING_HASH_WORKERS=0)
+    def test_query_count_does_not_grow_with_rows(self):
+        def count_queries(rows):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(import_users(rows, CustomUser.STUDENT)["created"], len(rows))
+            return len(queries)
+
+        self.assertEqual(count_queries(self.student_rows(2)), count_queries(self.student_rows(30, start=2)))
+        student = Students.objects.get(admin__username="new7")
+        self.assertEqual((student.course_id_id, student.session_year_id_id, student.gender),
+                         (self.course.id, self.session_year.id, "Female"))
+
+    @override_settings(PROVISIONING_HASH_WORKERS=0)
+    def test_upload_sets_passwords_before_commit(self):
+        hod = CustomUser.objects.create_user(username="hod", password="x", user_type=CustomUser.HOD)
+        self.client.force_login(hod)
+        upload = BytesIO(("username,email,password,course_id,session_year_id\n"
+                          f"zoe,zoe@college.com,pw-zoe,{self.course.id},{self.session_year.id}\n"
+                          f"yan,yan@college.com,pw-yan,999,{self.session_year.id}\n").encode())
+        upload.name = "students.csv"
+        response = self.client.post('/import_users_save/', {"user_type": CustomUser.STUDENT, "csv_file": upload})
+
+        self.assertRedirects(response, '/import_users/', fetch_redirect_response=False)
+        self.assertTrue(CustomUser.objects.get(username="zoe").check_password("pw-zoe"))
+        self.assertFalse(CustomUser.objects.filter(username="yan").exists())
+        page = self.client.get('/import_users/')
+        self.assertContains(page, "Line 3: Unknown course 999")
+
+
+class UnreadCountTests(SampleDataMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        _, self.staff, _, self.students = self.add_course(1, students=1)
+        self.user = self.students[0].admin
+
+    def notify(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(user=self.user, title="t", message="", notification_type='general',
+                                               **kwargs)
+
+    def test_counter_follows_writes(self):
+        self.assertEqual(get_unread_count(self.user.id), 0)
+        first = self.notify()
+        self.notify()
+        self.notify(is_read=True)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.user.id), 2)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(f'/api/notifications/{first.id}/mark_read/')
+            client.post(f'/api/notifications/{first.id}/mark_read/')
+        self.assertEqual(client.get('/api/notifications/unread_count/').data, {'unread_count': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post('/api/notifications/mark_all_read/')
+        self.assertEqual(get_unread_count(self.user.id), 0)
+
+    def test_deleting_rows_that_were_not_counted(self):
+        live = self.notify()
+        scheduled = self.notify(scheduled_date=timezone.now() + datetime.timedelta(days=1))
+        expired = self.notify(expiry_date=timezone.now() - datetime.timedelta(days=1))
+        self.assertEqual(get_unread_count(self.user.id), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            scheduled.delete()
+            expired.delete()
+        self.assertEqual(get_unread_count(self.user.id), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            live.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.user.id), 0)
+
+    def test_badge_on_pages_and_endpoint(self):
+        self.notify()
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/student_view_subjects/').context['unread_notification_count'], 1)
+        self.assertEqual(self.client.get('/notification_badge/').json(), {"unread_count": 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get('/student_view_notifications/')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.user.id), 0)
+        self.assertEqual(self.client.get('/notification_badge/').json(), {"unread_count": 0})
+
+    def test_reconcile_corrects_drift(self):
+        self.notify()
+        cache.set(unread_count_key(self.user.id), 7)
+        self.assertEqual(reconcile_unread_counts(), 1)
+        self.assertEqual(get_unread_count(self.user.id), 1)
+        self.assertEqual(reconcile_unread_counts(), 0)
+
+
+class MyNotificationsTests(SampleDataMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        _, _, _, self.students = self.add_course(1, students=1)
+        self.user = self.students[0].admin
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.visible = [self.notify(f"n{n}") for n in range(3)]
+            self.notify("scheduled", scheduled_date=now + datetime.timedelta(days=1))
+            self.notify("expired", expiry_date=now - datetime.timedelta(days=1))
+
+    def notify(self, title, **kwargs):
+        return Notification.objects.create(user=self.user, title=title, message="", notification_type='general',
+                                           **kwargs)
+
+    def test_pages_only_live_notifications(self):
+        response = self.client.get('/api/notifications/my_notifications/?page_size=2')
+        self.assertEqual([row["title"] for row in response.data["results"]], ["n2", "n1"])
+        response = self.client.get(response.data["next"])
+        self.assertEqual([row["title"] for row in response.data["results"]], ["n0"])
+        self.assertIsNone(response.data["next"])
+
+    def test_since_returns_the_delta(self):
+        response = self.client.get(f'/api/notifications/my_notifications/?since={self.visible[0].id}')
+        self.assertEqual([row["title"] for row in response.data["results"]], ["n2", "n1"])
+        since = self.visible[1].created_at.isoformat()
+        self.assertEqual(self.client.get('/api/notifications/my_notifications/', {"since": since}).data["results"][0]["title"],
+                         "n2")
+        self.assertEqual(self.client.get('/api/notifications/my_notifications/?since=yesterday').status_code, 400)
+
+    def test_since_includes_scheduled_notifications_gone_live(self):
+        now = timezone.now()
+        scheduled = self.notify("later", scheduled_date=now + datetime.timedelta(minutes=5))
+        # The client syncs a newer notification while "later" is still pending
+        latest = self.notify("n3")
+        cursor = latest.id
+        since_time = latest.created_at.isoformat()
+        self.assertEqual(self.client.get(f'/api/notifications/my_notifications/?since={cursor}').data["results"], [])
+
+        with mock.patch('django.utils.timezone.now', return_value=now + datetime.timedelta(minutes=10)):
+            by_id = self.client.get(f'/api/notifications/my_notifications/?since={cursor}').data["results"]
+            by_time = self.client.get('/api/notifications/my_notifications/', {"since": since_time}).data["results"]
+        self.assertEqual([row["id"] for row in by_id], [scheduled.id])
+        self.assertEqual([row["id"] for row in by_time], [scheduled.id])
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get('/api/notifications/my_notifications/')
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            cached = self.client.get('/api/notifications/my_notifications/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(self.client.get('/api/notifications/my_notifications/',
+                                         HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/notifications/{self.visible[0].id}/mark_read/')
+        self.assertEqual(self.client.get('/api/notifications/my_notifications/',
+                                         HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class NotificationStreamTests(SampleDataMixin, TestCase):
+
+    def setUp(self):
+        _, _, _, self.students = self.add_course(1, students=1)
+        self.user = self.students[0].admin
+        self.first = Notification.objects.create(user=self.user, title="first", message="", notification_type='general')
+
+    async def test_broker_wakes_subscribers_from_other_threads(self):
+        broker = InProcessBroker()
+        async with broker.subscribe(self.user.id) as wake:
+            await asyncio.to_thread(broker.publish, [self.user.id])
+            await asyncio.wait_for(wake.wait(), 1)
+        self.assertEqual(dict(broker._subscribers), {})
+
+    async def test_stream_sends_backlog_then_published_rows(self):
+        events = sse_events(self.user.id, since=0)
+        self.assertEqual(await anext(events), "retry: 3000\n\n")
+        self.assertTrue((await anext(events)).startswith(f"id: {self.first.id}\nevent: notification\n"))
+
+        second = await Notification.objects.acreate(user=self.user, title="second", message="",
+                                                    notification_type='general')
+        get_broker().publish([self.user.id])
+        event = await asyncio.wait_for(anext(events), 1)
+        self.assertIn('"title": "second"', event)
+        self.assertTrue(event.startswith(f"id: {second.id}\n"))
+        await events.aclose()
+
+    async def test_stream_sends_scheduled_rows_when_they_go_live(self):
+        now = timezone.now()
+        later = await Notification.objects.acreate(user=self.user, title="later", message="", notification_type='general',
+                                                   scheduled_date=now + datetime.timedelta(minutes=5))
+        # The pending row doesn't move the starting cursor past live rows
+        self.assertEqual(await latest_notification_id(self.user.id), self.first.id)
+        second = await Notification.objects.acreate(user=self.user, title="second", message="",
+                                                    notification_type='general')
+        events = sse_events(self.user.id, since=self.first.id)
+        await anext(events)
+        self.assertTrue((await anext(events)).startswith(f"id: {second.id}\n"))
+
+        with mock.patch('django.utils.timezone.now', return_value=now + datetime.timedelta(minutes=10)):
+            get_broker().publish([self.user.id])
+            event = await asyncio.wait_for(anext(events), 1)
+        self.assertTrue(event.startswith(f"id: {later.id}\n"))
+        await events.aclose()
+
+    async def test_long_poll(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/notifications/poll/?since=0')
+        data = json.loads(b"".join([chunk async for chunk in response.streaming_content]))
+        self.assertEqual([row["id"] for row in data["notifications"]], [self.first.id])
+        self.assertEqual(data["since"], self.first.id)
+
+        with self.settings(NOTIFICATION_POLL_TIMEOUT=0.05):
+            response = await self.async_client.get(f'/notifications/poll/?since={self.first.id}')
+            data = json.loads(b"".join([chunk async for chunk in response.streaming_content]))
+        self.assertEqual(data, {"notifications": [], "since": self.first.id})
+
+    def test_requires_login(self):
+        self.assertEqual(self.client.get('/notifications/stream/').status_code, 401)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/notifications/stream/?since=x').status_code, 400)
+
+
+class QueryInstrumentationTests(SampleDataMixin, TestCase):
+
+    def setUp(self):
+        query_stats.reset()
+        _, self.staff, _, self.students = self.add_course(1)
+        self.hod = CustomUser.objects.create_user(username="hod", password="x", user_type=CustomUser.HOD)
+        self.client.force_login(self.hod)
+
+    def test_fingerprint_ignores_literals(self):
+        self.assertEqual(fingerprint('SELECT * FROM t WHERE id = 5 AND name = \'x\''),
+                         fingerprint('SELECT * FROM t WHERE id = 12 AND name = \'y\''))
+        self.assertEqual(fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+                         fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'))
+
+    @override_settings(QUERY_BUDGET_MAX_QUERIES=1)
+    def test_over_budget_request_is_logged_as_json(self):
+        with self.assertLogs('student_management_app.instrumentation', 'WARNING') as logs:
+            self.client.get('/manage_student/')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["view"], "manage_student")
+        self.assertEqual(record["status"], 200)
+        self.assertGreater(record["queries"], 1)
+
+    def test_every_request_is_logged(self):
+        with self.assertLogs('student_management_app.instrumentation', 'INFO') as logs:
+            self.client.get('/manage_student/')
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        self.assertEqual(json.loads(logs.records[0].getMessage())["view"], "manage_student")
+
+    def test_top_offenders_endpoint_is_hod_only(self):
+        self.client.get('/manage_student/')
+        self.client.get('/manage_student/')
+        client = APIClient()
+        client.force_authenticate(self.staff.admin)
+        self.assertEqual(client.get('/api/query-stats/').status_code, 403)
+
+        client.force_authenticate(self.hod)
+        offenders = {row["view"]: row for row in client.get('/api/query-stats/?order_by=p95_ms').data}
+        self.assertEqual(offenders["manage_student"]["requests"], 2)
+        self.assertEqual(sum(offenders["manage_student"]["histogram"].values()), 2)
+        self.assertEqual(client.get('/api/query-stats/?order_by=path').status_code, 400)
+
+        self.assertEqual(client.post('/api/query-stats/reset/').status_code, 204)
+        self.assertNotIn("manage_student", [row["view"] for row in client.get('/api/query-stats/').data])
+
+
+class RoleBasedAccessTests(SampleDataMixin, TestCase):
+
+    def setUp(self):
+        _, self.staff, _, self.students = self.add_course(1)
+
+    def test_route_policies_follow_view_modules(self):
+        policies = {view.__name__: roles for view, roles in build_route_policies().items()}
+        self.assertEqual(policies['doLogin'], 'public')
+        self.assertEqual(policies['staff_home'], {CustomUser.STAFF})
+        # Named like a student page, but it is an HOD view
+        self.assertEqual(policies['student_feedback_message'], {CustomUser.HOD})
+
+    def test_roles_are_enforced(self):
+        response = self.client.get('/staff_home/')
+        self.assertRedirects(response, '/login', fetch_redirect_response=False)
+
+        self.client.force_login(self.students[0].admin)
+        self.assertRedirects(self.client.get('/staff_take_attendance/'), '/', fetch_redirect_response=False)
+        self.assertRedirects(self.client.get('/student_feedback_message/'), '/', fetch_redirect_response=False)
+        self.assertEqual(self.client.get('/student_view_subjects/').status_code, 200)
+        self.assertRedirects(self.client.get('/login'), '/student_home/', fetch_redirect_response=False)
+
+        self.client.force_login(self.staff.admin)
+        self.assertEqual(self.client.get('/staff_take_attendance/').status_code, 200)
+
+
+class UserProfileTests(SampleDataMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.course, self.staff, _, self.students = self.add_course(1)
+
+    def test_profile_is_loaded_once_and_cached(self):
+        student = self.students[0]
+        user = CustomUser.objects.get(id=student.admin_id)
+        with self.assertNumQueries(1):
+            profile = get_user_profile(user)
+            self.assertEqual((profile.id, profile.course_id.course_name), (student.id, "Course 1"))
+            self.assertIs(profile.admin, user)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_profile(user).session_year_id, self.session_year)
+
+        student.address = "New address"
+        student.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_profile(user).address, "New address")
+
+    def test_views_use_request_profile(self):
+        self.client.force_login(self.staff.admin)
+        response = self.client.get('/staff_profile/')
+        self.assertEqual(response.context["staff"].id, self.staff.id)
+        self.assertIs(response.context["user"], response.wsgi_request.user)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_login_does_not_write_the_profile(self):
+        user = self.students[0].admin
+        user.set_password("secret")
+        user.save()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/doLogin', {"email": user.email, "password": "secret"})
+        self.assertRedirects(response, '/student_home/', fetch_redirect_response=False)
+        profile_tables = ('student_management_app_students', 'student_management_app_staffs',
+                          'student_management_app_adminhod')
+        self.assertFalse([query['sql'] for query in queries.captured_queries
+                          if query['sql'].startswith('UPDATE') and any(table in query['sql'] for table in profile_tables)])
+
+    def test_created_profiles_use_cached_defaults(self):
+        user = create_user_with_profile(CustomUser.STUDENT, username="new", email="new@college.com",
+                                        profile={"address": "1 Road", "gender": "Female"})
+        profile = Students.objects.get(admin=user)
+        self.assertEqual((profile.course_id, profile.session_year_id, profile.address),
+                         (self.course, self.session_year, "1 Road"))
+        with self.assertNumQueries(0):
+            self.assertEqual((default_course_id(), default_session_year_id()), (self.course.id, self.session_year.id))
+
+        Courses.objects.create(course_name="BBA")
+        with self.assertNumQueries(1):
+            self.assertEqual(default_course_id(), self.course.id)
+
+    def test_hod_adds_staff_and_superuser_gets_profile(self):
+        hod = CustomUser.objects.create_superuser(username="root", email="root@college.com", password="x")
+        self.assertEqual(get_user_profile(hod).admin_id, hod.id)
+        self.client.force_login(hod)
+        self.client.post('/add_staff_save/', {"username": "ann", "email": "ann@college.com", "password": "x",
+                                              "first_name": "Ann", "last_name": "Lee", "address": "2 Road"})
+        self.assertEqual(Staffs.objects.get(admin__username="ann").address, "2 Road")
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class EmailLoginTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="ann", email="Ann@College.com", password="secret",
+                                                   user_type=CustomUser.STAFF)
+        Staffs.objects.create(admin=self.user, address="")
+
+    def test_login_resolves_the_user_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/doLogin', {"email": "ann@college.com", "password": "secret"})
+        self.assertRedirects(response, '/staff_home/', fetch_redirect_response=False)
+        user_selects = [query['sql'] for query in queries.captured_queries
+                        if query['sql'].startswith('SELECT') and 'FROM "student_management_app_customuser"' in query['sql']]
+        self.assertEqual(len(user_selects), 1)
+
+        response = self.client.post('/doLogin', {"email": "ann@college.com", "password": "wrong"})
+        self.assertRedirects(response, '/login', fetch_redirect_response=False)
+        self.assertIsNone(authenticate(email="nobody@college.com", password="secret"))
+
+    def test_emails_are_unique_ignoring_case(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CustomUser.objects.create_user(username="ann2", email="ANN@college.com")
+        # Accounts without an email don't collide
+        CustomUser.objects.create_user(username="blank1")
+        CustomUser.objects.create_user(username="blank2")
+        # Usernames still log in to the admin site
+        self.assertEqual(authenticate(username="ann", password="secret"), self.user)
@@ -1,6 +1,9 @@
 from django.contrib import admin
 from django.urls import path, include
-from .views import home, contact, loginUser, doLogin, registration, doRegistration, logout_user
+from .views import (
+    home, contact, loginUser, doLogin, registration, doRegistration, logout_user, notification_badge,
+    notification_stream, notification_poll
+)
 from . import HodViews, StaffViews, StudentViews
 
 urlpatterns = [
@@ -11,6 +14,9 @@ urlpatterns = [
     path('registration', registration, name="registration"),
     path('doLogin', doLogin, name="doLogin"),
     path('doRegistration', doRegistration, name="doRegistration"),
+    path('notification_badge/', notification_badge, name="notification_badge"),
+    path('notifications/stream/', notification_stream, name="notification_stream"),
+    path('notifications/poll/', notification_poll, name="notification_poll"),
     
       # URLS for Student
     path('student_home/', StudentViews.student_home, name="student_home"),
@@ -73,6 +79,8 @@ urlpatterns = [
     path('delete_session/<session_id>/', HodViews.delete_session, name="delete_session"),
     path('add_student/', HodViews.add_student, name="add_student"),
     path('add_student_save/', HodViews.add_student_save, name="add_student_save"),
+    path('import_users/', HodViews.import_users_page, name="import_users"),
+    path('import_users_save/', HodViews.import_users_save, name="import_users_save"),
     path('edit_student/<student_id>', HodViews.edit_student, name="edit_student"),
     path('edit_student_save/', HodViews.edit_student_save, name="edit_student_save"),
     path('manage_student/', HodViews.manage_student, name="manage_student"),
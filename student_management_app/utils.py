@@ -6,8 +6,10 @@ from django.core.mail import send_mail, EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
+from django.utils import timezone
 from .models import ActivityLog, Notification
-from io.  import BytesIO
+from io import BytesIO
+from itertools import chain, islice
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -15,6 +17,8 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.units import inch
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -267,11 +271,8 @@ def generate_excel_report(title, data, filename='report.xlsx', columns=None):
             max_length = 0
             column_letter = column[0].column_letter
             for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(cell.value)
-                except Exception as e:
-                    pass
+                if cell.value is not None and len(str(cell.value)) > max_length:
+                    max_length = len(str(cell.value))
             adjusted_width = min(max_length + 2, 50)
             ws.column_dimensions[column_letter].width = adjusted_width
         
@@ -284,6 +285,81 @@ def generate_excel_report(title, data, filename='report.xlsx', columns=None):
         return None
 
 
+def stream_excel_report(title, rows, columns=None, output=None, width_sample_size=200):
+    """
+    Generate an Excel report in a single pass with a write-only workbook
+
+    Unlike generate_excel_report, rows are never held in memory: openpyxl
+    writes each row out as it is appended. Column widths are worked out from
+    the first `width_sample_size` rows, since write-only sheets need widths
+    before the first row is written.
+
+    Args:
+        title: Report title
+        rows: Iterable (list or generator) of dictionaries or lists
+        columns: List of column headers (optional for dictionary rows)
+        output: File path or binary file object to write to (defaults to a new BytesIO)
+        width_sample_size: Number of leading rows used to size the columns
+
+    Returns:
+        The output path/file object (a BytesIO rewound to the start by default)
+    """
+    try:
+        rows = iter(rows)
+        sample = list(islice(rows, width_sample_size))
+
+        dict_rows = bool(sample) and isinstance(sample[0], dict)
+        if dict_rows and not columns:
+            columns = list(sample[0].keys())
+
+        def to_values(row):
+            values = [row.get(column, '') for column in columns] if dict_rows else list(row)
+            # Excel cannot store timezone-aware datetimes
+            return [timezone.make_naive(value) if isinstance(value, datetime) and timezone.is_aware(value) else value
+                    for value in values]
+
+        widths = {}
+        for values in chain([columns or []], (to_values(row) for row in sample)):
+            for col_num, value in enumerate(values, 1):
+                if value is not None:
+                    widths[col_num] = max(widths.get(col_num, 0), len(str(value)))
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(title[:31])  # Excel sheet name limit
+        for col_num, width in widths.items():
+            ws.column_dimensions[get_column_letter(col_num)].width = min(width + 2, 50)
+
+        title_cell = WriteOnlyCell(ws, value=title)
+        title_cell.font = Font(size=16, bold=True, color='1a237e')
+        ws.append([title_cell])
+        ws.append([f"Generated: {datetime.now().strftime('%B %d, %Y %I:%M %p')}"])
+        ws.append([])
+
+        if columns:
+            header = []
+            for column_title in columns:
+                cell = WriteOnlyCell(ws, value=column_title)
+                cell.font = Font(bold=True, color='FFFFFF')
+                cell.fill = PatternFill(start_color='1a237e', end_color='1a237e', fill_type='solid')
+                cell.alignment = Alignment(horizontal='center')
+                header.append(cell)
+            ws.append(header)
+
+        for row in chain(sample, rows):
+            ws.append(to_values(row))
+
+        if output is None:
+            output = BytesIO()
+        wb.save(output)
+        if hasattr(output, 'seek'):
+            output.seek(0)
+        logger.info(f"Streaming Excel report generated: {title}")
+        return output
+    except Exception as e:
+        logger.error(f"Error generating streaming Excel: {str(e)}")
+        return None
+
+
 def get_client_ip(request):
     """
     Get client IP address from request
@@ -1,10 +1,16 @@
 from django.shortcuts import render, redirect, HttpResponseRedirect
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib.auth import logout, login
-from .models import CustomUser, Staffs, Students, AdminHOD
+from django.db import transaction
+from .models import CustomUser
 from django.contrib import messages
 from django.contrib.auth import authenticate
 from django.views.decorators.csrf import csrf_exempt
 from django.urls import reverse
+from .notifications import get_unread_count
+from .backends import users_by_email
+from .profiles import create_user_profile
+from .notification_stream import sse_events, long_poll
 
 @csrf_exempt
 def home(request):
@@ -29,13 +35,8 @@ def doLogin(request):
         messages.error(request, "Please provide all the details!!")
         return redirect('login')
 
-    # Try to get user by email
-    try:
-        user = CustomUser.objects.get(email=email_id)
-        # Authenticate with username and password
-        user = authenticate(request, username=user.username, password=password)
-    except CustomUser.DoesNotExist:
-        user = None
+    # One indexed query through EmailBackend
+    user = authenticate(request, email=email_id, password=password)
 
     if user is None:
         messages.error(request, 'Invalid Login Credentials!!')
@@ -77,7 +78,7 @@ def doRegistration(request):
         messages.error(request, 'Both passwords should match!!')
         return redirect('registration')
 
-    if CustomUser.objects.filter(email=email_id).exists():
+    if users_by_email(email_id).exists():
         messages.error(request, 'User with this email already exists. Please login.')
         return redirect('registration')
 
@@ -98,15 +99,15 @@ def doRegistration(request):
         user.last_name = last_name
         user.user_type = user_type
         user.set_password(password)
-        user.save()
-
-        # Create corresponding profile based on user type
-        if user_type == CustomUser.STAFF:
-            Staffs.objects.create(admin=user, address="")
-        elif user_type == CustomUser.STUDENT:
-            Students.objects.create(admin=user, address="", gender="Male")
-        elif user_type == CustomUser.HOD:
-            AdminHOD.objects.create(admin=user)
+        with transaction.atomic():
+            user.save()
+            # Create corresponding profile based on user type
+            if user_type == CustomUser.STAFF:
+                create_user_profile(user, address="")
+            elif user_type == CustomUser.STUDENT:
+                create_user_profile(user, address="", gender="Male")
+            elif user_type == CustomUser.HOD:
+                create_user_profile(user)
 
         messages.success(request, "Registration successful! Please log in.")
         return redirect('login')
@@ -118,6 +119,41 @@ def logout_user(request):
     logout(request)
     return HttpResponseRedirect('/')
 
+def notification_badge(request):
+    # Polled by the sidebar; a cache read, no database query
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+    return JsonResponse({"unread_count": get_unread_count(request.user.id)})
+
+def _stream_cursor(request):
+    # EventSource sends the id of the last event it got when it reconnects
+    since = request.GET.get('since') or request.headers.get('Last-Event-ID')
+    return int(since) if since is not None else None
+
+def notification_stream(request):
+    # The stream is read asynchronously; serve it with the ASGI application
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+    try:
+        since = _stream_cursor(request)
+    except ValueError:
+        return JsonResponse({"error": "since must be a notification id"}, status=400)
+    response = StreamingHttpResponse(sse_events(request.user.id, since), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def notification_poll(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+    try:
+        since = _stream_cursor(request)
+    except ValueError:
+        return JsonResponse({"error": "since must be a notification id"}, status=400)
+    response = StreamingHttpResponse(long_poll(request.user.id, since), content_type='application/json')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
 def get_user_type_from_email(email_id):
     try:
         email_user_type = email_id.split('@')[0].split('.')[1]
@@ -3,6 +3,10 @@ ASGI config for student_management_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. ``uvicorn student_management_project.asgi:application``)
+for the live notification stream: /notifications/stream/ and /notifications/poll/
+hold the connection open without tying up a worker thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,15 @@
+"""
+Celery application
+
+Start a worker with:
+    celery -A student_management_project worker -l info
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'student_management_project.settings')
+
+app = Celery('student_management_project')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -112,6 +112,9 @@ CACHES = {
     }
 }
 
+# Relay notification stream wake-ups between processes through Redis
+NOTIFICATION_STREAM_BROKER = 'student_management_app.notification_stream.RedisBroker'
+
 # Session Configuration
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_CACHE_ALIAS = 'default'
@@ -19,6 +19,12 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 AUTH_USER_MODEL = 'student_management_app.CustomUser'
 
+# The login form authenticates by email in one query; usernames still work for the admin site
+AUTHENTICATION_BACKENDS = [
+    'student_management_app.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -55,6 +61,7 @@ INTERNAL_IPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'student_management_app.instrumentation.QueryInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,6 +71,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     'student_management_app.middleware.LoginRedirectMiddleware',
+    'student_management_app.middleware.UserProfileMiddleware',
+    'student_management_app.middleware.RoleBasedAccessMiddleware',
 ]
 
 ROOT_URLCONF = 'student_management_project.urls'
@@ -80,6 +89,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'django.template.context_processors.media',
+                'student_management_app.context_processors.notification_badge',
             ],
         },
     },
@@ -167,6 +177,45 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Largest page a client may request with ?pagination=cursor&page_size=N
+CURSOR_PAGINATION_MAX_PAGE_SIZE = 100
+
+
+# Background Jobs (report files, notification fan-out)
+# With no broker configured jobs run in an in-process thread pool
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', '')
+CELERY_TASK_IGNORE_RESULT = True
+BACKGROUND_JOB_THREADS = 2
+# Kept outside MEDIA_ROOT so files are only served by the authenticated download endpoint
+REPORT_JOB_ROOT = os.path.join(BASE_DIR, 'reports')
+REPORT_JOB_TTL = 60 * 60 * 24  # 1 day
+REPORT_JOB_PDF_MAX_ROWS = 5000
+# Bulk user imports: processes hashing passwords (None = one per CPU) and rows per INSERT
+PROVISIONING_HASH_WORKERS = None
+PROVISIONING_BATCH_SIZE = 1000
+# Users notified per transaction when an announcement is sent out
+NOTIFICATION_FANOUT_CHUNK_SIZE = 1000
+# Seconds a cached unread notification count lives; writes keep it current
+UNREAD_COUNT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Live notification stream (/notifications/stream/ and /notifications/poll/)
+# InProcessBroker only reaches streams served by the process that created the
+# notification; use RedisBroker when running more than one process
+NOTIFICATION_STREAM_BROKER = 'student_management_app.notification_stream.InProcessBroker'
+NOTIFICATION_STREAM_REDIS_URL = os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1')
+NOTIFICATION_STREAM_HEARTBEAT = 15  # seconds
+NOTIFICATION_STREAM_TIMEOUT = 300  # seconds before the client reconnects
+NOTIFICATION_STREAM_BATCH_SIZE = 50
+NOTIFICATION_POLL_TIMEOUT = 25  # seconds
+
+# Scheduled publication / expiry (run the run_scheduler command every minute)
+SCHEDULER_BATCH_SIZE = 1000
+# How far back a first run looks for notifications that went live
+SCHEDULER_LOOKBACK = 60 * 60
+
+# Attendance of ended session years moved per transaction by archive_session_years
+ARCHIVE_BATCH_SIZE = 500
+
 
 # CORS Settings (for API access)
 CORS_ALLOWED_ORIGINS = [
@@ -221,6 +270,12 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': False,
         },
+        # Per-request query stats: INFO logs every request, WARNING only those over budget
+        'student_management_app.instrumentation': {
+            'handlers': ['file', 'console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -240,5 +295,21 @@ CACHES = {
 }
 
 
+# Seconds a cached dashboard may live; writes invalidate it sooner
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# Seconds request.profile is kept in the cache (0 disables caching)
+USER_PROFILE_CACHE_TIMEOUT = 300
+# Seconds the default course / session year of new students are cached
+PROFILE_DEFAULTS_CACHE_TIMEOUT = 3600
+
+# Requests running more queries or taking longer (ms) are logged as warnings
+QUERY_BUDGET_MAX_QUERIES = 50
+QUERY_BUDGET_SLOW_MS = 500
+
+# Requests per URL name kept for /api/query-stats/
+QUERY_STATS_WINDOW = 200
+
+
 # Pagination Settings
 ITEMS_PER_PAGE = 10
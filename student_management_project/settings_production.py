@@ -12,6 +12,12 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Custom User Model
 AUTH_USER_MODEL = 'student_management_app.CustomUser'
 
+# The login form authenticates by email in one query; usernames still work for the admin site
+AUTHENTICATION_BACKENDS = [
+    'student_management_app.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 # SECURITY WARNING: keep the secret key used in production secret!
 # Generate a new secret key for production: python -c 'from django.core.management.utils import get_random_secret_key; print(get_random_secret_key())'
 SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
@@ -42,6 +48,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'student_management_app.instrumentation.QueryInstrumentationMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # For serving static files in production
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -49,6 +56,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'student_management_app.middleware.LoginRedirectMiddleware',
+    'student_management_app.middleware.UserProfileMiddleware',
+    'student_management_app.middleware.RoleBasedAccessMiddleware',
 ]
 
 ROOT_URLCONF = 'student_management_project.urls'
@@ -65,6 +75,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'django.template.context_processors.media',
+                'student_management_app.context_processors.notification_badge',
             ],
         },
     },
@@ -145,6 +156,11 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Background report files; kept outside MEDIA_ROOT so they are only served by
+# the authenticated download endpoint
+REPORT_JOB_ROOT = os.environ.get('REPORT_JOB_ROOT', os.path.join(BASE_DIR, 'reports'))
+REPORT_JOB_TTL = 60 * 60 * 24  # 1 day
+
 
 # Security Settings
 # https://docs.djangoproject.com/en/5.2/ref/settings/#security